@@ -0,0 +1,128 @@
+"""
+Накладные расходы на проверку JWT в расчете на один запрос.
+
+Сравнивает маршрут без авторизации, @jwt_required() из flask-jwt-extended
+и кэширующую проверку db_utils.auth.TokenVerifier для HS256, RS256 и ES256.
+Клиенты многократно повторяют один и тот же токен, как в реальной нагрузке.
+
+Запуск:
+    export PYTHONPATH=.
+    python -m benchmarks.bench_auth --requests 2000 --rounds 5
+"""
+import argparse
+import json
+import time
+from cryptography.hazmat.primitives.asymmetric import ec, rsa
+from flask import Flask, jsonify
+from flask_jwt_extended import JWTManager, create_access_token, jwt_required
+from db_utils.auth import TokenVerifier
+
+SECRET = 'benchmark-secret-key-of-sufficient-length'
+
+
+def make_keys(algorithm: str) -> tuple:
+    if algorithm.startswith('HS'):
+        return SECRET, SECRET
+    if algorithm.startswith('RS'):
+        private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    else:
+        private_key = ec.generate_private_key(ec.SECP256R1())
+    return private_key, private_key.public_key()
+
+
+def build_app(algorithm: str) -> tuple:
+    """Приложение с одинаковыми маршрутами, отличающимися только способом авторизации"""
+    signing_key, verifying_key = make_keys(algorithm)
+
+    app = Flask(__name__)
+    app.config['JWT_ALGORITHM'] = algorithm
+    app.config['JWT_SECRET_KEY'] = SECRET
+    if not algorithm.startswith('HS'):
+        app.config['JWT_PRIVATE_KEY'] = signing_key
+        app.config['JWT_PUBLIC_KEY'] = verifying_key
+    JWTManager(app)
+    verifier = TokenVerifier(algorithm, verifying_key)
+
+    @app.route('/noauth')
+    def noauth():
+        return jsonify(ok=True)
+
+    @app.route('/jwt_extended')
+    @jwt_required()
+    def jwt_extended():
+        return jsonify(ok=True)
+
+    @app.route('/cached')
+    @verifier.required
+    def cached():
+        return jsonify(ok=True)
+
+    with app.app_context():
+        token = create_access_token(identity='benchmark')
+    return app, token, verifier
+
+
+def measure(client, route: str, headers: dict, requests: int) -> float:
+    """Среднее время запроса в микросекундах"""
+    started = time.perf_counter()
+    for _ in range(requests):
+        response = client.get(route, headers=headers)
+        assert response.status_code == 200, response.data
+    return (time.perf_counter() - started) / requests * 1e6
+
+
+def measure_routes(client, headers: dict, requests: int, rounds: int) -> dict:
+    """
+    Маршруты замеряются поочередно в несколько раундов, берется лучший раунд,
+    чтобы фоновые колебания нагрузки не попадали в разницу между маршрутами
+    """
+    routes = {'/noauth': {}, '/jwt_extended': headers, '/cached': headers}
+    for route, route_headers in routes.items():
+        measure(client, route, route_headers, min(200, requests))
+
+    best = {route: float('inf') for route in routes}
+    for _ in range(rounds):
+        for route, route_headers in routes.items():
+            best[route] = min(best[route], measure(client, route, route_headers, requests))
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--requests', type=int, default=2000,
+                        help='Запросов на маршрут в одном раунде')
+    parser.add_argument('--rounds', type=int, default=5)
+    parser.add_argument('--algorithms', default='HS256,RS256,ES256')
+    parser.add_argument('--output', help='Файл для JSON-результата')
+    args = parser.parse_args()
+
+    results = []
+    for algorithm in args.algorithms.split(','):
+        app, token, verifier = build_app(algorithm)
+        headers = {'Authorization': f'Bearer {token}'}
+        with app.test_client() as client:
+            timings = measure_routes(client, headers, args.requests, args.rounds)
+        baseline = timings['/noauth']
+        extended = timings['/jwt_extended']
+        cached = timings['/cached']
+
+        result = {
+            'algorithm': algorithm,
+            'baseline_us': round(baseline, 1),
+            'jwt_extended_overhead_us': round(extended - baseline, 1),
+            'cached_overhead_us': round(cached - baseline, 1),
+            'cache_hits': verifier.hits,
+            'cache_misses': verifier.misses,
+        }
+        results.append(result)
+        print(f"{algorithm}: без авторизации {result['baseline_us']} мкс/запрос, "
+              f"flask-jwt-extended {result['jwt_extended_overhead_us']:+} мкс, "
+              f"кэш {result['cached_overhead_us']:+} мкс")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as file:
+            json.dump(results, file, ensure_ascii=False, indent=2)
+
+
+if __name__ == '__main__':
+    main()
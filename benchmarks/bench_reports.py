@@ -0,0 +1,359 @@
+"""
+Сквозной нагрузочный тест отчетов лабораторных.
+
+Поднимает стек (docker compose), при необходимости заполняет базы набором
+нужного размера, нагружает /api/lab1/report, /api/lab2/report и
+/api/lab3/report напрямую и через шлюз с фиксированной параллельностью или
+частотой запросов и дописывает p50/p95/p99, пропускную способность и число
+обращений к каждой БД в историю (JSON Lines, одна запись на запуск).
+
+Шлюз кэширует одинаковые запросы, поэтому по умолчанию каждый запрос получает
+уникальное поле bench_request_id (лабораторные его игнорируют) и проходит
+в лабораторную. С --gateway-cache тела одинаковые и замеряется ответ из кэша;
+распределение заголовка X-Cache попадает в итог в любом режиме.
+
+Запуск:
+    export PYTHONPATH=.
+    python -m benchmarks.bench_reports --dataset small --up --concurrency 8 --duration 30
+    python -m benchmarks.bench_reports --rps 50 --targets gateway --compare
+"""
+import argparse
+import itertools
+import json
+import math
+import os
+import subprocess
+import sys
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+import requests
+from db_utils.instrumentation import parse_counts
+from db_utils.postgres.generate_synthetic_data import PRESETS
+
+HISTORY_PATH = os.path.join(os.path.dirname(__file__), 'history.jsonl')
+
+LAB_URLS = {
+    'lab1': os.getenv('BENCH_LAB1_URL', 'http://localhost:5001'),
+    'lab2': os.getenv('BENCH_LAB2_URL', 'http://localhost:5002'),
+    'lab3': os.getenv('BENCH_LAB3_URL', 'http://localhost:5003'),
+}
+GATEWAY_URL = os.getenv('BENCH_GATEWAY_URL', 'http://localhost:3001')
+GATEWAY_USER = {'username': 'vlad', 'password': 'supersecret'}
+
+# fixtures — данные из tables_data, остальные — параметры генератора синтетических данных
+DATASETS = {'fixtures': None, **PRESETS}
+
+# Тела запросов: для тестовых данных из tables_data и для синтетических
+PAYLOADS = {
+    'fixtures': {
+        'lab1': {'material': 'кинемати', 'start_date': '2023-09-01', 'end_date': '2023-12-16'},
+        'lab2': {'year': '2023', 'semester': 1},
+        'lab3': {'group_name': 'МЕХ-101'},
+    },
+    'synthetic': {
+        'lab1': {'material': 'механика', 'start_date': '2023-09-01', 'end_date': '2023-12-31'},
+        'lab2': {'year': '2023', 'semester': 1},
+        'lab3': {'group_name': 'ГР-100001'},
+    },
+}
+
+
+def percentile(sorted_values: list, q: float) -> float:
+    """Перцентиль методом ближайшего ранга"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(q / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'], text=True,
+            stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def start_stack(timeout: float) -> None:
+    """Поднимает контейнеры и ждет, пока сервисы ответят на /health и /api/token"""
+    subprocess.run(['docker', 'compose', 'up', '-d'], check=True)
+    deadline = time.monotonic() + timeout
+    pending = {f"{url}/health" for url in LAB_URLS.values()}
+    while pending or not gateway_token(quiet=True):
+        if time.monotonic() > deadline:
+            raise TimeoutError(f"Сервисы не поднялись за {timeout} с: {sorted(pending)}")
+        for url in list(pending):
+            try:
+                if requests.get(url, timeout=2).ok:
+                    pending.discard(url)
+            except requests.exceptions.RequestException:
+                pass
+        time.sleep(2)
+
+
+def prepare_dataset(name: str) -> None:
+    """Пересоздает таблицы и заполняет все базы выбранным набором"""
+    from db_utils.connections import create_postgres
+    from db_utils.postgres.create_postgres_tables import create_tables
+    from db_utils.postgres.drop_postgres_tables import drop_tables
+    from db_utils.postgres.generate_postgres_data import insert_data
+    from db_utils.postgres.generate_synthetic_data import (SyntheticDataGenerator,
+                                                           run_synchronizers)
+
+    drop_tables()
+    create_tables()
+    if DATASETS[name] is None:
+        insert_data()
+    else:
+        conn = create_postgres()
+        try:
+            SyntheticDataGenerator(**DATASETS[name]).load(conn)
+        finally:
+            conn.close()
+    run_synchronizers()
+
+
+def gateway_token(quiet: bool = False) -> str | None:
+    try:
+        response = requests.post(f"{GATEWAY_URL}/api/token", json=GATEWAY_USER, timeout=5)
+        response.raise_for_status()
+        return response.json()['access_token']
+    except (requests.exceptions.RequestException, KeyError, ValueError):
+        if not quiet:
+            raise
+        return None
+
+
+class LoadResult:
+    def __init__(self):
+        self.latencies = []
+        self.statuses = Counter()
+        self.backend_calls = Counter()
+        self.backend_time_ms = Counter()
+        self.cache = Counter()
+        self.lock = threading.Lock()
+
+    def add(self, latency: float, status: int, headers) -> None:
+        calls = parse_counts(headers.get('X-Backend-Calls')) if headers else {}
+        backend_time = parse_counts(headers.get('X-Backend-Time')) if headers else {}
+        # Ответы лабораторных напрямую заголовка X-Cache не имеют
+        cache_status = headers.get('X-Cache', 'NONE') if headers else 'NONE'
+        with self.lock:
+            self.latencies.append(latency)
+            self.statuses[status] += 1
+            self.backend_calls.update(calls)
+            self.backend_time_ms.update(backend_time)
+            self.cache[cache_status] += 1
+
+    def summary(self, elapsed: float) -> dict:
+        latencies = sorted(self.latencies)
+        count = len(latencies)
+        ok = sum(n for status, n in self.statuses.items() if 200 <= status < 300)
+        return {
+            'requests': count,
+            'errors': count - ok,
+            'statuses': {str(status): n for status, n in sorted(self.statuses.items())},
+            'cache': dict(sorted(self.cache.items())),
+            'throughput_rps': round(count / elapsed, 2) if elapsed else 0,
+            'latency_ms': {
+                'mean': round(sum(latencies) / count * 1000, 2) if count else 0,
+                'p50': round(percentile(latencies, 50) * 1000, 2),
+                'p95': round(percentile(latencies, 95) * 1000, 2),
+                'p99': round(percentile(latencies, 99) * 1000, 2),
+                'max': round(latencies[-1] * 1000, 2) if count else 0,
+            },
+            'backend_calls_per_request': {
+                backend: round(calls / count, 2) for backend, calls in sorted(self.backend_calls.items())
+            } if count else {},
+            'backend_time_ms_per_request': {
+                backend: round(value / count, 2) for backend, value in sorted(self.backend_time_ms.items())
+            } if count else {},
+        }
+
+
+def run_load(url: str, payload: dict, headers: dict, concurrency: int,
+             duration: float, rps: float | None, unique_bodies: bool = True) -> dict:
+    """
+    Нагружает один маршрут.
+
+    Без rps — замкнутый цикл: concurrency клиентов шлют запросы друг за другом.
+    С rps — открытый цикл: запросы отправляются по расписанию, а задержка
+    считается от запланированного момента, чтобы очередь не скрывала замедление.
+
+    :param unique_bodies: Добавлять в тело уникальный bench_request_id, чтобы кэш
+        шлюза не отвечал вместо лабораторной
+    """
+    result = LoadResult()
+    local = threading.local()
+    shared_body = json.dumps(payload).encode('utf-8')
+    request_ids = itertools.count()
+    request_headers = {'Content-Type': 'application/json', **headers}
+
+    def send(scheduled: float) -> None:
+        session = getattr(local, 'session', None)
+        if session is None:
+            session = local.session = requests.Session()
+        if unique_bodies:
+            body = json.dumps({**payload, 'bench_request_id': next(request_ids)}).encode('utf-8')
+        else:
+            body = shared_body
+        try:
+            response = session.post(url, data=body, headers=request_headers, timeout=60)
+            status, response_headers = response.status_code, response.headers
+        except requests.exceptions.RequestException:
+            status, response_headers = 599, None
+        result.add(time.perf_counter() - scheduled, status, response_headers)
+
+    started = time.perf_counter()
+    deadline = started + duration
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        if rps:
+            interval = 1 / rps
+            n = 0
+            while True:
+                scheduled = started + n * interval
+                if scheduled >= deadline:
+                    break
+                delay = scheduled - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                executor.submit(send, scheduled)
+                n += 1
+        else:
+            def worker():
+                while time.perf_counter() < deadline:
+                    send(time.perf_counter())
+            for _ in range(concurrency):
+                executor.submit(worker)
+    return result.summary(time.perf_counter() - started)
+
+
+def find_baseline(history_path: str, run: dict) -> dict | None:
+    """Последний запуск с тем же набором данных и режимом нагрузки"""
+    if not os.path.exists(history_path):
+        return None
+    keys = ('dataset', 'concurrency', 'rps', 'gateway_cache')
+    baseline = None
+    with open(history_path, encoding='utf-8') as file:
+        for line in file:
+            if not line.strip():
+                continue
+            previous = json.loads(line)
+            if all(previous.get(key) == run[key] for key in keys):
+                baseline = previous
+    return baseline
+
+
+def compare(baseline: dict, run: dict, threshold: float) -> list:
+    """Регрессии p95 и пропускной способности относительно предыдущего запуска"""
+    regressions = []
+    for name, current in run['results'].items():
+        previous = baseline['results'].get(name)
+        if not previous or not previous['requests']:
+            continue
+        old_p95, new_p95 = previous['latency_ms']['p95'], current['latency_ms']['p95']
+        if old_p95 and new_p95 > old_p95 * (1 + threshold):
+            regressions.append(f"{name}: p95 {old_p95} -> {new_p95} мс")
+        old_rps, new_rps = previous['throughput_rps'], current['throughput_rps']
+        if old_rps and new_rps < old_rps * (1 - threshold):
+            regressions.append(f"{name}: throughput {old_rps} -> {new_rps} rps")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Нагрузочный тест отчетов лабораторных')
+    parser.add_argument('--dataset', choices=list(DATASETS), default='fixtures',
+                        help='Набор данных, для которого выбираются тела запросов')
+    parser.add_argument('--prepare', action='store_true',
+                        help='Пересоздать и заполнить базы выбранным набором перед тестом')
+    parser.add_argument('--up', action='store_true', help='Поднять стек через docker compose')
+    parser.add_argument('--startup-timeout', type=float, default=300)
+    parser.add_argument('--labs', default='lab1,lab2,lab3')
+    parser.add_argument('--lab1-modes', default='polyglot',
+                        help='Режимы отчета lab1 через запятую (polyglot, pg)')
+    parser.add_argument('--targets', default='direct,gateway',
+                        help='direct — сервисы лабораторных, gateway — через шлюз')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--rps', type=float, help='Фиксированная частота запросов')
+    parser.add_argument('--duration', type=float, default=20, help='Секунд на маршрут')
+    parser.add_argument('--warmup', type=float, default=3, help='Секунд прогрева на маршрут')
+    parser.add_argument('--history', default=HISTORY_PATH)
+    parser.add_argument('--compare', action='store_true',
+                        help='Сравнить с прошлым запуском и вернуть код 1 при регрессии')
+    parser.add_argument('--regression-threshold', type=float, default=0.2)
+    parser.add_argument('--gateway-cache', action='store_true',
+                        help='Слать одинаковые тела и замерять ответы из кэша шлюза')
+    args = parser.parse_args()
+
+    if args.up:
+        start_stack(args.startup_timeout)
+    if args.prepare:
+        prepare_dataset(args.dataset)
+
+    payloads = PAYLOADS['fixtures' if args.dataset == 'fixtures' else 'synthetic']
+    targets = args.targets.split(',')
+    # Токен шлюза передается и напрямую: лабораторные могут проверять его сами (LAB_JWT_VERIFY)
+    token = gateway_token(quiet='gateway' not in targets)
+
+    # Режим polyglot — прежнее поведение lab1, его результаты хранятся под прежним ключом
+    routes = []
+    for lab in args.labs.split(','):
+        modes = args.lab1_modes.split(',') if lab == 'lab1' else ['polyglot']
+        for mode in modes:
+            payload = payloads[lab] if mode == 'polyglot' else {**payloads[lab], 'mode': mode}
+            routes.append((lab, lab if mode == 'polyglot' else f"{lab}[{mode}]", payload))
+
+    results = {}
+    for lab, name, payload in routes:
+        for target in targets:
+            base_url = GATEWAY_URL if target == 'gateway' else LAB_URLS[lab]
+            url = f"{base_url}/api/{lab}/report"
+            headers = {'Authorization': f'Bearer {token}'} if token else {}
+            unique_bodies = not args.gateway_cache
+            if args.warmup:
+                run_load(url, payload, headers, args.concurrency, args.warmup, args.rps, unique_bodies)
+            summary = run_load(url, payload, headers, args.concurrency,
+                               args.duration, args.rps, unique_bodies)
+            results[f"{name}:{target}"] = summary
+            latency = summary['latency_ms']
+            print(f"{name} ({target}): {summary['throughput_rps']} rps, "
+                  f"p50 {latency['p50']} мс, p95 {latency['p95']} мс, p99 {latency['p99']} мс, "
+                  f"ошибок {summary['errors']}, БД/запрос {summary['backend_calls_per_request']}, "
+                  f"X-Cache {summary['cache']}")
+
+    run = {
+        'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'commit': git_commit(),
+        'dataset': args.dataset,
+        'dataset_params': DATASETS[args.dataset],
+        'concurrency': args.concurrency,
+        'rps': args.rps,
+        'gateway_cache': args.gateway_cache,
+        'duration': args.duration,
+        'results': results,
+    }
+
+    regressions = []
+    if args.compare:
+        baseline = find_baseline(args.history, run)
+        if baseline is None:
+            print('Нет предыдущего запуска для сравнения')
+        else:
+            regressions = compare(baseline, run, args.regression_threshold)
+            run['baseline_commit'] = baseline.get('commit')
+            run['regressions'] = regressions
+
+    with open(args.history, 'a', encoding='utf-8') as file:
+        file.write(json.dumps(run, ensure_ascii=False) + '\n')
+
+    if regressions:
+        print('Обнаружены регрессии:', *regressions, sep='\n  ')
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
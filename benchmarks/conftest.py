@@ -0,0 +1,19 @@
+import importlib.util
+import pytest
+
+# Без pytest-benchmark микробенчмарки не собираются (например, в test-apis.sh)
+if importlib.util.find_spec('pytest_benchmark') is None:
+    collect_ignore_glob = ['test_*.py']
+
+
+def pytest_addoption(parser):
+    parser.addoption(
+        '--bench-datasets', default='current',
+        help="Наборы данных через запятую (fixtures, small, medium, large); "
+             "current — использовать данные, уже загруженные в базы")
+
+
+def pytest_generate_tests(metafunc):
+    if 'dataset' in metafunc.fixturenames:
+        datasets = metafunc.config.getoption('--bench-datasets').split(',')
+        metafunc.parametrize('dataset', datasets, indirect=True, scope='session')
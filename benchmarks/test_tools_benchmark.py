@@ -0,0 +1,249 @@
+"""
+Микробенчмарки горячих методов инструментов db_utils.
+
+Каждый метод замеряется отдельно на одних и тех же входных данных, которые
+выбираются из Postgres для текущего набора (самая большая группа, ее
+расписание и студенты). Результаты группируются по методу, поэтому видно,
+какое хранилище доминирует в отчете и как оно растет с объемом данных.
+
+Запуск (нужен pytest-benchmark и поднятые базы):
+    export PYTHONPATH=.
+    python -m pytest benchmarks/test_tools_benchmark.py --bench-datasets small,medium \\
+        --benchmark-group-by=group,param:dataset --benchmark-json=benchmarks/tools.json
+"""
+import psycopg2
+import pytest
+from db_utils.connections import create_postgres, get_elastic, get_neo4j
+from db_utils.elastic.elastic_tool import ElasticTool
+from db_utils.mongo.mongo_tool import MongoTool
+from db_utils.neo4j.neo4j_tool import Neo4jTool
+from db_utils.postgres.postgres_tool import PostgresTool
+from db_utils.redis.redis_tool import RedisTool
+
+
+@pytest.fixture(scope='session')
+def dataset(request):
+    """Загружает набор данных в базы (current — оставить как есть)"""
+    if request.param != 'current':
+        from benchmarks.bench_reports import prepare_dataset
+        prepare_dataset(request.param)
+    return request.param
+
+
+@pytest.fixture(scope='session')
+def sample(dataset):
+    """Входные данные методов и размеры таблиц для текущего набора"""
+    try:
+        conn = create_postgres()
+    except psycopg2.OperationalError as e:
+        pytest.skip(f"Postgres недоступен: {e}")
+
+    try:
+        with conn.cursor() as cur:
+            cur.execute("""
+                SELECT g.id, g.department_id
+                FROM Student_Groups g JOIN Students s ON s.group_id = g.id
+                GROUP BY g.id ORDER BY COUNT(*) DESC, g.id LIMIT 1
+            """)
+            row = cur.fetchone()
+            if row is None:
+                pytest.skip('В базе нет данных')
+            group_id, department_id = row
+
+            cur.execute("SELECT id FROM Students WHERE group_id = %s ORDER BY id", (group_id,))
+            student_ids = [student_id for student_id, in cur.fetchall()]
+
+            cur.execute("""
+                SELECT id, class_id, scheduled_date FROM Schedule
+                WHERE group_id = %s ORDER BY scheduled_date, id
+            """, (group_id,))
+            schedules = cur.fetchall()
+            class_ids = sorted({class_id for _, class_id, _ in schedules})
+            start_date, end_date = schedules[0][2], schedules[-1][2]
+
+            # Ожидаемые ответы: методы других баз должны вернуть то же, что лежит в Postgres
+            cur.execute("""
+                SELECT COUNT(*) FROM Schedule sch JOIN Class c ON c.id = sch.class_id
+                WHERE sch.class_id = ANY(%s) AND c.type = 'лекция'
+                  AND sch.scheduled_date BETWEEN %s AND %s
+            """, (class_ids, start_date, end_date))
+            lecture_count = cur.fetchone()[0]
+            if not lecture_count:
+                pytest.skip(f"У группы {group_id} нет лекций")
+
+            cur.execute("""
+                SELECT COUNT(*) FROM Attendance
+                WHERE student_id = %s AND schedule_id = ANY(%s)
+            """, (student_ids[0], [schedule_id for schedule_id, _, _ in schedules]))
+            attendance_count = cur.fetchone()[0]
+
+            cur.execute("SELECT content FROM Class_Materials WHERE class_id = %s",
+                        (schedules[0][1],))
+            content = cur.fetchone()[0]
+
+            cur.execute("SELECT name FROM Departments WHERE id = %s", (department_id,))
+            department_name = cur.fetchone()[0]
+
+            sizes = {}
+            for table_name in ('Students', 'Schedule', 'Attendance', 'Class_Materials'):
+                cur.execute(f"SELECT COUNT(*) FROM {table_name}")
+                sizes[table_name] = cur.fetchone()[0]
+    finally:
+        conn.close()
+
+    # Префикс самого длинного слова материала, как в запросах первой лабораторной
+    term = max(content.split(), key=len).strip('.,:;()')[:8]
+    return {
+        'dataset': dataset,
+        'sizes': sizes,
+        'group_id': group_id,
+        'department_id': department_id,
+        'department_name': department_name,
+        'student_ids': student_ids,
+        'schedule_ids': [schedule_id for schedule_id, _, _ in schedules],
+        'class_ids': class_ids,
+        'start_date': start_date.isoformat(),
+        'end_date': end_date.isoformat(),
+        'lecture_count': lecture_count,
+        'attendance_count': attendance_count,
+        'term': term,
+    }
+
+
+@pytest.fixture(scope='session')
+def tools(sample):
+    """
+    Инструменты создаются один раз. Postgres, Redis и MongoDB получают клиент
+    в __init__, а Elastic и Neo4j берут общий клиент db_utils.connections
+    в каждом вызове — он создается здесь, чтобы в первый замер не попало подключение
+    """
+    get_elastic()
+    get_neo4j()
+    return {
+        'elastic': ElasticTool(),
+        'mongo': MongoTool(),
+        'neo4j': Neo4jTool(),
+        'postgres': PostgresTool(),
+        'redis': RedisTool(),
+    }
+
+
+_NON_EMPTY = object()
+
+
+def run(benchmark, sample, group: str, method, *args, expected=_NON_EMPTY, **kwargs):
+    """
+    Замеряет метод и проверяет ответ: методы при ошибке возвращают пустой
+    результат, и без проверки замерялась бы ошибка, а не запрос
+
+    :param expected: Ожидаемый ответ; по умолчанию достаточно непустого
+    """
+    benchmark.group = group
+    benchmark.extra_info.update(dataset=sample['dataset'], **sample['sizes'])
+    result = benchmark(method, *args, **kwargs)
+    if expected is _NON_EMPTY:
+        assert result, f"{group} вернул пустой ответ"
+    else:
+        assert result == expected
+    return result
+
+
+def test_elastic_search_materials_by_content(benchmark, tools, sample):
+    result = run(benchmark, sample, 'elastic.search_materials_by_content',
+                 tools['elastic'].search_materials_by_content, sample['term'])
+    benchmark.extra_info['results'] = len(result)
+
+
+def test_elastic_search_class_ids_by_content(benchmark, tools, sample):
+    result = run(benchmark, sample, 'elastic.search_class_ids_by_content',
+                 tools['elastic'].search_class_ids_by_content, sample['term'])
+    benchmark.extra_info['results'] = len(result)
+
+
+def test_neo4j_find_lecture_schedules(benchmark, tools, sample):
+    result = run(benchmark, sample, 'neo4j.find_lecture_schedules',
+                 tools['neo4j'].find_lecture_schedules,
+                 class_ids=sample['class_ids'],
+                 start_date=sample['start_date'], end_date=sample['end_date'])
+    assert len(result) == sample['lecture_count']
+    benchmark.extra_info['results'] = len(result)
+
+
+def test_neo4j_find_students_and_lectures(benchmark, tools, sample):
+    result = run(benchmark, sample, 'neo4j.find_students_and_lectures',
+                 tools['neo4j'].find_students_and_lectures,
+                 start_date=sample['start_date'], end_date=sample['end_date'])
+    benchmark.extra_info['results'] = len(result)
+
+
+def test_neo4j_find_special_lectures_and_course_of_lectures(benchmark, tools, sample):
+    # Лекций с тэгом кафедры у группы может не быть, поэтому проверяется только отсутствие ошибки
+    benchmark.group = 'neo4j.find_special_lectures_and_course_of_lectures'
+    benchmark.extra_info.update(dataset=sample['dataset'], **sample['sizes'])
+    result = benchmark(tools['neo4j'].find_special_lectures_and_course_of_lectures,
+                       group_id=sample['group_id'], special_tag=sample['department_name'])
+    assert isinstance(result, list)
+    benchmark.extra_info['results'] = len(result)
+
+
+def test_redis_get_students_info_by_group_id(benchmark, tools, sample):
+    result = run(benchmark, sample, 'redis.get_students_info_by_group_id',
+                 tools['redis'].get_students_info_by_group_id, group_id=sample['group_id'])
+    assert [student['id'] for student in result] == sample['student_ids']
+    benchmark.extra_info['results'] = len(result)
+
+
+def test_redis_get_student_count_by_group_id(benchmark, tools, sample):
+    run(benchmark, sample, 'redis.get_student_count_by_group_id',
+        tools['redis'].get_student_count_by_group_id, group_id=sample['group_id'],
+        expected=len(sample['student_ids']))
+
+
+def test_postgres_get_students_with_lowest_attendance(benchmark, tools, sample):
+    result = run(benchmark, sample, 'postgres.get_students_with_lowest_attendance',
+                 tools['postgres'].get_students_with_lowest_attendance,
+                 schedule_ids=sample['schedule_ids'], students_ids=sample['student_ids'])
+    assert len(result) == min(10, len(sample['student_ids']))
+    benchmark.extra_info['results'] = len(result)
+
+
+def test_postgres_get_student_attendance(benchmark, tools, sample):
+    run(benchmark, sample, 'postgres.get_student_attendance',
+        tools['postgres'].get_student_attendance,
+        sample['student_ids'][0], sample['schedule_ids'], expected=sample['attendance_count'])
+
+
+def test_postgres_get_lecture_schedules(benchmark, tools, sample):
+    result = run(benchmark, sample, 'postgres.get_lecture_schedules',
+                 tools['postgres'].get_lecture_schedules,
+                 class_ids=sample['class_ids'],
+                 start_date=sample['start_date'], end_date=sample['end_date'])
+    assert len(result) == sample['lecture_count']
+    benchmark.extra_info['results'] = len(result)
+
+
+def test_postgres_get_students_info_by_group_id(benchmark, tools, sample):
+    result = run(benchmark, sample, 'postgres.get_students_info_by_group_id',
+                 tools['postgres'].get_students_info_by_group_id, group_id=sample['group_id'])
+    assert [student['id'] for student in result] == sample['student_ids']
+    benchmark.extra_info['results'] = len(result)
+
+
+def test_postgres_get_department_name_by_id(benchmark, tools, sample):
+    run(benchmark, sample, 'postgres.get_department_name_by_id',
+        tools['postgres'].get_department_name_by_id, department_id=sample['department_id'],
+        expected=sample['department_name'])
+
+
+def test_postgres_get_lecture_attendance_report(benchmark, tools, sample):
+    result = run(benchmark, sample, 'postgres.get_lecture_attendance_report',
+                 tools['postgres'].get_lecture_attendance_report,
+                 class_ids=sample['class_ids'],
+                 start_date=sample['start_date'], end_date=sample['end_date'])
+    benchmark.extra_info['results'] = len(result)
+
+
+def test_mongo_get_department_name_by_id(benchmark, tools, sample):
+    run(benchmark, sample, 'mongo.get_department_name_by_id',
+        tools['mongo'].get_department_name_by_id, department_id=sample['department_id'],
+        expected=sample['department_name'])
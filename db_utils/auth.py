@@ -0,0 +1,188 @@
+import hmac
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+import jwt
+from flask import g, jsonify, request
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+JWT_ALGORITHM = os.getenv('JWT_ALGORITHM', 'HS256')
+JWT_SECRET_KEY = os.getenv('JWT_SECRET_KEY', 'super-secret-key')
+# PEM-файлы ключей для RS*/PS*/ES*/EdDSA. Сервисам, которые только проверяют
+# токены (лабораторные), достаточно открытого ключа.
+JWT_PRIVATE_KEY_PATH = os.getenv('JWT_PRIVATE_KEY_PATH')
+JWT_PUBLIC_KEY_PATH = os.getenv('JWT_PUBLIC_KEY_PATH')
+JWT_CACHE_SIZE = int(os.getenv('JWT_CACHE_SIZE', '10000'))
+JWT_LEEWAY = int(os.getenv('JWT_LEEWAY', '0'))
+# Токен служебных маршрутов сервисов (/api/admin/...); без него маршруты отключены
+ADMIN_TOKEN = os.getenv('ADMIN_TOKEN')
+
+
+def _read_file(path: str) -> bytes:
+    with open(path, 'rb') as file:
+        return file.read()
+
+
+def load_keys(algorithm: str = JWT_ALGORITHM) -> tuple:
+    """
+    Загружает ключи один раз при старте. Асимметричные ключи сразу разбираются
+    в объекты cryptography, чтобы не парсить PEM при каждой проверке.
+
+    :param algorithm: Алгоритм подписи (HS256, RS256, ES256, ...)
+    :return: Кортеж (ключ подписи или None, ключ проверки)
+    """
+    if algorithm.startswith('HS'):
+        return JWT_SECRET_KEY, JWT_SECRET_KEY
+
+    implementation = jwt.get_algorithm_by_name(algorithm)
+    private_key = None
+    if JWT_PRIVATE_KEY_PATH:
+        private_key = implementation.prepare_key(_read_file(JWT_PRIVATE_KEY_PATH))
+
+    if JWT_PUBLIC_KEY_PATH:
+        public_key = implementation.prepare_key(_read_file(JWT_PUBLIC_KEY_PATH))
+    elif private_key is not None:
+        public_key = private_key.public_key()
+    else:
+        raise ValueError(
+            f"Для алгоритма {algorithm} нужен JWT_PUBLIC_KEY_PATH или JWT_PRIVATE_KEY_PATH")
+
+    logger.info(f"Загружены ключи JWT для алгоритма {algorithm}")
+    return private_key, public_key
+
+
+class TokenVerifier:
+    def __init__(self, algorithm: str, key, max_entries: int = JWT_CACHE_SIZE,
+                 leeway: int = JWT_LEEWAY):
+        """
+        Проверка JWT с ограниченным LRU-кэшем уже проверенных подписей.
+        Повторный токен проверяется сравнением строк и exp, без криптографии.
+
+        :param algorithm: Алгоритм подписи
+        :param key: Ключ проверки (секрет HS* или открытый ключ)
+        :param max_entries: Максимум токенов в кэше
+        :param leeway: Допуск по времени для exp/nbf в секундах
+        """
+        self.algorithm = algorithm
+        self.key = key
+        self.max_entries = max_entries
+        self.leeway = leeway
+        self.cache = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def from_env(cls):
+        _, public_key = load_keys(JWT_ALGORITHM)
+        return cls(JWT_ALGORITHM, public_key)
+
+    def verify(self, token: str) -> dict:
+        """
+        Проверяет токен и возвращает его claims
+
+        :raises jwt.InvalidTokenError: если токен некорректен или истек
+        """
+        signing_input, _, signature = token.rpartition('.')
+        if not signing_input:
+            raise jwt.DecodeError('Not enough segments')
+
+        with self.lock:
+            cached = self.cache.get(signature)
+            if cached is not None and cached[0] == signing_input:
+                claims = cached[1]
+                exp = claims.get('exp')
+                if exp is None or time.time() < exp + self.leeway:
+                    self.cache.move_to_end(signature)
+                    self.hits += 1
+                    return claims
+                del self.cache[signature]
+
+        claims = jwt.decode(token, self.key, algorithms=[self.algorithm],
+                            leeway=self.leeway)
+
+        with self.lock:
+            self.misses += 1
+            self.cache[signature] = (signing_input, claims)
+            self.cache.move_to_end(signature)
+            while len(self.cache) > self.max_entries:
+                self.cache.popitem(last=False)
+        return claims
+
+    def required(self, view):
+        """
+        Декоратор Flask-представления: требует access-токен в заголовке Authorization.
+        Коды и тексты ошибок совпадают с flask-jwt-extended.
+        """
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            error = self.check_request()
+            if error is not None:
+                return error
+            return view(*args, **kwargs)
+        return wrapper
+
+    def check_request(self):
+        """
+        Проверяет токен текущего запроса и сохраняет claims в g.jwt_claims
+
+        :return: None при успехе, иначе ответ Flask с ошибкой
+        """
+        header = request.headers.get('Authorization', '')
+        scheme, _, token = header.partition(' ')
+        if not header:
+            return jsonify({'msg': 'Missing Authorization Header'}), 401
+        if scheme != 'Bearer' or not token:
+            return jsonify({'msg': "Bad Authorization header. Expected 'Authorization: Bearer <JWT>'"}), 422
+
+        try:
+            claims = self.verify(token)
+        except jwt.ExpiredSignatureError:
+            return jsonify({'msg': 'Token has expired'}), 401
+        except jwt.InvalidTokenError as e:
+            return jsonify({'msg': str(e)}), 422
+
+        if claims.get('type', 'access') != 'access':
+            return jsonify({'msg': 'Only non-refresh tokens are allowed'}), 422
+        g.jwt_claims = claims
+        return None
+
+
+def admin_required(view):
+    """Декоратор служебного маршрута: нужен заголовок X-Admin-Token, равный ADMIN_TOKEN"""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if not ADMIN_TOKEN:
+            return jsonify({'error': 'Служебные маршруты отключены: не задан ADMIN_TOKEN'}), 404
+        token = request.headers.get('X-Admin-Token', '')
+        if not hmac.compare_digest(token.encode(), ADMIN_TOKEN.encode()):
+            return jsonify({'error': 'Неверный X-Admin-Token'}), 403
+        return view(*args, **kwargs)
+    return wrapper
+
+
+def protect_app(app, exempt: tuple = ('/health', '/metrics')) -> None:
+    """
+    Включает локальную проверку JWT во всех маршрутах сервиса, если задано
+    LAB_JWT_VERIFY=1. Токен проверяется открытым ключом без обращения к шлюзу.
+    """
+    if os.getenv('LAB_JWT_VERIFY', '0') != '1':
+        return
+
+    verifier = TokenVerifier.from_env()
+
+    @app.before_request
+    def verify_token():
+        if request.path in exempt:
+            return None
+        return verifier.check_request()
+
+    logger.info("Включена проверка JWT для всех запросов")
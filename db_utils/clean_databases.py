@@ -1,9 +1,6 @@
-import psycopg2
-from pymongo import MongoClient
-from neo4j import GraphDatabase
-from elasticsearch import Elasticsearch
-import redis
 import logging
+from db_utils.connections import (MONGO_DB_NAME, create_elastic, create_mongo, create_neo4j,
+                                  create_postgres, create_redis)
 
 # logging setup
 logging.basicConfig(
@@ -13,9 +10,14 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 class DatabaseCleaner:
-    def __init__(self, config):
-        """Инициализация подключений ко всем базам данных"""
-        self.config = config
+    def __init__(self, config=None):
+        """
+        Инициализация подключений ко всем базам данных
+
+        :param config: Параметры подключения по базам ({'redis': {'port': 6380}, ...}),
+            дополняющие настройки db_utils.connections
+        """
+        self.config = config or {}
         self.connections = {
             'postgres': None,
             'mongo': None,
@@ -29,73 +31,31 @@ class DatabaseCleaner:
         try:
             # PostgreSQL
             logger.info("Подключаемся к PostgreSQL...")
-            self.connections['postgres'] = psycopg2.connect(
-                dbname=self.config['postgres']['dbname'],
-                user=self.config['postgres']['user'],
-                password=self.config['postgres']['password'],
-                host=self.config['postgres']['host'],
-                port=self.config['postgres']['port']
-            )
-            
+            self.connections['postgres'] = create_postgres(**self.config.get('postgres', {}))
+
             # MongoDB
             logger.info("Подключаемся к MongoDB...")
-            mongo_auth = {}
-            if 'username' in self.config['mongo']:
-                mongo_auth['username'] = self.config['mongo']['username']
-            if 'password' in self.config['mongo']:
-                mongo_auth['password'] = self.config['mongo']['password']
-                
-            self.connections['mongo'] = MongoClient(
-                host=self.config['mongo']['host'],
-                port=self.config['mongo']['port'],
-                **mongo_auth
-            )[self.config['mongo']['dbname']]
-            
+            mongo_config = dict(self.config.get('mongo', {}))
+            dbname = mongo_config.pop('dbname', MONGO_DB_NAME)
+            self.connections['mongo'] = create_mongo(**mongo_config)[dbname]
+
             # Neo4j
             logger.info("Подключаемся к Neo4j...")
-            self.connections['neo4j'] = GraphDatabase.driver(
-                self.config['neo4j']['uri'],
-                auth=(
-                    self.config['neo4j']['user'],
-                    self.config['neo4j']['password']
-                )
-            )
-            
+            self.connections['neo4j'] = create_neo4j(**self.config.get('neo4j', {}))
+
             # ElasticSearch
             logger.info("Подключаемся к ElasticSearch...")
-            es_host = self.config['elastic']['host']
-            if not es_host.startswith(('http://', 'https://')):
-                es_host = f"http://{es_host}"
-                
-            es_auth = None
-            if 'user' in self.config['elastic'] and 'password' in self.config['elastic']:
-                es_auth = (
-                    self.config['elastic']['user'],
-                    self.config['elastic']['password']
-                )
-                
-            self.connections['elastic'] = Elasticsearch(
-                hosts=[es_host],
-                http_auth=es_auth,
-                verify_certs=False  # Для разработки, в production следует использовать True
-            )
-            
+            self.connections['elastic'] = create_elastic(**self.config.get('elastic', {}))
+
             if not self.connections['elastic'].ping():
                 raise ConnectionError("Не удалось подключиться к Elasticsearch")
-            
+
             # Redis
             logger.info("Подключаемся к Redis...")
-            redis_kwargs = {
-                'host': self.config['redis']['host'],
-                'port': self.config['redis']['port'],
-                'db': self.config['redis'].get('db', 0)
-            }
-            if 'password' in self.config['redis']:
-                redis_kwargs['password'] = self.config['redis']['password']
-                
-            self.connections['redis'] = redis.Redis(**redis_kwargs)
+            self.connections['redis'] = create_redis(
+                **{'decode_responses': False, **self.config.get('redis', {})})
             self.connections['redis'].ping()  # Проверка подключения
-            
+
             logger.info("Все подключения установлены успешно")
             return True
             
@@ -271,38 +231,7 @@ class DatabaseCleaner:
 
 
 if __name__ == "__main__":
-    config = {
-        'postgres': {
-            'dbname': 'postgres_db',
-            'user': 'postgres_user',
-            'password': 'postgres_password',
-            'host': 'localhost',
-            'port': 5430
-        },
-        'mongo': {
-            'host': 'localhost',
-            'port': 27017,
-            'dbname': 'university_db',
-            'username': 'admin',
-            'password': 'secret'
-        },
-        'neo4j': {
-            'uri': 'bolt://localhost:7687',
-            'user': 'neo4j',
-            'password': 'strongpassword'
-        },
-        'elastic': {
-            'host': 'localhost:9200',
-            'user': 'elastic',
-            'password': 'secret'
-        },
-        'redis': {
-            'host': 'localhost',
-            'port': 6379
-        }
-    }
-
-    cleaner = DatabaseCleaner(config)
+    cleaner = DatabaseCleaner()
     if cleaner.clean_all_databases():
         logger.info("Очистка всех баз данных завершена успешно!")
     else:
@@ -0,0 +1,214 @@
+"""
+Единая точка подключения ко всем базам данных.
+
+Параметры берутся из переменных окружения с теми же именами, что в env.py
+(DB_HOST, REDIS_PORT, NEO4J_URI, ...), а значения из env.py используются
+по умолчанию. Драйверы импортируются только при первом обращении к своей
+базе, поэтому сервис, которому нужны две базы, не загружает остальные.
+
+create_* создают новый клиент, который закрывает вызывающий код
+(скрипты и синхронизаторы). get_* и postgres_connection возвращают общий
+для процесса клиент или пул; после fork в воркере gunicorn они создаются
+заново.
+"""
+import logging
+import os
+import threading
+from contextlib import contextmanager
+import env
+from db_utils.worker_hooks import on_post_fork
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+
+def _setting(name: str):
+    """Значение из окружения, иначе из env.py (с приведением к типу значения по умолчанию)"""
+    default = getattr(env, name)
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return type(default)(value)
+
+
+POSTGRES = {
+    'dbname': _setting('DB_NAME'),
+    'user': _setting('DB_USER'),
+    'password': _setting('DB_PASSWORD'),
+    'host': _setting('DB_HOST'),
+    'port': _setting('DB_PORT'),
+}
+MONGO = {
+    'host': _setting('MONGO_URI'),
+    'username': _setting('MONGO_USERNAME'),
+    'password': _setting('MONGO_PASSWORD'),
+}
+MONGO_DB_NAME = _setting('MONGO_DB_NAME')
+REDIS = {
+    'host': _setting('REDIS_HOST'),
+    'port': _setting('REDIS_PORT'),
+}
+NEO4J = {
+    'uri': _setting('NEO4J_URI'),
+    'auth': (_setting('NEO4J_USER'), _setting('NEO4J_PASSWORD')),
+}
+ELASTIC = {
+    'host': _setting('ES_HOST'),
+    'port': _setting('ES_PORT'),
+    'basic_auth': (_setting('ES_USER'), _setting('ES_PASSWORD')),
+}
+
+# Размеры пулов общих клиентов (на один процесс)
+PG_POOL_MIN = int(os.getenv('PG_POOL_MIN', '1'))
+PG_POOL_MAX = int(os.getenv('PG_POOL_MAX', '8'))
+REDIS_MAX_CONNECTIONS = int(os.getenv('REDIS_MAX_CONNECTIONS', '16'))
+MONGO_MAX_POOL_SIZE = int(os.getenv('MONGO_MAX_POOL_SIZE', '16'))
+NEO4J_MAX_POOL_SIZE = int(os.getenv('NEO4J_MAX_POOL_SIZE', '16'))
+ELASTIC_MAX_CONNECTIONS = int(os.getenv('ELASTIC_MAX_CONNECTIONS', '16'))
+
+
+def create_postgres(**overrides):
+    """Новое соединение psycopg2"""
+    import psycopg2
+    return psycopg2.connect(**{**POSTGRES, **overrides})
+
+
+def create_mongo(**overrides):
+    """Новый MongoClient"""
+    from pymongo import MongoClient
+    return MongoClient(**{**MONGO, **overrides})
+
+
+def create_redis(**overrides):
+    """Новый клиент Redis (по умолчанию ответы декодируются в str)"""
+    import redis
+    return redis.Redis(**{**REDIS, 'decode_responses': True, **overrides})
+
+
+def create_neo4j(**overrides):
+    """Новый драйвер Neo4j"""
+    from neo4j import GraphDatabase
+    settings = {**NEO4J, **overrides}
+    return GraphDatabase.driver(settings.pop('uri'), **settings)
+
+
+def create_elastic(**overrides):
+    """Новый клиент Elasticsearch"""
+    from elasticsearch import Elasticsearch
+    settings = {**ELASTIC, 'verify_certs': False, **overrides}
+    hosts = [f"http://{settings.pop('host')}:{settings.pop('port')}"]
+    return Elasticsearch(hosts=hosts, **settings)
+
+
+_clients = {}
+_lock = threading.Lock()
+
+
+def _shared(name: str, factory):
+    client = _clients.get(name)
+    if client is None:
+        with _lock:
+            client = _clients.get(name)
+            if client is None:
+                client = _clients[name] = factory()
+                logger.info(f"Создан общий клиент {name} (pid {os.getpid()})")
+    return client
+
+
+def postgres_pool():
+    """Общий пул соединений PostgreSQL"""
+    def factory():
+        from psycopg2.pool import ThreadedConnectionPool
+        return ThreadedConnectionPool(PG_POOL_MIN, PG_POOL_MAX, **POSTGRES)
+    return _shared('postgres', factory)
+
+
+@contextmanager
+def postgres_connection():
+    """
+    Соединение из общего пула на время блока. Незавершенная транзакция
+    откатывается, и соединение возвращается в пул чистым.
+    """
+    pool = postgres_pool()
+    conn = pool.getconn()
+    try:
+        yield conn
+    finally:
+        if not conn.closed:
+            conn.rollback()
+        pool.putconn(conn, close=bool(conn.closed))
+
+
+def get_mongo():
+    return _shared('mongo', lambda: create_mongo(maxPoolSize=MONGO_MAX_POOL_SIZE))
+
+
+def get_redis():
+    def factory():
+        import redis
+        pool = redis.ConnectionPool(**REDIS, decode_responses=True,
+                                    max_connections=REDIS_MAX_CONNECTIONS)
+        return redis.Redis(connection_pool=pool)
+    return _shared('redis', factory)
+
+
+def get_neo4j():
+    return _shared('neo4j', lambda: create_neo4j(max_connection_pool_size=NEO4J_MAX_POOL_SIZE))
+
+
+def get_elastic():
+    return _shared('elastic', lambda: create_elastic(connections_per_node=ELASTIC_MAX_CONNECTIONS))
+
+
+def pool_usage() -> dict:
+    """
+    Заполненность общих пулов PostgreSQL и Redis текущего процесса
+    (драйверы MongoDB, Neo4j и Elasticsearch своих счетчиков не открывают)
+
+    :return: {база: {'in_use': ..., 'idle': ..., 'max': ...}} для уже созданных пулов
+    """
+    usage = {}
+    pool = _clients.get('postgres')
+    if pool is not None:
+        usage['postgres'] = {'in_use': len(pool._used), 'idle': len(pool._pool), 'max': pool.maxconn}
+    client = _clients.get('redis')
+    if client is not None:
+        pool = client.connection_pool
+        usage['redis'] = {'in_use': len(pool._in_use_connections),
+                          'idle': len(pool._available_connections), 'max': pool.max_connections}
+    return usage
+
+
+def _close(name: str, client) -> None:
+    try:
+        if name == 'postgres':
+            client.closeall()
+        elif name == 'redis':
+            client.connection_pool.disconnect()
+        else:
+            client.close()
+    except Exception as e:
+        logger.warning(f"Ошибка закрытия клиента {name}: {e}")
+
+
+def reset_connections(close: bool = True) -> None:
+    """
+    Сбрасывает общие клиенты, следующие get_* создадут новые.
+
+    :param close: Закрыть соединения. После fork передается False: сокеты
+        унаследованы от мастера, и закрытие оборвало бы его сессии.
+    """
+    with _lock:
+        clients = list(_clients.items())
+        _clients.clear()
+    if close:
+        for name, client in clients:
+            _close(name, client)
+
+
+@on_post_fork
+def _reset_after_fork() -> None:
+    reset_connections(close=False)
@@ -1,14 +1,9 @@
 SETTINGS = {
     "analysis": {
-        "analyzer": {
-            "russian": {
-                "type": "custom",
-                "tokenizer": "standard",
-                "filter": [
-                    "lowercase",
-                        "stop",
-                        "snowball"
-                ]
+        "char_filter": {
+            "yo_to_ye": {
+                "type": "mapping",
+                "mappings": ["ё => е", "Ё => Е"]
             }
         },
         "filter": {
@@ -17,21 +12,72 @@ SETTINGS = {
                 "stopwords": "_russian_"
             },
             "russian_stemmer": {
-                "type": "snowball",
-                "language": "Russian"
+                "type": "stemmer",
+                "language": "russian"
+            },
+            "prefix_edge_ngram": {
+                "type": "edge_ngram",
+                "min_gram": 3,
+                "max_gram": 20
+            }
+        },
+        "analyzer": {
+            "russian": {
+                "type": "custom",
+                "char_filter": ["yo_to_ye"],
+                "tokenizer": "standard",
+                "filter": [
+                    "lowercase",
+                    "russian_stop",
+                    "russian_stemmer"
+                ]
+            },
+            # Начала слов от 3 до 20 символов для поиска по префиксу ("кинемати")
+            "russian_prefix": {
+                "type": "custom",
+                "char_filter": ["yo_to_ye"],
+                "tokenizer": "standard",
+                "filter": [
+                    "lowercase",
+                    "russian_stop",
+                    "prefix_edge_ngram"
+                ]
+            },
+            "russian_prefix_search": {
+                "type": "custom",
+                "char_filter": ["yo_to_ye"],
+                "tokenizer": "standard",
+                "filter": ["lowercase"]
             }
         }
     }
 }
 INDEX_NAME = "class_materials"
+# Меняется вместе с SETTINGS/MAPPINGS: индекс другой версии пересоздается при синхронизации
+INDEX_SCHEMA_VERSION = 3
+# Сколько class_id возвращает одна страница составной агрегации
+CLASS_ID_PAGE_SIZE = 1000
 MAPPINGS = {
+    "_meta": {"schema_version": INDEX_SCHEMA_VERSION},
     "properties": {
         "material_id": {"type": "integer"},
         "content": {
             "type": "text",
             "analyzer": "russian",
-            "fields": {"keyword": {"type": "keyword"}}
+            "fields": {
+                "keyword": {"type": "keyword", "ignore_above": 256},
+                "prefix": {
+                    "type": "text",
+                    "analyzer": "russian_prefix",
+                    "search_analyzer": "russian_prefix_search",
+                    "index_options": "docs"
+                }
+            }
         },
         "class_id": {"type": "integer"},
+        # Поля занятия (таблица Class) для фильтров без обращения к Neo4j
+        "class_type": {"type": "keyword"},
+        "course_id": {"type": "integer"},
+        "tags": {"type": "keyword"},
     }
 }
@@ -1,7 +1,8 @@
 import logging
-from elasticsearch import Elasticsearch
-from db_utils.elastic.const import INDEX_NAME
-from env import ES_HOST, ES_PASSWORD, ES_PORT, ES_USER
+from db_utils.connections import create_elastic, get_elastic
+from db_utils.elastic.const import CLASS_ID_PAGE_SIZE, INDEX_NAME
+from db_utils.instrumentation import instrument_backend
+from db_utils.query_stats import track_query
 
 logging.basicConfig(
     level=logging.INFO,
@@ -10,20 +11,23 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
+@instrument_backend('elastic')
 class ElasticTool:
-    def __init__(self, host: str = ES_HOST):
-        """Инициализация класса, но соединение пока не устанавливаем"""
+    def __init__(self, host: str = None):
+        """
+        Инициализация класса, но соединение пока не устанавливаем
+
+        :param host: Хост Elasticsearch. Без него используется общий клиент db_utils.connections
+        """
         self.es_client = None
         self.host = host
 
-    def _get_connection(self) -> Elasticsearch:
-        """Создает и возвращает новое соединение с Elasticsearch"""
+    def _get_connection(self):
+        """Возвращает общий клиент или создает отдельный для заданного хоста"""
+        if self.host is None:
+            return get_elastic()
         try:
-            es_client = Elasticsearch(
-                hosts=[f"http://{self.host}:{ES_PORT}"],
-                basic_auth=(ES_USER, ES_PASSWORD),
-                verify_certs=False
-            )
+            es_client = create_elastic(host=self.host)
             if es_client.ping():
                 return es_client
             raise ConnectionError("Не удалось подключиться к Elasticsearch")
@@ -31,29 +35,138 @@ class ElasticTool:
             logger.error(f"Ошибка подключения к Elasticsearch: {e}")
             raise
 
-    def search_materials_by_content(self, search_query: str) -> list:
+    def _release_connection(self) -> None:
+        """Закрывает отдельный клиент; общий остается открытым для следующих запросов"""
+        if self.es_client and self.host is not None:
+            self.es_client.close()
+        self.es_client = None
+
+    @staticmethod
+    def _content_match(search_query: str) -> dict:
+        return {
+            "match": {
+                "content": {
+                    "query": search_query,
+                    "fuzziness": "AUTO"
+                }
+            }
+        }
+
+    @staticmethod
+    def _content_prefix_match(search_query: str) -> dict:
+        """Совпадение по основе слова или по началу слова (подполе content.prefix)"""
+        return {
+            "bool": {
+                "should": [
+                    {"match": {"content": search_query}},
+                    {"match": {"content.prefix": search_query}}
+                ],
+                "minimum_should_match": 1
+            }
+        }
+
+    def analyze_query(self, search_query: str, prefix: bool = False) -> list:
+        """
+        Термины запроса так, как их ищет _content_prefix_match
+
+        :param prefix: Термины для подполя content.prefix (анализатор поиска
+            russian_prefix_search) вместо основ слов поля content
+        :return: Список терминов или пустой список при ошибке
+        """
+        try:
+            self.es_client = self._get_connection()
+            if prefix:
+                response = self.es_client.indices.analyze(
+                    index=INDEX_NAME, analyzer='russian_prefix_search', text=search_query)
+            else:
+                response = self.es_client.indices.analyze(index=INDEX_NAME, field='content', text=search_query)
+            return [token['token'] for token in response['tokens']]
+        except Exception as e:
+            logger.error(f"Ошибка анализа запроса: {e}")
+            return []
+        finally:
+            self._release_connection()
+
+    def search_class_ids_by_content(self, search_query: str, fuzzy: bool = True,
+                                    class_type: str = None, course_ids: list = None,
+                                    tags: list = None) -> list:
+        """
+        Все class_id материалов, содержащих заданную строку в поле content.
+        Документы не загружаются и не оцениваются: запрос выполняется
+        в контексте фильтра, а class_id собираются составной агрегацией
+        постранично, поэтому результат не обрезается размером выдачи.
+
+        :param search_query: Строка для поиска
+        :param fuzzy: Нечеткий поиск (fuzziness AUTO). Иначе совпадение по основе
+            или началу слова, которое не перебирает варианты терминов
+        :param class_type: Только занятия этого типа (например, 'лекция')
+        :param course_ids: Только занятия этих курсов
+        :param tags: Только занятия хотя бы с одним из тэгов
+        :return: Отсортированный список class_id или пустой список при ошибке
+        """
+        try:
+            self.es_client = self._get_connection()
+
+            composite = {
+                "size": CLASS_ID_PAGE_SIZE,
+                "sources": [{"class_id": {"terms": {"field": "class_id"}}}]
+            }
+            filters = [self._content_match(search_query) if fuzzy else self._content_prefix_match(search_query)]
+            if class_type is not None:
+                filters.append({"term": {"class_type": class_type}})
+            if course_ids is not None:
+                filters.append({"terms": {"course_id": list(course_ids)}})
+            if tags is not None:
+                filters.append({"terms": {"tags": list(tags)}})
+            search_body = {
+                "size": 0,
+                "track_total_hits": False,
+                "query": {"bool": {"filter": filters}},
+                "aggs": {"class_ids": {"composite": composite}}
+            }
+
+            class_ids = []
+            while True:
+                with track_query('elastic', search_body, search_query) as tracked:
+                    response = self.es_client.search(index=INDEX_NAME, body=search_body)
+                    aggregation = response['aggregations']['class_ids']
+                    tracked.rows = len(aggregation['buckets'])
+                class_ids.extend(bucket['key']['class_id'] for bucket in aggregation['buckets'])
+
+                after_key = aggregation.get('after_key')
+                if not after_key or len(aggregation['buckets']) < CLASS_ID_PAGE_SIZE:
+                    break
+                composite['after'] = after_key
+
+            logger.info(f"Найдено {len(class_ids)} занятий по запросу '{search_query}'")
+            return class_ids
+        except Exception as e:
+            logger.error(f"Неожиданная ошибка: {e}")
+            return []
+        finally:
+            self._release_connection()
+
+    def search_materials_by_content(self, search_query: str, size: int = 10,
+                                    highlight: bool = False) -> list:
         """
         Поиск материалов, содержащих заданную строку в поле content.
         Соединение создается и закрывается автоматически при каждом вызове.
 
         :param search_query: Строка для поиска
         :param size: Количество возвращаемых результатов
+        :param highlight: Добавить в результаты фрагменты с подсветкой (поле highlight)
         :return: Список найденных материалов или пустой список при ошибке
         """
         try:
             self.es_client = self._get_connection()
 
             search_body = {
-                "query": {
-                    "match": {
-                        "content": {
-                            "query": search_query,
-                            "fuzziness": "AUTO"
-                        }
-                    }
-                },
+                "size": size,
+                "query": self._content_match(search_query),
                 "_source": ["material_id", "class_id", "content"],
-                "highlight": {
+            }
+            if highlight:
+                search_body["highlight"] = {
                     "fields": {
                         "content": {
                             "pre_tags": ["<b>"],
@@ -62,19 +175,22 @@ class ElasticTool:
                         }
                     }
                 }
-            }
-
-            response = self.es_client.search(
-                index=INDEX_NAME,
-                body=search_body,
-            )
 
-            hits = response['hits']['hits']
+            with track_query('elastic', search_body, search_query) as tracked:
+                response = self.es_client.search(
+                    index=INDEX_NAME,
+                    body=search_body,
+                )
+                hits = response['hits']['hits']
+                tracked.rows = len(hits)
             results = [{
                 "material_id": hit['_source']['material_id'],
                 "class_id": hit['_source']['class_id'],
                 "content": hit['_source']['content'],
             } for hit in hits]
+            if highlight:
+                for result, hit in zip(results, hits):
+                    result['highlight'] = hit.get('highlight', {}).get('content', [])
 
             logger.info(
                 f"Найдено {len(results)} материалов по запросу '{search_query}'")
@@ -83,9 +199,7 @@ class ElasticTool:
             logger.error(f"Неожиданная ошибка: {e}")
             return []
         finally:
-            if self.es_client:
-                self.es_client.close()
-                self.es_client = None
+            self._release_connection()
 
 
 def main():
@@ -1,11 +1,11 @@
-from elasticsearch import Elasticsearch
+from elasticsearch.helpers import streaming_bulk
 import psycopg2
 import logging
-from contextlib import closing
 from datetime import datetime
-from env import (DB_HOST, DB_NAME, DB_PASSWORD, DB_PORT,
-                 DB_USER, ES_HOST, ES_PORT, ES_USER, ES_PASSWORD)
-from db_utils.elastic.const import SETTINGS, INDEX_NAME, MAPPINGS
+from db_utils.connections import create_elastic, create_postgres, create_redis
+from db_utils.elastic.const import SETTINGS, INDEX_NAME, INDEX_SCHEMA_VERSION, MAPPINGS
+from db_utils.postgres.stream_reader import STREAM_BATCH_SIZE, stream_batches
+from db_utils.redis import term_index
 
 logging.basicConfig(
     level=logging.INFO,
@@ -22,6 +22,7 @@ class ElasticLectureSessionSynchronizer:
             'total_sessions': 0,
             'successful': 0,
             'failed': 0,
+            'terms': 0,
             'start_time': None
         }
         self.connect_postgres()
@@ -30,13 +31,7 @@ class ElasticLectureSessionSynchronizer:
     def connect_postgres(self) -> bool:
         """Установка соединения с PostgreSQL"""
         try:
-            self.pg_conn = psycopg2.connect(
-                dbname=DB_NAME,
-                user=DB_USER,
-                password=DB_PASSWORD,
-                host=DB_HOST,
-                port=DB_PORT
-            )
+            self.pg_conn = create_postgres()
             logger.info("Успешное подключение к PostgreSQL")
             return True
         except psycopg2.Error as e:
@@ -46,11 +41,7 @@ class ElasticLectureSessionSynchronizer:
     def connect_elasticsearch(self) -> bool:
         """Установка соединения с Elasticsearch"""
         try:
-            self.es_client = Elasticsearch(
-                hosts=[f"http://{ES_HOST}:{ES_PORT}"],
-                basic_auth=(ES_USER, ES_PASSWORD),
-                verify_certs=False
-            )
+            self.es_client = create_elastic()
             if self.es_client.ping():
                 logger.info("Успешное подключение к Elasticsearch")
                 return True
@@ -70,8 +61,20 @@ class ElasticLectureSessionSynchronizer:
             logger.info("Соединение с Elasticsearch закрыто")
 
     def ensure_index_exists(self) -> bool:
-        """Создание индекса, если он не существует"""
+        """
+        Создание индекса, если он не существует. Индекс с другой версией схемы
+        (анализаторы, поля) удаляется и создается заново: все документы
+        затем загружаются из PostgreSQL.
+        """
         try:
+            if self.es_client.indices.exists(index=INDEX_NAME):
+                mapping = self.es_client.indices.get_mapping(index=INDEX_NAME)[INDEX_NAME]['mappings']
+                version = mapping.get('_meta', {}).get('schema_version')
+                if version != INDEX_SCHEMA_VERSION:
+                    logger.info(f"Индекс {INDEX_NAME} версии {version} пересоздается "
+                                f"с версией {INDEX_SCHEMA_VERSION}")
+                    self.es_client.indices.delete(index=INDEX_NAME)
+
             if not self.es_client.indices.exists(index=INDEX_NAME):
                 self.es_client.indices.create(
                     index=INDEX_NAME,
@@ -87,59 +90,75 @@ class ElasticLectureSessionSynchronizer:
             logger.error(f"Ошибка создания индекса: {e}")
             return False
 
-    def fetch_materials_data(self) -> list:
-        """Получение данных материалов из PostgreSQL"""
+    def fetch_materials_data(self):
+        """Потоковое чтение материалов из PostgreSQL пачками"""
         logger.info("Извлечение данных материалов занятий из PostgreSQL")
 
         try:
-            with closing(self.pg_conn.cursor()) as cursor:
-                cursor.execute("""
-                    SELECT cm.id, cm.class_id, cm.content
-                    FROM Class_Materials cm
-                """)
-                materials = cursor.fetchall()
-                self.stats['total_materials'] = len(materials)
-                logger.info(f"Получено {len(materials)} материалов занятий")
-                print(materials)
-                return materials
+            for materials in stream_batches(self.pg_conn, """
+                SELECT cm.id, cm.class_id, cm.content, c.type, c.course_of_class_id, c.tags
+                FROM Class_Materials cm
+                LEFT JOIN Class c ON c.id = cm.class_id
+            """):
+                self.stats['total_sessions'] += len(materials)
+                yield from materials
         except psycopg2.Error as e:
             logger.error(f"Ошибка получения данных материалов: {e}")
             raise
 
     def prepare_material_document(self, material: tuple) -> dict:
         """Подготовка документа материала для индексации"""
+        tags = material[5] or ''
         return {
             "material_id": material[0],
             "class_id": material[1],
             "content": material[2],
+            "class_type": material[3],
+            "course_id": material[4],
+            "tags": [tag.strip() for tag in tags.split(',') if tag.strip()],
         }
 
-    def sync_to_elasticsearch(self, materials: list) -> bool:
-        """Синхронизация данных в Elasticsearch"""
+    def sync_to_elasticsearch(self, materials) -> bool:
+        """Синхронизация данных в Elasticsearch пачками через _bulk"""
         logger.info("Начало синхронизации данных в Elasticsearch")
 
-        for material in materials:
-            try:
-                doc = self.prepare_material_document(material)
-                response = self.es_client.index(
-                    index=INDEX_NAME,
-                    id=doc['material_id'],
-                    document=doc
-                )
-
-                if response['result'] in ['created', 'updated']:
-                    self.stats['successful'] += 1
-                else:
-                    self.stats['failed'] += 1
-                    logger.warning(
-                        f"Неизвестный статус для сессии {doc['material_id']}: {response['result']}")
-
-            except Exception as e:
+        actions = (
+            {'_index': INDEX_NAME, '_id': doc['material_id'], '_source': doc}
+            for doc in map(self.prepare_material_document, materials)
+        )
+        for ok, item in streaming_bulk(self.es_client, actions, chunk_size=STREAM_BATCH_SIZE,
+                                       raise_on_error=False, raise_on_exception=False):
+            result = item['index']
+            if ok and result.get('result') in ['created', 'updated']:
+                self.stats['successful'] += 1
+            else:
                 self.stats['failed'] += 1
-                logger.error(f"Ошибка индексации сессии {material[0]}: {e}")
+                logger.error(f"Ошибка индексации сессии {result.get('_id')}: "
+                             f"{result.get('error', result.get('result'))}")
 
         return True
 
+    def update_term_index(self, build: bool) -> None:
+        """
+        Индекс терминов lab1 в Redis: перед загрузкой отключается, после
+        загрузки собирается заново. Ошибка не прерывает синхронизацию,
+        lab1 в этом случае ищет через Elasticsearch.
+
+        :param build: Собрать индекс (иначе только отключить)
+        """
+        try:
+            client = create_redis()
+            try:
+                if build:
+                    self.stats['terms'] = term_index.build_term_index(self.es_client, client, INDEX_NAME)
+                    logger.info(f"Индекс терминов: {self.stats['terms']} пар термин-занятие")
+                else:
+                    term_index.invalidate(client)
+            finally:
+                client.close()
+        except Exception as e:
+            logger.error(f"Ошибка обновления индекса терминов в Redis: {e}")
+
     def run_sync(self) -> bool:
         """Основной метод выполнения синхронизации"""
         self.stats['start_time'] = datetime.now()
@@ -153,14 +172,14 @@ class ElasticLectureSessionSynchronizer:
             if not self.ensure_index_exists():
                 return False
 
-            materials = self.fetch_materials_data()
-            if not materials:
+            self.update_term_index(build=False)
+            self.sync_to_elasticsearch(self.fetch_materials_data())
+            if not self.stats['total_sessions']:
                 logger.warning("Нет данных для синхронизации")
                 return False
 
-            self.sync_to_elasticsearch(materials)
-
             self.es_client.indices.refresh(index=INDEX_NAME)
+            self.update_term_index(build=True)
 
             es_count = self.es_client.count(index=INDEX_NAME)['count']
             duration = (datetime.now() -
@@ -0,0 +1,271 @@
+"""
+Счетчики обращений к базам данных в рамках одного HTTP-запроса.
+
+Классы инструментов (PostgresTool, RedisTool, ...) помечаются декоратором
+instrument_backend, а init_app добавляет в ответ сервиса заголовки:
+    X-Backend-Calls: neo4j=1, postgres=2, redis=3
+    X-Backend-Time: neo4j=4.1, postgres=12.7, redis=0.9   (мс)
+    X-Backend-Connections: postgres=1, redis=3
+Вне запроса Flask счетчики не ведутся.
+
+Для скриптов (синхронизация, загрузка данных) count_round_trips считает
+обращения к серверам на уровне драйверов баз данных.
+
+Каждый вызов метода инструмента также становится спаном трассировки
+(db_utils.tracing) с базой, методом и числом строк результата, а его время
+попадает в гистограмму backend_call_duration_seconds (db_utils.metrics).
+"""
+import contextvars
+import time
+from collections import Counter
+from contextlib import contextmanager
+from functools import wraps
+from db_utils.metrics import observe_backend_call
+from db_utils.tracing import start_span
+
+# Методы, которые открывают соединение, а не выполняют запрос
+CONNECT_METHODS = {'connect', '_get_connection'}
+SKIPPED_METHODS = {'close'}
+
+_stats = contextvars.ContextVar('backend_stats', default=None)
+
+
+class RequestStats:
+    def __init__(self):
+        self.calls = Counter()
+        self.time_ms = Counter()
+        self.connections = Counter()
+
+    def headers(self) -> dict:
+        return {
+            'X-Backend-Calls': format_counts(self.calls),
+            'X-Backend-Time': format_counts(
+                {backend: round(value, 1) for backend, value in self.time_ms.items()}),
+            'X-Backend-Connections': format_counts(self.connections),
+        }
+
+
+def format_counts(counts: dict) -> str:
+    return ', '.join(f"{backend}={value}" for backend, value in sorted(counts.items()))
+
+
+def parse_counts(header: str) -> dict:
+    """Разбор заголовка вида 'postgres=2, redis=3' (обратное к format_counts)"""
+    counts = {}
+    for item in filter(None, (part.strip() for part in (header or '').split(','))):
+        backend, _, value = item.partition('=')
+        counts[backend] = float(value) if '.' in value else int(value)
+    return counts
+
+
+def start_request() -> RequestStats:
+    stats = RequestStats()
+    _stats.set(stats)
+    return stats
+
+
+def current_stats():
+    return _stats.get()
+
+
+def _result_size(result):
+    if isinstance(result, (list, tuple, set, dict)):
+        return len(result)
+    return None
+
+
+def _instrument(backend: str, name: str, method):
+    is_connect = name in CONNECT_METHODS
+
+    @wraps(method)
+    def wrapper(*args, **kwargs):
+        with start_span(f"{backend}.{name}", kind='client', **{
+                'db.system': backend, 'db.operation': method.__qualname__}) as span:
+            stats = _stats.get()
+            started = time.perf_counter()
+            ok = False
+            try:
+                result = method(*args, **kwargs)
+                ok = True
+            finally:
+                elapsed = time.perf_counter() - started
+                observe_backend_call(backend, method.__qualname__, elapsed, ok)
+                if stats is not None:
+                    stats.time_ms[backend] += elapsed * 1000
+                    if is_connect:
+                        stats.connections[backend] += 1
+                    else:
+                        stats.calls[backend] += 1
+            if span is not None:
+                span.set_attribute('db.rows', _result_size(result))
+            return result
+    return wrapper
+
+
+def instrument_backend(backend: str):
+    """
+    Декоратор класса инструмента: считает вызовы публичных методов, время
+    в них и открытия соединений для текущего запроса
+
+    :param backend: Имя базы данных в заголовках (postgres, redis, ...)
+    """
+    def decorator(cls):
+        for name, method in list(vars(cls).items()):
+            if not callable(method) or name in SKIPPED_METHODS:
+                continue
+            if name.startswith('_') and name not in CONNECT_METHODS:
+                continue
+            setattr(cls, name, _instrument(backend, name, method))
+        return cls
+    return decorator
+
+
+def init_app(app) -> None:
+    """Включает счетчики и заголовки X-Backend-* для всех запросов приложения"""
+    @app.before_request
+    def start_backend_stats():
+        start_request()
+
+    @app.after_request
+    def add_backend_headers(response):
+        stats = current_stats()
+        if stats is not None:
+            response.headers.update(stats.headers())
+        return response
+
+    @app.teardown_request
+    def reset_backend_stats(exc):
+        # Поток воркера обслуживает следующие запросы с тем же контекстом
+        _stats.set(None)
+
+
+_round_trips = None
+
+
+def _count_round_trip(backend: str) -> None:
+    if _round_trips is not None:
+        _round_trips[backend] += 1
+
+
+def _patch_method(patches: list, owner, name: str, backend: str) -> None:
+    original = getattr(owner, name)
+
+    @wraps(original)
+    def wrapper(*args, **kwargs):
+        _count_round_trip(backend)
+        return original(*args, **kwargs)
+
+    setattr(owner, name, wrapper)
+    patches.append((owner, name, original))
+
+
+def _patch_postgres(patches: list) -> None:
+    import psycopg2
+    import psycopg2.extensions
+
+    class CountingCursor(psycopg2.extensions.cursor):
+        def execute(self, *args, **kwargs):
+            _count_round_trip('postgres')
+            return super().execute(*args, **kwargs)
+
+        def executemany(self, query, vars_list):
+            # executemany отправляет отдельный запрос на каждый набор параметров
+            vars_list = list(vars_list)
+            for _ in vars_list:
+                _count_round_trip('postgres')
+            return super().executemany(query, vars_list)
+
+        def copy_expert(self, *args, **kwargs):
+            _count_round_trip('postgres')
+            return super().copy_expert(*args, **kwargs)
+
+    class CountingConnection(psycopg2.extensions.connection):
+        def cursor(self, *args, **kwargs):
+            kwargs.setdefault('cursor_factory', CountingCursor)
+            return super().cursor(*args, **kwargs)
+
+        def commit(self):
+            _count_round_trip('postgres')
+            return super().commit()
+
+    original = psycopg2.connect
+
+    @wraps(original)
+    def connect(*args, **kwargs):
+        kwargs.setdefault('connection_factory', CountingConnection)
+        return original(*args, **kwargs)
+
+    psycopg2.connect = connect
+    patches.append((psycopg2, 'connect', original))
+
+
+_mongo_listener_registered = False
+
+
+def _register_mongo_listener() -> None:
+    """Слушатель команд pymongo регистрируется один раз и действует для новых клиентов"""
+    global _mongo_listener_registered
+    if _mongo_listener_registered:
+        return
+    from pymongo import monitoring
+
+    class RoundTripListener(monitoring.CommandListener):
+        def started(self, event):
+            _count_round_trip('mongo')
+
+        def succeeded(self, event):
+            pass
+
+        def failed(self, event):
+            pass
+
+    monitoring.register(RoundTripListener())
+    _mongo_listener_registered = True
+
+
+@contextmanager
+def count_round_trips():
+    """
+    Считает обращения к серверам БД внутри блока: запросы и commit Postgres,
+    команды Redis (конвейер — одно обращение), команды MongoDB, HTTP-запросы
+    Elasticsearch и запуски Cypher в Neo4j. Драйверы, которые не установлены,
+    пропускаются.
+
+    :return: Counter {'postgres': ..., 'redis': ..., ...}, заполняемый по ходу блока
+    """
+    global _round_trips
+    counter = Counter()
+    patches = []
+
+    try:
+        _patch_postgres(patches)
+    except ImportError:
+        pass
+    try:
+        import redis.client
+        _patch_method(patches, redis.client.Redis, 'execute_command', 'redis')
+        _patch_method(patches, redis.client.Pipeline, 'execute', 'redis')
+    except ImportError:
+        pass
+    try:
+        import elastic_transport
+        _patch_method(patches, elastic_transport.Transport, 'perform_request', 'elastic')
+    except ImportError:
+        pass
+    try:
+        import neo4j
+        _patch_method(patches, neo4j.Session, 'run', 'neo4j')
+    except ImportError:
+        pass
+    try:
+        _register_mongo_listener()
+    except ImportError:
+        pass
+
+    previous, _round_trips = _round_trips, counter
+    try:
+        yield counter
+    finally:
+        _round_trips = previous
+        for owner, name, original in reversed(patches):
+            setattr(owner, name, original)
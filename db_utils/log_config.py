@@ -0,0 +1,166 @@
+"""
+Неблокирующее логирование для сервисов и db_utils.
+
+setup_logging заменяет обработчики корневого логгера на QueueHandler:
+поток запроса только кладет запись в очередь, а вывод в stderr выполняет
+фоновый QueueListener. Поэтому воркеры не ждут друг друга на записи в stdout.
+Вызовы logging.basicConfig в модулях после этого ничего не меняют.
+
+Переменные окружения:
+    LOG_LEVEL=INFO                                — общий уровень
+    LOG_LEVELS=db_utils.redis=WARNING,lab1=DEBUG  — уровни отдельных модулей
+    LOG_FORMAT=json                               — записи одной строкой JSON (по умолчанию текст)
+    LOG_PAYLOAD_SAMPLE_RATE=0.01                  — доля запросов, в которых log_payload
+                                                    пишет данные на уровне DEBUG
+"""
+import atexit
+import copy
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import threading
+
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO').upper()
+LOG_LEVELS = os.getenv('LOG_LEVELS', '')
+LOG_FORMAT = os.getenv('LOG_FORMAT', 'text')
+LOG_PAYLOAD_SAMPLE_RATE = float(os.getenv('LOG_PAYLOAD_SAMPLE_RATE', '0.01'))
+
+# Записи сверх размера очереди отбрасываются, чтобы не блокировать запросы
+LOG_QUEUE_SIZE = 10000
+# Сколько символов данных попадает в одну запись log_payload
+PAYLOAD_MAX_CHARS = 2000
+
+TEXT_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'time': self.formatTime(record),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'pid': record.process,
+        }
+        trace_id = getattr(record, 'trace_id', None)
+        if trace_id:
+            entry['trace_id'] = trace_id
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class ProcessQueueHandler(logging.handlers.QueueHandler):
+    def __init__(self, target: logging.Handler):
+        """
+        QueueHandler со своим QueueListener в каждом процессе: поток
+        не переживает fork, поэтому в воркере gunicorn он запускается заново
+        при первой записи.
+
+        :param target: Обработчик, который выполняет вывод в фоновом потоке
+        """
+        super().__init__(queue.Queue(maxsize=LOG_QUEUE_SIZE))
+        self.target = target
+        self.listener = None
+        self.pid = None
+        self.dropped = 0
+        self.listener_lock = threading.Lock()
+
+    def _ensure_listener(self) -> None:
+        if self.pid == os.getpid():
+            return
+        with self.listener_lock:
+            if self.pid == os.getpid():
+                return
+            self.queue = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+            self.listener = logging.handlers.QueueListener(
+                self.queue, self.target, respect_handler_level=True)
+            self.listener.start()
+            self.pid = os.getpid()
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        """
+        Подставляет аргументы в сообщение до постановки в очередь.
+
+        QueueHandler.prepare дописывает traceback в msg и очищает exc_info,
+        тогда JsonFormatter не заполнил бы поле exception. Здесь exc_info
+        остается в записи, и traceback оформляет форматтер target.
+        """
+        from db_utils.tracing import current_span
+        span = current_span()
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        record.trace_id = span.trace_id if span is not None else None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        self._ensure_listener()
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def stop(self) -> None:
+        """Дописывает оставшиеся записи (при завершении процесса)"""
+        if self.listener is not None and self.pid == os.getpid():
+            self.listener.stop()
+            self.pid = None
+
+
+_handler = None
+
+
+def _parse_levels(value: str) -> dict:
+    levels = {}
+    for item in filter(None, (part.strip() for part in value.split(','))):
+        name, _, level = item.partition('=')
+        levels[name.strip()] = level.strip().upper()
+    return levels
+
+
+def setup_logging(level: str = LOG_LEVEL, levels: str = LOG_LEVELS,
+                  fmt: str = LOG_FORMAT) -> None:
+    """
+    Включает логирование через очередь (повторный вызов ничего не делает)
+
+    :param level: Уровень корневого логгера
+    :param levels: Уровни модулей в виде 'имя=УРОВЕНЬ,...'
+    :param fmt: 'text' или 'json'
+    """
+    global _handler
+    if _handler is not None:
+        return
+
+    target = logging.StreamHandler(sys.stderr)
+    target.setFormatter(JsonFormatter() if fmt == 'json' else logging.Formatter(TEXT_FORMAT))
+    _handler = ProcessQueueHandler(target)
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(_handler)
+    root.setLevel(level)
+    for name, module_level in _parse_levels(levels).items():
+        logging.getLogger(name).setLevel(module_level)
+
+    atexit.register(_handler.stop)
+
+
+def log_payload(logger: logging.Logger, message: str, payload) -> None:
+    """
+    Пишет данные запроса (списки строк, документы) на уровне DEBUG только
+    для доли LOG_PAYLOAD_SAMPLE_RATE вызовов. Если DEBUG выключен,
+    данные даже не преобразуются в строку.
+    """
+    if not logger.isEnabledFor(logging.DEBUG) or random.random() >= LOG_PAYLOAD_SAMPLE_RATE:
+        return
+    text = repr(payload)
+    if len(text) > PAYLOAD_MAX_CHARS:
+        text = f"{text[:PAYLOAD_MAX_CHARS]}... ({len(text)} символов)"
+    logger.debug(f"{message}: {text}")
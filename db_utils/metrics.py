@@ -0,0 +1,188 @@
+"""
+Метрики Prometheus для шлюза и сервисов лабораторных (GET /metrics).
+
+- http_request_duration_seconds{service, route, method, status} — время запроса;
+- http_requests_in_flight{service} — запросы в обработке;
+- backend_call_duration_seconds{backend, operation, outcome} — вызовы методов
+  инструментов db_utils (заполняется декоратором instrument_backend);
+- db_pool_connections{backend, state} — занятые, свободные и максимум
+  соединений общих пулов db_utils.connections;
+- cache_requests_total{cache, result} — обращения к кэшу (HIT, STALE, MISS);
+- router_calls_total{step, backend, outcome} — шаги отчетов по базе, выбранной
+  db_utils.router;
+- sync_last_run_*{target} — последний запуск каждого синхронизатора
+  (sync_orchestrator сохраняет итоги в Redis, сервис читает их при сборе).
+
+В gunicorn с несколькими воркерами задайте PROMETHEUS_MULTIPROC_DIR: значения
+всех воркеров складываются, а gunicorn.conf.py очищает каталог при старте.
+"""
+import logging
+import os
+import sys
+import time
+from prometheus_client import (CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge,
+                               Histogram, generate_latest)
+from prometheus_client.core import GaugeMetricFamily
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+PROMETHEUS_MULTIPROC_DIR = os.getenv('PROMETHEUS_MULTIPROC_DIR')
+
+REQUEST_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+BACKEND_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+# Ключи Redis с итогами последнего запуска синхронизаторов
+SYNC_STATS_KEY = 'sync:last_run:{}'
+SYNC_TARGETS = ('mongo', 'redis', 'elastic', 'neo4j')
+
+REQUEST_LATENCY = Histogram(
+    'http_request_duration_seconds', 'Время обработки HTTP-запроса',
+    ['service', 'route', 'method', 'status'], buckets=REQUEST_BUCKETS)
+REQUESTS_IN_FLIGHT = Gauge(
+    'http_requests_in_flight', 'Запросы в обработке', ['service'],
+    multiprocess_mode='livesum')
+BACKEND_LATENCY = Histogram(
+    'backend_call_duration_seconds', 'Время вызова метода инструмента db_utils',
+    ['backend', 'operation', 'outcome'], buckets=BACKEND_BUCKETS)
+POOL_CONNECTIONS = Gauge(
+    'db_pool_connections', 'Соединения общих пулов db_utils.connections',
+    ['backend', 'state'], multiprocess_mode='livesum')
+CACHE_REQUESTS = Counter(
+    'cache_requests', 'Обращения к кэшу ответов', ['cache', 'result'])
+ROUTER_CALLS = Counter(
+    'router_calls', 'Шаги отчетов по выбранной базе', ['step', 'backend', 'outcome'])
+
+# Функции, обновляющие датчики перед сбором и после каждого запроса
+_refreshers = []
+
+
+def on_refresh(func):
+    """Регистрирует функцию, обновляющую датчики состояния (пулы, экземпляры)"""
+    _refreshers.append(func)
+    return func
+
+
+def refresh() -> None:
+    for func in _refreshers:
+        try:
+            func()
+        except Exception as e:
+            logger.warning(f"Ошибка обновления метрик в {func.__name__}: {e}")
+
+
+@on_refresh
+def refresh_pool_connections() -> None:
+    # Шлюз не использует db_utils.connections (и не содержит env.py): пулов нет, импорт не нужен
+    connections = sys.modules.get('db_utils.connections')
+    if connections is None:
+        return
+    for backend, usage in connections.pool_usage().items():
+        for state, value in usage.items():
+            POOL_CONNECTIONS.labels(backend, state).set(value)
+
+
+def observe_backend_call(backend: str, operation: str, seconds: float, ok: bool) -> None:
+    BACKEND_LATENCY.labels(backend, operation, 'ok' if ok else 'error').observe(seconds)
+
+
+def record_sync_run(client, result: dict) -> None:
+    """
+    Сохраняет итог запуска синхронизатора в Redis
+
+    :param client: Клиент Redis
+    :param result: Результат sync_orchestrator.run_synchronizer
+    """
+    client.hset(SYNC_STATS_KEY.format(result['name']), mapping={
+        'duration_seconds': result.get('seconds', 0.0),
+        'rows': result.get('rows', 0),
+        'success': int(bool(result['success'])),
+        'finished_at': time.time(),
+    })
+
+
+class SyncStatsCollector:
+    """Итоги последних запусков синхронизаторов из Redis, читаются при каждом сборе"""
+
+    def collect(self):
+        duration = GaugeMetricFamily('sync_last_run_duration_seconds',
+                                     'Длительность последней синхронизации', labels=['target'])
+        rows = GaugeMetricFamily('sync_last_run_rows',
+                                 'Строк перенесено при последней синхронизации', labels=['target'])
+        success = GaugeMetricFamily('sync_last_run_success',
+                                    'Последняя синхронизация прошла без ошибок', labels=['target'])
+        finished = GaugeMetricFamily('sync_last_run_timestamp_seconds',
+                                     'Время окончания последней синхронизации', labels=['target'])
+        try:
+            from db_utils.connections import get_redis
+            pipe = get_redis().pipeline(transaction=False)
+            for target in SYNC_TARGETS:
+                pipe.hgetall(SYNC_STATS_KEY.format(target))
+            for target, stats in zip(SYNC_TARGETS, pipe.execute()):
+                if not stats:
+                    continue
+                duration.add_metric([target], float(stats['duration_seconds']))
+                rows.add_metric([target], float(stats['rows']))
+                success.add_metric([target], float(stats['success']))
+                finished.add_metric([target], float(stats['finished_at']))
+        except Exception as e:
+            logger.warning(f"Не удалось прочитать итоги синхронизации из Redis: {e}")
+        return [duration, rows, success, finished]
+
+
+_sync_registry = CollectorRegistry()
+_sync_registry.register(SyncStatsCollector())
+
+
+def render(sync_stats: bool = False) -> bytes:
+    """Текст всех метрик процесса (или всех воркеров в режиме multiprocess)"""
+    refresh()
+    if PROMETHEUS_MULTIPROC_DIR:
+        from prometheus_client import multiprocess
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        output = generate_latest(registry)
+    else:
+        output = generate_latest(REGISTRY)
+    if sync_stats:
+        output += generate_latest(_sync_registry)
+    return output
+
+
+def init_app(app, service: str, sync_stats: bool = False) -> None:
+    """
+    Добавляет GET /metrics и метрики HTTP-запросов приложения
+
+    :param service: Значение метки service
+    :param sync_stats: Отдавать итоги синхронизаторов из Redis
+    """
+    from flask import Response, g, request
+
+    in_flight = REQUESTS_IN_FLIGHT.labels(service)
+
+    @app.before_request
+    def start_request_metrics():
+        g.metrics_started = time.perf_counter()
+        in_flight.inc()
+
+    @app.after_request
+    def observe_request(response):
+        started = g.get('metrics_started')
+        if started is not None:
+            route = request.url_rule.rule if request.url_rule else 'unmatched'
+            REQUEST_LATENCY.labels(service, route, request.method, str(response.status_code)) \
+                .observe(time.perf_counter() - started)
+        return response
+
+    @app.teardown_request
+    def end_request_metrics(exc):
+        if g.pop('metrics_started', None) is not None:
+            in_flight.dec()
+            refresh()
+
+    @app.route('/metrics', methods=['GET'])
+    def metrics():
+        return Response(render(sync_stats), mimetype=CONTENT_TYPE_LATEST)
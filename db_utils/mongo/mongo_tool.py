@@ -1,6 +1,7 @@
-from pymongo import MongoClient
 import logging
-from env import (MONGO_URI, MONGO_DB_NAME, MONGO_USERNAME, MONGO_PASSWORD)
+from db_utils.connections import MONGO_DB_NAME, create_mongo, get_mongo
+from db_utils.instrumentation import instrument_backend
+from db_utils.query_stats import track_query
 
 
 logging.basicConfig(
@@ -10,9 +11,15 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
+@instrument_backend('mongo')
 class MongoTool:
-    def __init__(self, host=MONGO_URI, username=MONGO_USERNAME, password=MONGO_PASSWORD):
+    def __init__(self, host=None, username=None, password=None):
+        """
+        Без параметров используется общий клиент db_utils.connections,
+        иначе создается отдельный с заданными параметрами
+        """
         self.mongo_client = None
+        self.shared = False
         self.db = None
         self.host = host
         self.username = username
@@ -23,11 +30,10 @@ class MongoTool:
     def connect(self):
         """Установка соединения с MongoDB"""
         try:
-            self.mongo_client = MongoClient(
-                host=self.host,
-                username=self.username,
-                password=self.password
-            )
+            overrides = {'host': self.host, 'username': self.username, 'password': self.password}
+            overrides = {key: value for key, value in overrides.items() if value is not None}
+            self.shared = not overrides
+            self.mongo_client = get_mongo() if self.shared else create_mongo(**overrides)
 
             self.mongo_client.server_info()
             self.db = self.mongo_client[MONGO_DB_NAME]
@@ -38,20 +44,23 @@ class MongoTool:
             logger.error(f"Ошибка подключения к MongoDB: {e}")
             return False
 
-    def get_department_name_by_id(self, department_id: int) -> str | None:
+    def get_department_name_by_id(self, department_id: int, raise_errors: bool = False) -> str | None:
         """
         Возвращает название кафедры по её ID
 
         :param department_id: ID кафедры
+        :param raise_errors: Выбрасывать ошибки и LookupError для ненайденной кафедры
+            вместо None (для db_utils.router)
         :return: название кафедры или None если не найдена
         """
         try:
             if self.db is None:
                 logger.error("Нет соединения с MongoDB")
+                if raise_errors:
+                    raise ConnectionError("Нет соединения с MongoDB")
                 return None
 
             collection = self.db['universities']
-            print(department_id)
             # Ищем кафедру по ID во всех университетах
             pipeline = [
                 {'$unwind': '$institutes'},
@@ -64,7 +73,11 @@ class MongoTool:
                 }}
             ]
 
-            result = list(collection.aggregate(pipeline))
+            with track_query('mongo', pipeline, department_id,
+                             lambda: self.db.command('aggregate', 'universities', pipeline=pipeline,
+                                                     explain=True)) as tracked:
+                result = list(collection.aggregate(pipeline))
+                tracked.rows = len(result)
 
             if result:
                 department_info = result[0]
@@ -79,17 +92,22 @@ class MongoTool:
                 return department_name
             else:
                 logger.warning(f"Кафедра с ID {department_id} не найдена")
+                if raise_errors:
+                    raise LookupError(f"Кафедра с ID {department_id} не найдена в MongoDB")
                 return None
 
         except Exception as e:
             logger.error(f"Ошибка при поиске кафедры по ID: {str(e)}")
+            if raise_errors:
+                raise
             return None
 
     def close(self):
-        """Закрытие соединения с MongoDB"""
-        if self.mongo_client:
+        """Закрытие соединения с MongoDB (общий клиент живет до конца процесса)"""
+        if self.mongo_client and not self.shared:
             self.mongo_client.close()
             logger.info("Соединение с MongoDB закрыто")
+        self.mongo_client = None
 
     def __del__(self):
         self.close()
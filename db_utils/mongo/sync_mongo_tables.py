@@ -1,11 +1,10 @@
 import psycopg2
-from pymongo import MongoClient
-from contextlib import closing
 from datetime import datetime
+from itertools import groupby
 import logging
-from env import (DB_HOST, DB_NAME, DB_PASSWORD, DB_PORT,
-                 DB_USER, MONGO_URI, MONGO_DB_NAME, MONGO_USERNAME, MONGO_PASSWORD)
+from db_utils.connections import MONGO_DB_NAME, create_mongo, create_postgres
 from db_utils.mongo.table_schema import UNIVERSITY_SCHEMA
+from db_utils.postgres.stream_reader import STREAM_BATCH_SIZE, stream_batches
 
 logging.basicConfig(level=logging.INFO,
                     format='%(asctime)s - %(levelname)s - %(message)s')
@@ -16,7 +15,6 @@ class MongoSynchronizer:
     def __init__(self) -> None:
         self.pg_conn = None
         self.mongo_client = None
-        self.university_data = None
         self.stats = {
             'universities': 0,
             'institutes': 0,
@@ -30,13 +28,7 @@ class MongoSynchronizer:
     def connect_postgres(self) -> bool:
         """Установка соединения с PostgreSQL"""
         try:
-            self.pg_conn = psycopg2.connect(
-                dbname=DB_NAME,
-                user=DB_USER,
-                password=DB_PASSWORD,
-                host=DB_HOST,
-                port=DB_PORT
-            )
+            self.pg_conn = create_postgres()
             logger.info("Успешное подключение к PostgreSQL")
             return True
         except psycopg2.Error as e:
@@ -46,11 +38,7 @@ class MongoSynchronizer:
     def connect_mongodb(self) -> bool:
         """Установка соединения с MongoDB"""
         try:
-            self.mongo_client = MongoClient(
-                host=MONGO_URI,
-                username=MONGO_USERNAME,
-                password=MONGO_PASSWORD
-            )
+            self.mongo_client = create_mongo()
 
             self.mongo_client.server_info()
             logger.info("Успешное подключение к MongoDB")
@@ -67,95 +55,57 @@ class MongoSynchronizer:
             self.mongo_client.close()
             logger.info("Соединение с Redis закрыто")
 
-    def fetch_hierarchy_data(self) -> bool:
-        """Получение иерархических данных из PostgreSQL с валидацией"""
+    def fetch_hierarchy_rows(self):
+        """Построчное чтение иерархии: университет, институт, кафедра в порядке id"""
+        for rows in stream_batches(self.pg_conn, """
+            SELECT u.id, u.name, u.address, u.founded_date,
+                   i.id, i.name, d.id, d.name
+            FROM Universities u
+            LEFT JOIN Institutes i ON i.university_id = u.id
+            LEFT JOIN Departments d ON d.institute_id = i.id
+            ORDER BY u.id, i.id, d.id
+        """):
+            yield from rows
+
+    def fetch_hierarchy_data(self):
+        """
+        Сборка документов университетов из потока строк PostgreSQL.
+        Строки упорядочены по университету, поэтому в памяти находится
+        только текущий университет, а не вся иерархия.
+        """
         logger.info("Извлечение иерархических данных университетов")
-        self.university_data = []
 
-        with closing(self.pg_conn.cursor()) as pg_cur:
-            pg_cur.execute(
-                "SELECT id, name, address, founded_date FROM Universities")
-            universities = pg_cur.fetchall()
-            self.stats['universities'] = len(universities)
-
-            if not universities:
-                logger.warning("Не найдено университетов")
-                return False
-
-            university_map = {}
-            for row in universities:
-                university_id = row[0]
-                university_name = row[1]
-                university_address = row[2]
-                university_founded_date = row[3]
-
-                university_map[university_id] = {
-                    'id': university_id,
-                    'name': university_name,
-                    'address': university_address,
-                    'founded_date': university_founded_date,
-                    'institutes': {}
-                }
-
-            pg_cur.execute("SELECT id, university_id, name FROM Institutes")
-            institutes = pg_cur.fetchall()
-            self.stats['institutes'] = len(institutes)
-
-            institute_map = {}
-            for inst_id, uni_id, name in institutes:
-                if uni_id not in university_map:
-                    logger.warning(
-                        f"Институт {inst_id} ссылается на несуществующий университет {uni_id}")
+        rows = self.fetch_hierarchy_rows()
+        for (uni_id, name, address, founded_date), uni_rows in groupby(rows, key=lambda row: row[:4]):
+            institutes = []
+            self.stats['universities'] += 1
+            for inst_id, inst_rows in groupby(uni_rows, key=lambda row: row[4]):
+                if inst_id is None:
                     continue
-
-                institute_map[inst_id] = {
-                    'name': name,
-                    'university_id': uni_id,
-                    'departments': []
-                }
-                university_map[uni_id]['institutes'][inst_id] = institute_map[inst_id]
-
-            pg_cur.execute("SELECT id, institute_id, name FROM Departments")
-            departments = pg_cur.fetchall()
-            self.stats['departments'] = len(departments)
-
-            for dept_id, inst_id, name in departments:
-                if inst_id not in institute_map:
-                    logger.warning(
-                        f"Кафедра {dept_id} ссылается на несуществующий институт {inst_id}")
-                    continue
-
-                institute_map[inst_id]['departments'].append({
-                    'department_id': dept_id,
-                    'name': name
+                departments = []
+                inst_name = None
+                for row in inst_rows:
+                    inst_name = row[5]
+                    if row[6] is not None:
+                        departments.append({'department_id': row[6], 'name': row[7]})
+                self.stats['institutes'] += 1
+                self.stats['departments'] += len(departments)
+                institutes.append({
+                    'institute_id': inst_id,
+                    'name': inst_name,
+                    'departments': departments
                 })
 
-            for uni_id, data in university_map.items():
-                institutes_list = []
-                for inst_id, inst_data in data['institutes'].items():
-                    institutes_list.append({
-                        'institute_id': inst_id,
-                        'name': inst_data['name'],
-                        'departments': inst_data['departments']
-                    })
-
-                self.university_data.append({
-                    '_id': uni_id,
-                    'name': data['name'],
-                    'address': data['address'],
-                    'founded_date': data['founded_date'].strftime('%Y-%m-%d') if data['founded_date'] else None,
-                    'institutes': institutes_list
-                })
-
-            logger.info("Данные успешно подготовлены для MongoDB")
-            return True
-
-    def sync_to_mongodb(self) -> bool:
-        """Синхронизация данных в MongoDB"""
-        if not self.university_data:
-            logger.error("Нет данных для синхронизации")
-            return False
+            yield {
+                '_id': uni_id,
+                'name': name,
+                'address': address,
+                'founded_date': founded_date.strftime('%Y-%m-%d') if founded_date else None,
+                'institutes': institutes
+            }
 
+    def sync_to_mongodb(self, universities) -> bool:
+        """Синхронизация данных в MongoDB пачками insert_many"""
         try:
             db = self.mongo_client[MONGO_DB_NAME]
 
@@ -166,8 +116,19 @@ class MongoSynchronizer:
                 'universities', validator=UNIVERSITY_SCHEMA)
             collection = db['universities']
 
-            result = collection.insert_many(self.university_data)
-            inserted_count = len(result.inserted_ids)
+            inserted_count = 0
+            batch = []
+            for university in universities:
+                batch.append(university)
+                if len(batch) >= STREAM_BATCH_SIZE:
+                    inserted_count += len(collection.insert_many(batch, ordered=False).inserted_ids)
+                    batch = []
+            if batch:
+                inserted_count += len(collection.insert_many(batch, ordered=False).inserted_ids)
+
+            if not inserted_count:
+                logger.warning("Не найдено университетов")
+                return False
 
             mongo_count = collection.count_documents({})
             if mongo_count != inserted_count:
@@ -193,9 +154,7 @@ class MongoSynchronizer:
                 return False
             if not self.mongo_client:
                 return False
-            if not self.fetch_hierarchy_data():
-                return False
-            if not self.sync_to_mongodb():
+            if not self.sync_to_mongodb(self.fetch_hierarchy_data()):
                 return False
 
             duration = (datetime.now() -
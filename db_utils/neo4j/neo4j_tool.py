@@ -1,7 +1,8 @@
 import logging
-from neo4j import GraphDatabase
-from env import NEO4J_URI, NEO4J_USER, NEO4J_PASSWORD
 from datetime import datetime
+from db_utils.connections import create_neo4j, get_neo4j
+from db_utils.instrumentation import instrument_backend
+from db_utils.query_stats import profile_cypher, track_query
 
 logging.basicConfig(
     level=logging.INFO,
@@ -10,18 +11,23 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
+@instrument_backend('neo4j')
 class Neo4jTool:
-    def __init__(self, host: str = NEO4J_URI):
-        """Инициализация класса, но соединение пока не устанавливаем"""
+    def __init__(self, host: str = None):
+        """
+        Инициализация класса, но соединение пока не устанавливаем
+
+        :param host: URI Neo4j. Без него используется общий драйвер db_utils.connections
+        """
         self.neo_driver = None
         self.connect_uri = host
 
     def _get_connection(self):
-        """Создает и возвращает новое соединение с Neo4j"""
+        """Возвращает общий драйвер или создает отдельный для заданного URI"""
+        if self.connect_uri is None:
+            return get_neo4j()
         try:
-            driver = GraphDatabase.driver(
-                self.connect_uri,
-                auth=(NEO4J_USER, NEO4J_PASSWORD))
+            driver = create_neo4j(uri=self.connect_uri)
 
             # Проверяем соединение
             with driver.session() as session:
@@ -32,13 +38,31 @@ class Neo4jTool:
             logger.error(f"Ошибка подключения к Neo4j: {e}")
             raise
 
-    def find_lecture_schedules(self, class_ids: list, start_date: str, end_date: str) -> list:
+    def _release_connection(self) -> None:
+        """Закрывает отдельный драйвер; общий остается открытым для следующих запросов"""
+        if self.neo_driver and self.connect_uri is not None:
+            self.neo_driver.close()
+        self.neo_driver = None
+
+    def _run(self, cypher: str, params: dict) -> list:
+        """Выполняет запрос с учетом в статистике запросов, возвращает записи словарями"""
+        driver = self.neo_driver
+        with track_query('neo4j', cypher, params,
+                         lambda: profile_cypher(driver, cypher, params)) as tracked:
+            with driver.session() as session:
+                records = [dict(record) for record in session.run(cypher, params)]
+            tracked.rows = len(records)
+        return records
+
+    def find_lecture_schedules(self, class_ids: list, start_date: str, end_date: str,
+                               raise_errors: bool = False) -> list:
         """
         Поиск расписаний лекций для указанных Class ID в заданном интервале дат
 
         :param class_ids: Список ID классов (лекций)
         :param start_date: Начальная дата в формате 'YYYY-MM-DD'
         :param end_date: Конечная дата в формате 'YYYY-MM-DD'
+        :param raise_errors: Выбрасывать ошибки базы вместо пустого списка (для db_utils.router)
         :return: Список расписаний или пустой список при ошибке
         """
         try:
@@ -66,14 +90,8 @@ class Neo4jTool:
                 ORDER BY sch.scheduled_date, sch.start_time
             """
 
-            with self.neo_driver.session() as session:
-                result = session.run(
-                    cypher,
-                    class_ids=class_ids,
-                    start_date=start_date,
-                    end_date=end_date
-                )
-                schedules = [dict(record) for record in result]
+            params = {'class_ids': class_ids, 'start_date': start_date, 'end_date': end_date}
+            schedules = self._run(cypher, params)
 
             logger.info(f"Найдено {len(schedules)} расписаний лекций")
             return schedules
@@ -83,11 +101,11 @@ class Neo4jTool:
             return []
         except Exception as e:
             logger.error(f"Ошибка при поиске расписаний: {e}")
+            if raise_errors:
+                raise
             return []
         finally:
-            if self.neo_driver:
-                self.neo_driver.close()
-                self.neo_driver = None
+            self._release_connection()
 
     def find_students_and_lectures(self, start_date: str, end_date: str) -> list:
         """
@@ -127,13 +145,7 @@ class Neo4jTool:
                 group_ids
             """
 
-            with self.neo_driver.session() as session:
-                result = session.run(
-                    cypher,
-                    start_date=start_date,
-                    end_date=end_date
-                )
-                response = [dict(record) for record in result]
+            response = self._run(cypher, {'start_date': start_date, 'end_date': end_date})
 
             logger.info(f"Найдено {len(response)} записей")
             return response
@@ -145,9 +157,7 @@ class Neo4jTool:
             logger.error(f"Ошибка при поиске расписаний: {e}")
             return []
         finally:
-            if self.neo_driver:
-                self.neo_driver.close()
-                self.neo_driver = None
+            self._release_connection()
 
     def find_special_lectures_and_course_of_lectures(self, group_id: int, special_tag: str) -> list:
         """
@@ -169,13 +179,7 @@ class Neo4jTool:
                 COLLECT(sch.postgres_id) as schedule_ids
             """
 
-            with self.neo_driver.session() as session:
-                result = session.run(
-                    cypher,
-                    group_id=group_id,
-                    special_tag=special_tag
-                )
-                response = [dict(record) for record in result]
+            response = self._run(cypher, {'group_id': group_id, 'special_tag': special_tag})
 
             logger.info(f"Найдено {len(response)} записей")
             return response
@@ -184,9 +188,7 @@ class Neo4jTool:
             logger.error(f"Ошибка при поиске расписаний: {e}")
             return []
         finally:
-            if self.neo_driver:
-                self.neo_driver.close()
-                self.neo_driver = None
+            self._release_connection()
 
 
 def main():
@@ -1,10 +1,9 @@
 import psycopg2
-from neo4j import GraphDatabase
-from contextlib import closing
+from collections import Counter
 from datetime import datetime
 import logging
-from env import (DB_HOST, DB_NAME, DB_PASSWORD, DB_PORT,
-                 DB_USER, NEO4J_URI, NEO4J_USER, NEO4J_PASSWORD)
+from db_utils.connections import create_neo4j, create_postgres
+from db_utils.postgres.stream_reader import stream_batches
 
 logging.basicConfig(level=logging.INFO,
                     format='%(asctime)s - %(levelname)s - %(message)s')
@@ -29,13 +28,7 @@ class Neo4jSynchronizer:
     def connect_postgres(self) -> bool:
         """Установка соединения с PostgreSQL"""
         try:
-            self.pg_conn = psycopg2.connect(
-                dbname=DB_NAME,
-                user=DB_USER,
-                password=DB_PASSWORD,
-                host=DB_HOST,
-                port=DB_PORT
-            )
+            self.pg_conn = create_postgres()
             logger.info("Успешное подключение к PostgreSQL")
             return True
         except psycopg2.Error as e:
@@ -45,8 +38,7 @@ class Neo4jSynchronizer:
     def connect_neo4j(self) -> bool:
         """Установка соединения с Neo4j"""
         try:
-            self.neo_driver = GraphDatabase.driver(
-                NEO4J_URI, auth=(NEO4J_USER, NEO4J_PASSWORD))
+            self.neo_driver = create_neo4j()
             with self.neo_driver.session() as session:
                 session.run("RETURN 1")
             logger.info("Успешное подключение к Neo4j")
@@ -64,16 +56,26 @@ class Neo4jSynchronizer:
             self.neo_driver.close()
             logger.info("Соединение с Neo4j закрыто")
 
-    def fetch_data(self, query: str, params=None) -> list:
-        """Извлечение данных из PostgreSQL"""
+    def write_batches(self, cypher: str, query: str, params=None) -> tuple:
+        """
+        Потоковый перенос: строки запроса PostgreSQL читаются пачками
+        и каждая пачка передается в cypher как $rows.
+
+        :return: Число перенесенных строк и суммарные счетчики изменений Neo4j
+        """
+        total = 0
+        counters = Counter()
         try:
-            with closing(self.pg_conn.cursor()) as cursor:
-                cursor.execute(query, params)
-                columns = [desc[0] for desc in cursor.description]
-                return [dict(zip(columns, row)) for row in cursor.fetchall()]
+            with self.neo_driver.session() as session:
+                for rows in stream_batches(self.pg_conn, query, params, as_dict=True):
+                    summary = session.run(cypher, rows=rows).consume()
+                    counters['nodes_created'] += summary.counters.nodes_created
+                    counters['relationships_created'] += summary.counters.relationships_created
+                    total += len(rows)
         except psycopg2.Error as e:
             logger.error(f"Ошибка при выполнении запроса: {e}")
-            return []
+            raise
+        return total, counters
 
     def sync_courses(self) -> bool:
         """Синхронизация курсов в Neo4j"""
@@ -86,28 +88,23 @@ class Neo4jSynchronizer:
             c.department_id = row.department_id,
             c.specialty_id = row.specialty_id
         """
-        rows = self.fetch_data("""
-            SELECT
-                id,
-                department_id,
-                specialty_id,
-                name,
-                description
-            FROM Course_of_classes
-        """)
-        self.stats['courses'] = len(rows)
-
-        if not rows:
-            logger.warning("Не найдено данных о курсах")
-            return False
-
         try:
-            with self.neo_driver.session() as session:
-                result = session.run(cypher, rows=rows)
-                summary = result.consume()
-                logger.debug(
-                    f"Курсов создано/обновлено: {summary.counters.nodes_created}")
-            logger.info(f"Синхронизировано {len(rows)} курсов")
+            self.stats['courses'], counters = self.write_batches(cypher, """
+                SELECT
+                    id,
+                    department_id,
+                    specialty_id,
+                    name,
+                    description
+                FROM Course_of_classes
+            """)
+            if not self.stats['courses']:
+                logger.warning("Не найдено данных о курсах")
+                return False
+
+            logger.debug(
+                f"Курсов создано/обновлено: {counters['nodes_created']}")
+            logger.info(f"Синхронизировано {self.stats['courses']} курсов")
             return True
         except Exception as e:
             logger.error(f"Ошибка синхронизации курсов: {e}")
@@ -129,31 +126,26 @@ class Neo4jSynchronizer:
         MATCH (course:Course {postgres_id: row.course_of_class_id})
         MERGE (cls)-[:BELONGS_TO]->(course)
         """
-        rows = self.fetch_data("""
-            SELECT 
-                id, 
-                name, 
-                course_of_class_id, 
-                tags, 
-                type,
-                tech_requirements         
-            FROM Class
-        """)
-        self.stats['classes'] = len(rows)
-
-        if not rows:
-            logger.warning("Не найдено данных о занятиях")
-            return False
-
         try:
-            with self.neo_driver.session() as session:
-                result = session.run(cypher, rows=rows)
-                summary = result.consume()
-                logger.debug(
-                    f"Занятий создано: {summary.counters.nodes_created}, "
-                    f"Связей с курсами создано: {summary.counters.relationships_created}"
-                )
-            logger.info(f"Синхронизировано {len(rows)} занятий")
+            self.stats['classes'], counters = self.write_batches(cypher, """
+                SELECT 
+                    id, 
+                    name, 
+                    course_of_class_id, 
+                    tags, 
+                    type,
+                    tech_requirements         
+                FROM Class
+            """)
+            if not self.stats['classes']:
+                logger.warning("Не найдено данных о занятиях")
+                return False
+
+            logger.debug(
+                f"Занятий создано: {counters['nodes_created']}, "
+                f"Связей с курсами создано: {counters['relationships_created']}"
+            )
+            logger.info(f"Синхронизировано {self.stats['classes']} занятий")
             return True
         except Exception as e:
             logger.error(f"Ошибка синхронизации занятий: {e}")
@@ -169,27 +161,22 @@ class Neo4jSynchronizer:
             g.course_year = row.course_year,
             g.department_id = row.department_id
         """
-        rows = self.fetch_data("""
-            SELECT 
-                id, 
-                name, 
-                course_year, 
-                department_id 
-            FROM Student_Groups
-        """)
-        self.stats['groups'] = len(rows)
-
-        if not rows:
-            logger.warning("Не найдено данных о группах")
-            return False
-
         try:
-            with self.neo_driver.session() as session:
-                result = session.run(cypher, rows=rows)
-                summary = result.consume()
-                logger.debug(
-                    f"Групп создано/обновлено: {summary.counters.nodes_created}")
-            logger.info(f"Синхронизировано {len(rows)} групп")
+            self.stats['groups'], counters = self.write_batches(cypher, """
+                SELECT 
+                    id, 
+                    name, 
+                    course_year, 
+                    department_id 
+                FROM Student_Groups
+            """)
+            if not self.stats['groups']:
+                logger.warning("Не найдено данных о группах")
+                return False
+
+            logger.debug(
+                f"Групп создано/обновлено: {counters['nodes_created']}")
+            logger.info(f"Синхронизировано {self.stats['groups']} групп")
             return True
         except Exception as e:
             logger.error(f"Ошибка синхронизации групп: {e}")
@@ -209,32 +196,27 @@ class Neo4jSynchronizer:
             s.book_number = row.book_number
         MERGE (s)-[:MEMBER_OF]->(g)
         """
-        rows = self.fetch_data("""
-            SELECT 
-                id,
-                group_id,
-                name, 
-                enrollment_year, 
-                date_of_birth, 
-                email, 
-                book_number 
-            FROM Students
-        """)
-        self.stats['students'] = len(rows)
-
-        if not rows:
-            logger.warning("Не найдено данных о студентах")
-            return False
-
         try:
-            with self.neo_driver.session() as session:
-                result = session.run(cypher, rows=rows)
-                summary = result.consume()
-                logger.debug(
-                    f"Студентов создано: {summary.counters.nodes_created}, "
-                    f"Связей с группами создано: {summary.counters.relationships_created}"
-                )
-            logger.info(f"Синхронизировано {len(rows)} студентов")
+            self.stats['students'], counters = self.write_batches(cypher, """
+                SELECT 
+                    id,
+                    group_id,
+                    name, 
+                    enrollment_year, 
+                    date_of_birth, 
+                    email, 
+                    book_number 
+                FROM Students
+            """)
+            if not self.stats['students']:
+                logger.warning("Не найдено данных о студентах")
+                return False
+
+            logger.debug(
+                f"Студентов создано: {counters['nodes_created']}, "
+                f"Связей с группами создано: {counters['relationships_created']}"
+            )
+            logger.info(f"Синхронизировано {self.stats['students']} студентов")
             return True
         except Exception as e:
             logger.error(f"Ошибка синхронизации студентов: {e}")
@@ -262,32 +244,27 @@ class Neo4jSynchronizer:
         MATCH (c:Class {postgres_id: row.class_id})
         MERGE (sch)-[:FOR_CLASS]->(c)
         """
-        rows = self.fetch_data("""
-            SELECT 
-                id, 
-                group_id, 
-                class_id, 
-                room, 
-                scheduled_date, 
-                start_time, 
-                end_time 
-            FROM Schedule
-        """)
-        self.stats['schedules'] = len(rows)
-
-        if not rows:
-            logger.warning("Не найдено данных о расписании")
-            return False
-
         try:
-            with self.neo_driver.session() as session:
-                result = session.run(cypher, rows=rows)
-                summary = result.consume()
-                logger.debug(
-                    f"Расписаний создано: {summary.counters.nodes_created}, "
-                    f"Связей создано: {summary.counters.relationships_created}"
-                )
-            logger.info(f"Синхронизировано {len(rows)} записей расписания")
+            self.stats['schedules'], counters = self.write_batches(cypher, """
+                SELECT 
+                    id, 
+                    group_id, 
+                    class_id, 
+                    room, 
+                    scheduled_date, 
+                    start_time, 
+                    end_time 
+                FROM Schedule
+            """)
+            if not self.stats['schedules']:
+                logger.warning("Не найдено данных о расписании")
+                return False
+
+            logger.debug(
+                f"Расписаний создано: {counters['nodes_created']}, "
+                f"Связей создано: {counters['relationships_created']}"
+            )
+            logger.info(f"Синхронизировано {self.stats['schedules']} записей расписания")
             return True
         except Exception as e:
             logger.error(f"Ошибка синхронизации расписания: {e}")
@@ -0,0 +1,96 @@
+import io
+import logging
+import time
+from datetime import date, time as dtime
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+# Размер блока, которым psycopg2 читает данные для COPY
+COPY_BUFFER_SIZE = 1 << 20
+
+_ESCAPES = str.maketrans({'\\': '\\\\', '\t': '\\t', '\n': '\\n', '\r': '\\r'})
+
+
+def format_copy_value(value) -> str:
+    """Значение в текстовом формате COPY (NULL -> \\N, спецсимволы экранируются)"""
+    if value is None:
+        return '\\N'
+    if isinstance(value, str):
+        return value.translate(_ESCAPES)
+    if isinstance(value, bool):
+        return 't' if value else 'f'
+    if isinstance(value, (date, dtime)):
+        return value.isoformat()
+    return str(value)
+
+
+class RowStream(io.TextIOBase):
+    def __init__(self, rows):
+        """
+        Файлоподобный объект поверх итератора строк для cursor.copy_expert.
+        Строки форматируются по мере чтения, поэтому в памяти одновременно
+        находится только один буфер COPY, а не весь набор данных.
+
+        :param rows: Итератор кортежей значений
+        """
+        self.rows = iter(rows)
+        self.buffer = ''
+        self.count = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def read(self, size: int = -1) -> str:
+        chunks = [self.buffer]
+        length = len(self.buffer)
+        for row in self.rows:
+            line = '\t'.join(map(format_copy_value, row)) + '\n'
+            chunks.append(line)
+            length += len(line)
+            self.count += 1
+            if 0 <= size <= length:
+                break
+
+        data = ''.join(chunks)
+        if size < 0:
+            self.buffer = ''
+            return data
+        self.buffer = data[size:]
+        return data[:size]
+
+
+def copy_rows(cur, table_name: str, columns: tuple, rows) -> int:
+    """
+    Потоковая загрузка строк в таблицу через COPY FROM STDIN
+
+    :param cur: Курсор psycopg2
+    :param table_name: Имя таблицы
+    :param columns: Имена колонок в порядке значений в строках
+    :param rows: Итератор кортежей (может быть генератором любого размера)
+    :return: Количество загруженных строк
+    """
+    stream = RowStream(rows)
+    started = time.perf_counter()
+    cur.copy_expert(
+        f"COPY {table_name} ({', '.join(columns)}) FROM STDIN",
+        stream,
+        size=COPY_BUFFER_SIZE
+    )
+    elapsed = time.perf_counter() - started
+    logger.info(
+        f"{table_name}: загружено {stream.count} строк за {elapsed:.2f} с "
+        f"({stream.count / elapsed if elapsed else 0:.0f} строк/с)")
+    return stream.count
+
+
+def sync_sequence(cur, table_name: str, column: str = 'id') -> None:
+    """Сдвигает SERIAL-последовательность после загрузки строк с явными id"""
+    cur.execute(
+        f"SELECT setval(pg_get_serial_sequence(%s, %s), "
+        f"COALESCE((SELECT MAX({column}) FROM {table_name}), 0) + 1, false)",
+        (table_name.lower(), column)
+    )
@@ -1,16 +1,9 @@
-import psycopg2
-from env import DB_HOST, DB_NAME, DB_PASSWORD, DB_PORT, DB_USER
+from db_utils.connections import create_postgres
 from db_utils.postgres.tables import TABLES
 
 
 def check_tables():
-    conn = psycopg2.connect(
-        dbname=DB_NAME,
-        user=DB_USER,
-        password=DB_PASSWORD,
-        host=DB_HOST,
-        port=DB_PORT
-    )
+    conn = create_postgres()
     cur = conn.cursor()
 
     try:
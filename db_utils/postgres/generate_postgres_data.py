@@ -1,116 +1,84 @@
-import psycopg2
+from datetime import date
 from db_utils.postgres.tables import TABLES
 from db_utils.postgres.tables_data import UNIVERSITIES, INSTITUTES, DEPARTMENTS, SPECIALTIES, STUDENT_GROUPS, STUDENTS, COURSE_OF_CLASSES, CLASSES, CLASS_MATERIALS, SCHEDULE, ATTENDANCE
-from db_utils.postgres.create_postgres_tables import DB_HOST, DB_NAME, DB_PASSWORD, DB_PORT, DB_USER
-
-
-def generate_insert_query(table_name, columns):
-    """Генерация INSERT запроса на основе структуры таблицы"""
-    # Убираем id из колонок, так как он SERIAL
-    filtered_columns = [col for col in columns if col != 'id']
-    placeholders = ', '.join(['%s'] * len(filtered_columns))
-    columns_str = ', '.join(filtered_columns)
-
-    return f"INSERT INTO {table_name} ({columns_str}) VALUES ({placeholders})"
+from db_utils.connections import create_postgres
+from db_utils.postgres.bulk_load import copy_rows, sync_sequence
+from db_utils.postgres.partitions import PartitionManager
 
 
 def parse_table_structure(table_def):
     """Парсинг структуры таблицы из SQL определения"""
     # Удаляем скобки и разбиваем на строки
-    lines = table_def.strip()[1:-1].split(',')
+    body = table_def.strip()
+    lines = body[body.index('(') + 1:body.rindex(')')].split(',')
     columns = []
 
     for line in lines:
         line = line.strip()
         if not line:
             continue
-        # Берем первое слово как имя колонки
+        # Берем первое слово как имя колонки, ограничения таблицы пропускаем
         column_name = line.split()[0]
+        if not column_name.isidentifier() or column_name.upper() in ('PRIMARY', 'FOREIGN', 'UNIQUE'):
+            continue
         columns.append(column_name)
 
     return columns
 
 
 def insert_data_from_dict(cur, table_name, data):
-    """Вставка данных для конкретной таблицы"""
+    """
+    Загрузка данных таблицы одним COPY. Идентификаторы назначаются на клиенте
+    по порядку строк (1, 2, ...), как их раньше выдавал SERIAL, после чего
+    последовательность сдвигается за последний id.
+    """
     print(f"Добавление данных в {table_name}")
     if table_name not in TABLES:
         print(f"Таблица {table_name} не найдена в определении TABLES")
         return
 
-    table_def = TABLES[table_name]
-    columns = parse_table_structure(table_def)
-
-    query = generate_insert_query(table_name, columns)
-
-    for row in data:
-        cur.execute(query, row)
+    columns = parse_table_structure(TABLES[table_name])
+    values_count = len(columns) - 1
+    rows = (
+        (row_id, *row[:values_count]) for row_id, row in enumerate(data, start=1)
+    )
+    copy_rows(cur, table_name, columns, rows)
+    sync_sequence(cur, table_name)
 
 
 def create_schedule_dict(cur, table_name, data):
-    """Создание словаря schedule_id -> scheduled_date"""
-    print(f"Добавление данных в {table_name}")
-    if table_name not in TABLES:
-        print(f"Таблица {table_name} не найдена в определении TABLES")
-        return
-
-    table_def = TABLES[table_name]
-    columns = parse_table_structure(table_def)
-
-    schedule_dict = {}
-
-    query = generate_insert_query(table_name, columns) + ' RETURNING ID'
-
-    for schedule_row in data:
-        scheduled_date = schedule_row[3]
-
-        cur.execute(query, schedule_row)
-        schedule_id = cur.fetchone()[0]
-
-        schedule_dict[schedule_id] = scheduled_date
-
-    return schedule_dict
+    """Загрузка расписания и создание словаря schedule_id -> scheduled_date"""
+    insert_data_from_dict(cur, table_name, data)
+    # id назначены по порядку строк, поэтому RETURNING не нужен
+    return {
+        schedule_id: schedule_row[3]
+        for schedule_id, schedule_row in enumerate(data, start=1)
+    }
 
 
 def insert_attendance_with_schedule_dict(cur, table_name, data, schedule_dict):
     """Вставка данных в Attendance с использованием словаря schedule"""
     print("Добавление данных в Attendance с использованием словаря schedule")
 
-    # Парсим структуру таблицы Attendance
-    table_def = TABLES['Attendance']
-    columns = parse_table_structure(table_def)
-    columns = columns[0:4]  # Берем только первые 4 колонки
+    missing = set()
 
-    query = generate_insert_query(table_name, columns)
-
-    for row in data:
-        # Предполагаем, что row содержит [schedule_id, student_id, ...]
-        # Если в ваших данных ATTENDANCE другой формат, измените индексы
-        schedule_id = row[0]
-        student_id = row[1]
-
-        # Получаем scheduled_date из словаря
-        if schedule_id in schedule_dict:
-            attendance_date = schedule_dict[schedule_id]
+    def rows():
+        # row содержит [schedule_id, student_id, ...], дата берется из расписания
+        for row in data:
+            schedule_id, student_id = row[0], row[1]
+            if schedule_id in schedule_dict:
+                yield schedule_id, student_id, schedule_dict[schedule_id]
+            else:
+                missing.add(schedule_id)
 
-            # Вставляем запись
-            cur.execute(query, (schedule_id, student_id, attendance_date))
-            print(
-                f"Вставлена запись: schedule_id={schedule_id}, student_id={student_id}, date={attendance_date}")
-        else:
-            print(
-                f"Предупреждение: schedule_id {schedule_id} не найден в словаре")
+    copy_rows(cur, table_name, ('schedule_id', 'student_id', 'attendance_date'), rows())
+    if missing:
+        print(f"Предупреждение: schedule_id {sorted(missing)} не найдены в словаре")
 
 
 def insert_data():
     """Основная функция для заполнения БД"""
-    conn = psycopg2.connect(
-        dbname=DB_NAME,
-        user=DB_USER,
-        password=DB_PASSWORD,
-        host=DB_HOST,
-        port=DB_PORT
-    )
+    conn = create_postgres()
     cur = conn.cursor()
 
     try:
@@ -131,17 +99,20 @@ def insert_data():
             ('Attendance', ATTENDANCE)
         ]
 
-        for table_name, data in tables_order:
-            if table_name == 'Schedule':
-                schedule_dict = create_schedule_dict(cur, table_name, data)
-                print(f"Создан словарь schedule: {schedule_dict}")
-            elif table_name == 'Attendance':
-                insert_attendance_with_schedule_dict(
-                    cur, table_name, data, schedule_dict)
-            else:
-                insert_data_from_dict(cur, table_name, data)
-
-        conn.commit()
+        # Партиции Attendance создаются заранее для всего расписания
+        schedule_dates = [date.fromisoformat(str(row[3])) for row in SCHEDULE]
+        with PartitionManager(conn).bulk_load(min(schedule_dates), max(schedule_dates)):
+            for table_name, data in tables_order:
+                if table_name == 'Schedule':
+                    schedule_dict = create_schedule_dict(cur, table_name, data)
+                    print(f"Создан словарь schedule: {len(schedule_dict)} записей")
+                elif table_name == 'Attendance':
+                    insert_attendance_with_schedule_dict(
+                        cur, table_name, data, schedule_dict)
+                else:
+                    insert_data_from_dict(cur, table_name, data)
+
+            conn.commit()
         print("Данные успешно добавлены в БД Postgres")
 
     except Exception as e:
@@ -0,0 +1,366 @@
+"""
+Генератор синтетических данных для нагрузочного тестирования.
+
+Размер набора задается параметрами (университеты, группы, студенты в группе,
+курсы, занятий в неделю, семестры, доля посещений, длина материалов).
+Данные детерминированы: одинаковые параметры и seed дают одинаковые строки.
+Строки генерируются потоком и загружаются в Postgres через COPY, поэтому
+объем Attendance (от 10^3 до 10^8 строк) ограничен только диском.
+
+Запуск:
+    export PYTHONPATH=.
+    python -m db_utils.postgres.generate_synthetic_data --groups-per-department 10 --students-per-group 30
+    python -m db_utils.postgres.generate_synthetic_data --estimate --semesters 8
+"""
+import argparse
+import logging
+import random
+import sys
+from datetime import date, timedelta
+from db_utils.connections import create_postgres
+from db_utils.postgres.bulk_load import copy_rows, sync_sequence
+from db_utils.postgres.partitions import PartitionManager
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+FIRST_NAMES = ['Иван', 'Алексей', 'Мария', 'Дмитрий', 'Анна', 'Михаил', 'Сергей',
+               'Екатерина', 'Андрей', 'Ольга', 'Артем', 'Наталья', 'Игорь', 'Виктория',
+               'Александр', 'Елена', 'Павел', 'Дарья', 'Николай', 'Анастасия']
+LAST_NAMES = ['Иванов', 'Петров', 'Сидоров', 'Кузнецов', 'Смирнов', 'Попов', 'Федоров',
+              'Морозов', 'Васильев', 'Новиков', 'Лебедев', 'Козлов', 'Павлов', 'Громов',
+              'Белов', 'Волков', 'Медведев', 'Орлов', 'Тихонов', 'Жуков']
+CITIES = ['Москва', 'Санкт-Петербург', 'Новосибирск', 'Казань', 'Екатеринбург',
+          'Томск', 'Самара', 'Нижний Новгород']
+SUBJECTS = ['механика', 'кинематика', 'динамика', 'астрономия', 'космология',
+            'термодинамика', 'электродинамика', 'оптика', 'сопротивление материалов',
+            'робототехника', 'мехатроника', 'теория управления', 'квантовая физика',
+            'численные методы', 'математический анализ', 'программирование']
+WORDS = ['лекция', 'задача', 'уравнение', 'энергия', 'импульс', 'скорость', 'ускорение',
+         'сила', 'масса', 'движение', 'система', 'модель', 'расчет', 'метод', 'теорема',
+         'закон', 'сохранение', 'звезда', 'галактика', 'излучение', 'поле', 'волна',
+         'частица', 'момент', 'инерция', 'траектория', 'колебания', 'анализ', 'данные',
+         'эксперимент', 'измерение', 'погрешность', 'график', 'функция', 'интеграл']
+TAGS = ['Обычный тэг', 'Важный тэг', 'Экзамен', 'Практикум', 'Факультатив']
+CLASS_TYPES = ['лекция', 'практика']
+TECH_REQUIREMENTS = ['Проектор, доска', 'Доска, маркеры', 'Компьютерный класс',
+                     'Лабораторное оборудование']
+LESSON_SLOTS = [('09:00', '10:30'), ('10:40', '12:10'), ('12:40', '14:10'),
+                ('14:20', '15:50'), ('16:00', '17:30'), ('17:40', '19:10')]
+WEEKS_PER_SEMESTER = 16
+STUDY_DAYS_PER_WEEK = 6
+
+# Готовые размеры наборов для нагрузочных тестов (параметры SyntheticDataGenerator)
+PRESETS = {
+    'small': {'groups_per_department': 2, 'students_per_group': 25, 'semesters': 1},
+    'medium': {'groups_per_department': 20, 'students_per_group': 30,
+               'lectures_per_week': 8, 'semesters': 2},
+    'large': {'groups_per_department': 100, 'students_per_group': 30,
+              'lectures_per_week': 10, 'semesters': 8},
+}
+
+
+class SyntheticDataGenerator:
+    def __init__(self, universities: int = 2, institutes_per_university: int = 2,
+                 departments_per_institute: int = 2, groups_per_department: int = 2,
+                 students_per_group: int = 25, courses_per_department: int = 2,
+                 classes_per_course: int = 6, lectures_per_week: int = 4,
+                 semesters: int = 1, attendance_rate: float = 0.8,
+                 material_length: int = 500, start_date: date = date(2023, 9, 1),
+                 seed: int = 42):
+        """
+        Параметры размера синтетического набора. Идентификаторы назначаются
+        на клиенте, поэтому связи между таблицами вычисляются без чтения из БД.
+
+        :param attendance_rate: Вероятность посещения студентом занятия (0..1)
+        :param material_length: Примерная длина текста материала в символах
+        :param start_date: Дата начала первого семестра
+        :param seed: Начальное значение генератора случайных чисел
+        """
+        self.universities = universities
+        self.institutes_per_university = institutes_per_university
+        self.departments_per_institute = departments_per_institute
+        self.groups_per_department = groups_per_department
+        self.students_per_group = students_per_group
+        self.courses_per_department = courses_per_department
+        self.classes_per_course = classes_per_course
+        self.lectures_per_week = min(lectures_per_week, STUDY_DAYS_PER_WEEK * len(LESSON_SLOTS))
+        self.semesters = semesters
+        self.attendance_rate = attendance_rate
+        self.material_length = material_length
+        self.start_date = start_date
+        self.seed = seed
+
+        self.institutes = universities * institutes_per_university
+        self.departments = self.institutes * departments_per_institute
+        self.groups = self.departments * groups_per_department
+        self.courses = self.departments * courses_per_department
+        self.classes = self.courses * classes_per_course
+        self.specialties = max(1, self.departments)
+
+    def rng(self, table_name: str) -> random.Random:
+        """Отдельный генератор на таблицу: строки таблицы не зависят от размеров других"""
+        return random.Random(f"{self.seed}:{table_name}")
+
+    def estimate(self) -> dict:
+        """Ожидаемое количество строк в каждой таблице"""
+        schedule = self.groups * self.semesters * WEEKS_PER_SEMESTER * self.lectures_per_week
+        return {
+            'Universities': self.universities,
+            'Institutes': self.institutes,
+            'Departments': self.departments,
+            'Specialties': self.specialties,
+            'Student_Groups': self.groups,
+            'Students': self.groups * self.students_per_group,
+            'Course_of_classes': self.courses,
+            'Class': self.classes,
+            'Class_Materials': self.classes,
+            'Schedule': schedule,
+            'Attendance': round(schedule * self.students_per_group * self.attendance_rate),
+        }
+
+    def date_range(self) -> tuple:
+        """Первая и последняя возможная дата занятий"""
+        last_week = 26 * (self.semesters - 1) + WEEKS_PER_SEMESTER
+        return self.start_date, self.start_date + timedelta(weeks=last_week)
+
+    def universities_rows(self):
+        rng = self.rng('Universities')
+        for university_id in range(1, self.universities + 1):
+            city = rng.choice(CITIES)
+            founded = date(rng.randint(1700, 1990), rng.randint(1, 12), rng.randint(1, 28))
+            yield (university_id, f"Университет №{university_id} ({city})",
+                   f"{city}, ул. Университетская, {university_id}", founded)
+
+    def institutes_rows(self):
+        rng = self.rng('Institutes')
+        for institute_id in range(1, self.institutes + 1):
+            university_id = (institute_id - 1) // self.institutes_per_university + 1
+            yield institute_id, university_id, f"Институт {rng.choice(SUBJECTS)} №{institute_id}"
+
+    def departments_rows(self):
+        rng = self.rng('Departments')
+        for department_id in range(1, self.departments + 1):
+            institute_id = (department_id - 1) // self.departments_per_institute + 1
+            yield department_id, institute_id, f"Кафедра {rng.choice(SUBJECTS)} №{department_id}"
+
+    def specialties_rows(self):
+        rng = self.rng('Specialties')
+        for specialty_id in range(1, self.specialties + 1):
+            code = f"{rng.randint(1, 45):02d}.03.{specialty_id % 100:02d}"
+            yield specialty_id, code, f"{rng.choice(SUBJECTS).capitalize()} ({specialty_id})"
+
+    def group_department(self, group_id: int) -> int:
+        return (group_id - 1) // self.groups_per_department + 1
+
+    def group_students(self, group_id: int) -> range:
+        first = (group_id - 1) * self.students_per_group + 1
+        return range(first, first + self.students_per_group)
+
+    def student_groups_rows(self):
+        for group_id in range(1, self.groups + 1):
+            course_year = (group_id - 1) % 4 + 1
+            yield (group_id, self.group_department(group_id),
+                   f"ГР-{course_year}{group_id:05d}", course_year)
+
+    def students_rows(self):
+        rng = self.rng('Students')
+        for group_id in range(1, self.groups + 1):
+            course_year = (group_id - 1) % 4 + 1
+            enrollment_year = self.start_date.year - course_year + 1
+            for student_id in self.group_students(group_id):
+                last_name = rng.choice(LAST_NAMES)
+                first_name = rng.choice(FIRST_NAMES)
+                if first_name[-1] in 'ая':
+                    last_name += 'а'
+                birth = date(enrollment_year - 18, 1, 1) + timedelta(days=rng.randrange(730))
+                yield (student_id, group_id, f"{last_name} {first_name}", enrollment_year,
+                       birth, f"student{student_id}@university.edu", f"{student_id:08d}")
+
+    def courses_rows(self):
+        rng = self.rng('Course_of_classes')
+        for course_id in range(1, self.courses + 1):
+            department_id = (course_id - 1) // self.courses_per_department + 1
+            subject = rng.choice(SUBJECTS)
+            yield (course_id, department_id, (department_id - 1) % self.specialties + 1,
+                   f"Курс «{subject.capitalize()}» №{course_id}",
+                   f"Учебный курс по дисциплине {subject}")
+
+    def class_course(self, class_id: int) -> int:
+        return (class_id - 1) // self.classes_per_course + 1
+
+    def classes_rows(self):
+        """
+        Часть занятий помечается названием кафедры курса, как в tables_data:
+        по этому тэгу отчет третьей лабораторной ищет профильные лекции
+        """
+        rng = self.rng('Class')
+        department_names = {row[0]: row[2] for row in self.departments_rows()}
+        for class_id in range(1, self.classes + 1):
+            class_type = CLASS_TYPES[(class_id - 1) % len(CLASS_TYPES)]
+            name = f"{class_type.capitalize()} {class_id}: {rng.choice(SUBJECTS)}"
+            course_id = self.class_course(class_id)
+            department_id = (course_id - 1) // self.courses_per_department + 1
+            tag = department_names[department_id] if rng.random() < 0.3 else rng.choice(TAGS)
+            yield (class_id, name, course_id, tag, class_type, rng.choice(TECH_REQUIREMENTS))
+
+    def materials_rows(self):
+        rng = self.rng('Class_Materials')
+        for class_id in range(1, self.classes + 1):
+            words = [rng.choice(SUBJECTS)]
+            length = len(words[0])
+            while length < self.material_length:
+                word = rng.choice(WORDS)
+                words.append(word)
+                length += len(word) + 1
+            yield class_id, class_id, f"Конспект: {' '.join(words)}"
+
+    def department_classes(self, department_id: int) -> range:
+        """Занятия всех курсов кафедры (идентификаторы идут подряд)"""
+        first_course = (department_id - 1) * self.courses_per_department + 1
+        first = (first_course - 1) * self.classes_per_course + 1
+        return range(first, first + self.courses_per_department * self.classes_per_course)
+
+    def schedule_rows(self):
+        """
+        Расписание: для каждой группы, семестра и недели lectures_per_week занятий
+        из курсов кафедры группы. Семестры начинаются каждые 26 недель от start_date.
+        """
+        slots_per_day = len(LESSON_SLOTS)
+        schedule_id = 0
+        for group_id in range(1, self.groups + 1):
+            classes = self.department_classes(self.group_department(group_id))
+            room = f"{group_id % 500 + 100}"
+            for semester in range(self.semesters):
+                semester_start = self.start_date + timedelta(weeks=26 * semester)
+                for week in range(WEEKS_PER_SEMESTER):
+                    week_start = semester_start + timedelta(weeks=week)
+                    for lesson in range(self.lectures_per_week):
+                        schedule_id += 1
+                        day, slot = divmod(lesson, slots_per_day)
+                        class_id = classes[(week * self.lectures_per_week + lesson) % len(classes)]
+                        start_time, end_time = LESSON_SLOTS[slot]
+                        yield (schedule_id, group_id, class_id, room,
+                               week_start + timedelta(days=day), start_time, end_time)
+
+    def attendance_rows(self):
+        """Посещения строятся из расписания потоком, без хранения расписания в памяти"""
+        rng = self.rng('Attendance')
+        rate = self.attendance_rate
+        attendance_id = 0
+        for schedule_id, group_id, _, _, scheduled_date, _, _ in self.schedule_rows():
+            for student_id in self.group_students(group_id):
+                if rng.random() < rate:
+                    attendance_id += 1
+                    yield attendance_id, schedule_id, student_id, scheduled_date
+
+    def tables(self) -> list:
+        """Таблицы в порядке загрузки с учетом внешних ключей"""
+        return [
+            ('Universities', ('id', 'name', 'address', 'founded_date'),
+             self.universities_rows),
+            ('Institutes', ('id', 'university_id', 'name'), self.institutes_rows),
+            ('Departments', ('id', 'institute_id', 'name'), self.departments_rows),
+            ('Specialties', ('id', 'code', 'name'), self.specialties_rows),
+            ('Student_Groups', ('id', 'department_id', 'name', 'course_year'),
+             self.student_groups_rows),
+            ('Students', ('id', 'group_id', 'name', 'enrollment_year', 'date_of_birth',
+                          'email', 'book_number'), self.students_rows),
+            ('Course_of_classes', ('id', 'department_id', 'specialty_id', 'name',
+                                   'description'), self.courses_rows),
+            ('Class', ('id', 'name', 'course_of_class_id', 'tags', 'type',
+                       'tech_requirements'), self.classes_rows),
+            ('Class_Materials', ('id', 'class_id', 'content'), self.materials_rows),
+            ('Schedule', ('id', 'group_id', 'class_id', 'room', 'scheduled_date',
+                          'start_time', 'end_time'), self.schedule_rows),
+            ('Attendance', ('id', 'schedule_id', 'student_id', 'attendance_date'),
+             self.attendance_rows),
+        ]
+
+    def load(self, conn) -> dict:
+        """
+        Загружает весь набор в пустые таблицы. Каждая таблица — отдельная
+        транзакция, чтобы сбой на Attendance не откатывал справочники.
+        Партиции Attendance создаются заранее, триггер на время загрузки снят.
+
+        :return: Количество загруженных строк по таблицам
+        """
+        counts = {}
+        with PartitionManager(conn).bulk_load(*self.date_range()):
+            for table_name, columns, rows in self.tables():
+                with conn.cursor() as cur:
+                    try:
+                        counts[table_name] = copy_rows(cur, table_name, columns, rows())
+                        sync_sequence(cur, table_name)
+                        conn.commit()
+                    except Exception as e:
+                        logger.error(f"Ошибка загрузки {table_name}: {e}")
+                        raise
+        return counts
+
+
+def run_synchronizers() -> bool:
+    """Переносит сгенерированные данные во все остальные хранилища (параллельно)"""
+    from db_utils.sync_orchestrator import print_summary, run_all
+
+    results = run_all()
+    print_summary(results)
+    return all(result['success'] for result in results)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Генерация синтетических данных')
+    parser.add_argument('--universities', type=int, default=2)
+    parser.add_argument('--institutes-per-university', type=int, default=2)
+    parser.add_argument('--departments-per-institute', type=int, default=2)
+    parser.add_argument('--groups-per-department', type=int, default=2)
+    parser.add_argument('--students-per-group', type=int, default=25)
+    parser.add_argument('--courses-per-department', type=int, default=2)
+    parser.add_argument('--classes-per-course', type=int, default=6)
+    parser.add_argument('--lectures-per-week', type=int, default=4)
+    parser.add_argument('--semesters', type=int, default=1)
+    parser.add_argument('--attendance-rate', type=float, default=0.8)
+    parser.add_argument('--material-length', type=int, default=500)
+    parser.add_argument('--start-date', type=date.fromisoformat, default=date(2023, 9, 1))
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--estimate', action='store_true',
+                        help='Только вывести ожидаемое количество строк')
+    parser.add_argument('--keep-tables', action='store_true',
+                        help='Не пересоздавать таблицы перед загрузкой')
+    parser.add_argument('--skip-sync', action='store_true',
+                        help='Не запускать синхронизацию с остальными БД')
+    args = vars(parser.parse_args())
+
+    estimate_only = args.pop('estimate')
+    keep_tables = args.pop('keep_tables')
+    skip_sync = args.pop('skip_sync')
+    generator = SyntheticDataGenerator(**args)
+
+    for table_name, count in generator.estimate().items():
+        logger.info(f"{table_name}: ~{count} строк")
+    if estimate_only:
+        return
+
+    if not keep_tables:
+        from db_utils.postgres.create_postgres_tables import create_tables
+        from db_utils.postgres.drop_postgres_tables import drop_tables
+        drop_tables()
+        create_tables()
+
+    conn = create_postgres()
+    try:
+        generator.load(conn)
+    finally:
+        conn.close()
+    logger.info("Синтетические данные загружены в Postgres")
+
+    if not skip_sync and not run_synchronizers():
+        logger.error("Синхронизация завершилась с ошибками")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
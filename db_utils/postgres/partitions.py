@@ -0,0 +1,325 @@
+"""
+Управление партициями Attendance.
+
+Партиции нужного диапазона дат создаются заранее одной транзакцией, строки
+вне созданных диапазонов попадают в партицию по умолчанию. Для обычных
+вставок в Schedule используется триггер уровня оператора: он вызывается один
+раз на INSERT/COPY и создает партиции для всех новых дат сразу. На время
+массовой загрузки триггер можно отключить через PartitionManager.bulk_load().
+
+Запуск:
+    export PYTHONPATH=.
+    python -m db_utils.postgres.partitions list
+    python -m db_utils.postgres.partitions ensure 2023-09-01 2024-06-30
+    python -m db_utils.postgres.partitions archive 2023-01-01
+"""
+import argparse
+import logging
+import os
+from contextlib import contextmanager
+from datetime import date
+from psycopg2 import sql
+from db_utils.connections import create_postgres
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+# Размер партиции: week, month или quarter
+PARTITION_INTERVAL = os.getenv('ATTENDANCE_PARTITION_INTERVAL', 'month')
+PARTITION_ARCHIVE_SCHEMA = os.getenv('ATTENDANCE_ARCHIVE_SCHEMA', 'archive')
+
+# Формат суффикса имени партиции (to_char в Postgres и strftime в Python)
+# и длина партиции в виде interval Postgres
+INTERVAL_FORMATS = {
+    'week': ('YYYY_MM_DD', '%Y_%m_%d', '1 week'),
+    'month': ('YYYY_MM', '%Y_%m', '1 month'),
+    'quarter': ('YYYY_"q"Q', None, '3 months'),
+}
+
+TRIGGER_FUNCTION_SQL = """
+CREATE OR REPLACE FUNCTION create_attendance_partitions() RETURNS TRIGGER AS $$
+DECLARE
+    step TEXT := TG_ARGV[0];
+    name_format TEXT := TG_ARGV[1];
+    step_length INTERVAL := TG_ARGV[2]::INTERVAL;
+    from_date DATE;
+    partition_name TEXT;
+BEGIN
+    -- Один проход по всем новым датам оператора, а не проверка на каждую строку
+    FOR from_date IN
+        SELECT DISTINCT DATE_TRUNC(step, scheduled_date)::DATE
+        FROM new_rows
+        WHERE scheduled_date IS NOT NULL
+    LOOP
+        partition_name := 'attendance_p_' || TO_CHAR(from_date, name_format);
+        IF TO_REGCLASS(partition_name) IS NULL THEN
+            EXECUTE format(
+                'CREATE TABLE %I PARTITION OF Attendance FOR VALUES FROM (%L) TO (%L)',
+                partition_name, from_date, from_date + step_length
+            );
+            RAISE NOTICE 'Создана партиция: %', partition_name;
+        END IF;
+    END LOOP;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+"""
+
+
+def add_interval(day: date, interval: str) -> date:
+    """Начало следующего интервала"""
+    if interval == 'week':
+        return date.fromordinal(day.toordinal() + 7)
+    months = 3 if interval == 'quarter' else 1
+    month = day.month - 1 + months
+    return date(day.year + month // 12, month % 12 + 1, 1)
+
+
+def truncate_date(day: date, interval: str) -> date:
+    """Аналог DATE_TRUNC: начало недели (понедельник), месяца или квартала"""
+    if interval == 'week':
+        return date.fromordinal(day.toordinal() - day.weekday())
+    if interval == 'quarter':
+        return date(day.year, (day.month - 1) // 3 * 3 + 1, 1)
+    return date(day.year, day.month, 1)
+
+
+def partition_name(from_date: date, interval: str, table_name: str = 'attendance') -> str:
+    if interval == 'quarter':
+        suffix = f"{from_date.year}_q{(from_date.month - 1) // 3 + 1}"
+    else:
+        suffix = from_date.strftime(INTERVAL_FORMATS[interval][1])
+    return f"{table_name}_p_{suffix}"
+
+
+def partition_bounds(start: date, end: date, interval: str = PARTITION_INTERVAL) -> list:
+    """
+    Партиции, покрывающие даты от start до end включительно
+
+    :return: Список кортежей (имя, начало включительно, конец не включительно)
+    """
+    if interval not in INTERVAL_FORMATS:
+        raise ValueError(f"Неизвестный интервал партиций: {interval}")
+    bounds = []
+    from_date = truncate_date(start, interval)
+    while from_date <= end:
+        to_date = add_interval(from_date, interval)
+        bounds.append((partition_name(from_date, interval), from_date, to_date))
+        from_date = to_date
+    return bounds
+
+
+class PartitionManager:
+    def __init__(self, conn, table_name: str = 'Attendance',
+                 interval: str = PARTITION_INTERVAL):
+        """
+        Партиции таблицы Attendance. Методы выполняются в текущей транзакции
+        соединения: фиксирует ее вызывающий код.
+
+        :param conn: Соединение psycopg2
+        :param table_name: Партиционированная таблица
+        :param interval: Размер партиции: week, month или quarter
+        """
+        if interval not in INTERVAL_FORMATS:
+            raise ValueError(f"Неизвестный интервал партиций: {interval}")
+        self.conn = conn
+        self.table_name = table_name
+        self.interval = interval
+        self.default_name = f"{table_name.lower()}_default"
+
+    def list_partitions(self) -> list:
+        """
+        Партиции таблицы с границами
+
+        :return: Список словарей {'name', 'bounds'}; для default bounds = 'DEFAULT'
+        """
+        with self.conn.cursor() as cur:
+            cur.execute("""
+                SELECT child.relname, pg_get_expr(child.relpartbound, child.oid)
+                FROM pg_inherits
+                JOIN pg_class parent ON parent.oid = pg_inherits.inhparent
+                JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+                WHERE parent.relname = %s
+                ORDER BY child.relname
+            """, (self.table_name.lower(),))
+            return [{'name': name, 'bounds': bounds} for name, bounds in cur.fetchall()]
+
+    def ensure_default_partition(self) -> None:
+        with self.conn.cursor() as cur:
+            cur.execute(sql.SQL(
+                "CREATE TABLE IF NOT EXISTS {} PARTITION OF {} DEFAULT"
+            ).format(sql.Identifier(self.default_name), sql.Identifier(self.table_name.lower())))
+
+    def ensure_partitions(self, start: date, end: date) -> list:
+        """
+        Создает недостающие партиции для диапазона дат одним набором DDL.
+        Строки, уже попавшие в default-партицию, переносятся в новые партиции.
+
+        :return: Имена созданных партиций
+        """
+        existing = {partition['name'] for partition in self.list_partitions()}
+        missing = [bounds for bounds in partition_bounds(start, end, self.interval)
+                   if bounds[0] not in existing]
+        if not missing:
+            return []
+
+        table = sql.Identifier(self.table_name.lower())
+        default = sql.Identifier(self.default_name)
+        has_default = self.default_name in existing
+        with self.conn.cursor() as cur:
+            moved = False
+            if has_default:
+                cur.execute(sql.SQL(
+                    "SELECT EXISTS (SELECT 1 FROM {} WHERE attendance_date >= %s AND attendance_date < %s)"
+                ).format(default), (missing[0][1], missing[-1][2]))
+                moved = cur.fetchone()[0]
+                if moved:
+                    # Новая партиция не создается, пока ее строки лежат в default
+                    cur.execute(sql.SQL("ALTER TABLE {} DETACH PARTITION {}").format(table, default))
+
+            for name, from_date, to_date in missing:
+                cur.execute(sql.SQL(
+                    "CREATE TABLE {} PARTITION OF {} FOR VALUES FROM (%s) TO (%s)"
+                ).format(sql.Identifier(name), table), (from_date, to_date))
+
+            if moved:
+                for _, from_date, to_date in missing:
+                    cur.execute(sql.SQL("""
+                        WITH moved AS (
+                            DELETE FROM {} WHERE attendance_date >= %s AND attendance_date < %s
+                            RETURNING *
+                        )
+                        INSERT INTO {} SELECT * FROM moved
+                    """).format(default, table), (from_date, to_date))
+                cur.execute(sql.SQL("ALTER TABLE {} ATTACH PARTITION {} DEFAULT").format(table, default))
+
+        logger.info(f"Создано партиций {self.table_name}: {len(missing)} "
+                    f"({missing[0][0]} .. {missing[-1][0]})")
+        return [name for name, _, _ in missing]
+
+    def ensure_for_schedule(self) -> list:
+        """Создает партиции для всего диапазона дат расписания"""
+        with self.conn.cursor() as cur:
+            cur.execute("SELECT MIN(scheduled_date), MAX(scheduled_date) FROM Schedule")
+            start, end = cur.fetchone()
+        if start is None:
+            return []
+        return self.ensure_partitions(start, end)
+
+    def install_trigger(self) -> None:
+        """Триггер уровня оператора на Schedule, создающий партиции для новых дат"""
+        name_format, _, length = INTERVAL_FORMATS[self.interval]
+        with self.conn.cursor() as cur:
+            cur.execute(TRIGGER_FUNCTION_SQL)
+            cur.execute("DROP TRIGGER IF EXISTS trig_create_attendance_partition ON Schedule")
+            cur.execute(sql.SQL("""
+                CREATE TRIGGER trig_create_attendance_partition
+                AFTER INSERT ON Schedule
+                REFERENCING NEW TABLE AS new_rows
+                FOR EACH STATEMENT EXECUTE FUNCTION create_attendance_partitions({}, {}, {})
+            """).format(sql.Literal(self.interval), sql.Literal(name_format), sql.Literal(length)))
+
+    def drop_trigger(self) -> None:
+        with self.conn.cursor() as cur:
+            cur.execute("DROP TRIGGER IF EXISTS trig_create_attendance_partition ON Schedule")
+
+    def install(self) -> None:
+        """Default-партиция и триггер (вызывается при создании таблиц)"""
+        self.ensure_default_partition()
+        self.install_trigger()
+
+    @contextmanager
+    def bulk_load(self, start: date, end: date):
+        """
+        Массовая загрузка без триггера: партиции диапазона создаются заранее,
+        после загрузки триггер возвращается. Даты вне диапазона попадут в default.
+        В отличие от остальных методов сам фиксирует DDL до и после загрузки.
+        """
+        self.drop_trigger()
+        self.ensure_partitions(start, end)
+        self.conn.commit()
+        try:
+            yield self
+        except Exception:
+            self.conn.rollback()
+            raise
+        finally:
+            self.install_trigger()
+            self.conn.commit()
+
+    def archive_before(self, before: date, schema: str = PARTITION_ARCHIVE_SCHEMA,
+                       drop: bool = False) -> list:
+        """
+        Отсоединяет партиции, целиком лежащие до даты before, и переносит их
+        в архивную схему (или удаляет при drop=True)
+
+        :return: Имена отсоединенных партиций
+        """
+        table = sql.Identifier(self.table_name.lower())
+        archived = []
+        with self.conn.cursor() as cur:
+            if not drop:
+                cur.execute(sql.SQL("CREATE SCHEMA IF NOT EXISTS {}").format(sql.Identifier(schema)))
+            for partition in self.list_partitions():
+                upper = partition_upper_bound(partition['bounds'])
+                if upper is None or upper > before:
+                    continue
+                name = sql.Identifier(partition['name'])
+                cur.execute(sql.SQL("ALTER TABLE {} DETACH PARTITION {}").format(table, name))
+                if drop:
+                    cur.execute(sql.SQL("DROP TABLE {}").format(name))
+                else:
+                    cur.execute(sql.SQL("ALTER TABLE {} SET SCHEMA {}").format(
+                        name, sql.Identifier(schema)))
+                archived.append(partition['name'])
+
+        logger.info(f"{'Удалено' if drop else 'Перенесено в архив'} партиций: {len(archived)}")
+        return archived
+
+
+def partition_upper_bound(bounds: str):
+    """Верхняя граница из выражения FOR VALUES FROM ('...') TO ('...')"""
+    if not bounds.startswith('FOR VALUES FROM'):
+        return None
+    upper = bounds.rsplit("TO ('", 1)[1].split("'", 1)[0]
+    return date.fromisoformat(upper)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Управление партициями Attendance')
+    parser.add_argument('--interval', default=PARTITION_INTERVAL, choices=list(INTERVAL_FORMATS))
+    commands = parser.add_subparsers(dest='command', required=True)
+    commands.add_parser('list', help='Показать партиции')
+    ensure = commands.add_parser('ensure', help='Создать партиции для диапазона дат')
+    ensure.add_argument('start', type=date.fromisoformat)
+    ensure.add_argument('end', type=date.fromisoformat)
+    archive = commands.add_parser('archive', help='Отсоединить партиции старше даты')
+    archive.add_argument('before', type=date.fromisoformat)
+    archive.add_argument('--schema', default=PARTITION_ARCHIVE_SCHEMA)
+    archive.add_argument('--drop', action='store_true', help='Удалить вместо переноса в архив')
+    args = parser.parse_args()
+
+    conn = create_postgres()
+    manager = PartitionManager(conn, interval=args.interval)
+    try:
+        if args.command == 'list':
+            for partition in manager.list_partitions():
+                print(f"{partition['name']}: {partition['bounds']}")
+        elif args.command == 'ensure':
+            manager.ensure_partitions(args.start, args.end)
+        elif args.command == 'archive':
+            manager.archive_before(args.before, args.schema, args.drop)
+        conn.commit()
+    except Exception as e:
+        conn.rollback()
+        logger.error(f"Ошибка управления партициями: {e}")
+        raise
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
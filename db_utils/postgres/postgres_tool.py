@@ -1,6 +1,10 @@
-import psycopg2
 import logging
-from env import DB_HOST, DB_NAME, DB_PASSWORD, DB_PORT, DB_USER
+from datetime import datetime
+from contextlib import contextmanager
+from db_utils.connections import create_postgres, postgres_connection, postgres_pool
+from db_utils.instrumentation import instrument_backend
+from db_utils.log_config import log_payload
+from db_utils.query_stats import explain_postgres, track_query
 
 
 logging.basicConfig(
@@ -10,9 +14,16 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
+@instrument_backend('postgres')
 class PostgresTool:
-    def __init__(self, host=DB_HOST, port=DB_PORT):
+    def __init__(self, host=None, port=None):
+        """
+        :param host: Хост PostgreSQL. Если host и port не заданы, каждый запрос
+            берет соединение из общего пула db_utils.connections и сразу возвращает,
+            поэтому экземпляр не держит соединение между вызовами
+        """
         self.conn = None
+        self.pool = None
         self.host = host
         self.port = port
 
@@ -20,18 +31,26 @@ class PostgresTool:
 
     def connect(self):
         try:
-            self.conn = psycopg2.connect(
-                dbname=DB_NAME,
-                user=DB_USER,
-                password=DB_PASSWORD,
-                host=self.host,
-                port=self.port
-            )
+            if self.host is None and self.port is None:
+                self.pool = postgres_pool()
+            else:
+                overrides = {'host': self.host, 'port': self.port}
+                self.conn = create_postgres(**{key: value for key, value in overrides.items()
+                                               if value is not None})
             logger.info("Connected to PostgreSQL")
         except Exception as e:
             logger.error(f"PostgreSQL connection error: {str(e)}")
             raise
 
+    @contextmanager
+    def _connection(self):
+        """Отдельное соединение экземпляра или соединение из пула на время запроса"""
+        if self.pool is None:
+            yield self.conn
+        else:
+            with postgres_connection() as conn:
+                yield conn
+
     def get_student_group_by_name(self, group_name: str):
         """
         Возвращает id группы студентов по названию группы
@@ -40,14 +59,17 @@ class PostgresTool:
         :return: id группы (число) или None если группа не найдена
         """
         try:
-            with self.conn.cursor() as cur:
+            with self._connection() as conn, conn.cursor() as cur:
                 query = """
                 SELECT id, department_id, name, course_year FROM Student_Groups
                 WHERE LOWER(name) LIKE LOWER(%s)
                 """
-                cur.execute(query, (group_name,))
-
-                result = cur.fetchone()
+                params = (group_name,)
+                with track_query('postgres', query, params,
+                                 lambda: explain_postgres(conn, query, params)) as tracked:
+                    cur.execute(query, params)
+                    result = cur.fetchone()
+                    tracked.rows = cur.rowcount
 
                 if result:
                     id, department_id, name, course_year = result
@@ -69,6 +91,132 @@ class PostgresTool:
             logger.error(f"Ошибка при поиске группы по названию: {str(e)}")
             return None
 
+    def get_lecture_schedules(self, class_ids: list, start_date: str, end_date: str,
+                              raise_errors: bool = False) -> list:
+        """
+        Расписания лекций для указанных Class ID в заданном интервале дат
+        (то же, что Neo4jTool.find_lecture_schedules)
+
+        :param class_ids: Список ID занятий
+        :param start_date: Начальная дата в формате 'YYYY-MM-DD'
+        :param end_date: Конечная дата в формате 'YYYY-MM-DD'
+        :param raise_errors: Выбрасывать ошибки базы вместо пустого списка (для db_utils.router)
+        :return: Список расписаний или пустой список при ошибке
+        """
+        try:
+            # Валидация формата дат
+            datetime.strptime(start_date, '%Y-%m-%d')
+            datetime.strptime(end_date, '%Y-%m-%d')
+        except ValueError as ve:
+            logger.error(f"Некорректный формат даты: {ve}")
+            return []
+
+        try:
+            with self._connection() as conn, conn.cursor() as cur:
+                query = """
+                SELECT sch.id, sch.class_id, sch.room, sch.group_id,
+                       sch.scheduled_date, sch.start_time, sch.end_time
+                FROM Schedule sch
+                JOIN Class c ON c.id = sch.class_id
+                WHERE sch.class_id = ANY(%s)
+                  AND c.type = 'лекция'
+                  AND sch.scheduled_date BETWEEN %s AND %s
+                ORDER BY sch.scheduled_date, sch.start_time
+                """
+                params = (class_ids, start_date, end_date)
+                with track_query('postgres', query, params,
+                                 lambda: explain_postgres(conn, query, params)) as tracked:
+                    cur.execute(query, params)
+                    rows = cur.fetchall()
+                    tracked.rows = len(rows)
+
+                schedules = [{
+                    'id': schedule_id,
+                    'class_id': class_id,
+                    'room': room,
+                    'group_id': group_id,
+                    'scheduled_date': scheduled_date.isoformat(),
+                    'start_time': start_time.isoformat() if start_time else None,
+                    'end_time': end_time.isoformat() if end_time else None,
+                } for schedule_id, class_id, room, group_id, scheduled_date, start_time, end_time in rows]
+
+                logger.info(f"Найдено {len(schedules)} расписаний лекций")
+                return schedules
+
+        except Exception as e:
+            logger.error(f"Ошибка при поиске расписаний: {str(e)}")
+            if raise_errors:
+                raise
+            return []
+
+    def get_students_info_by_group_id(self, group_id: int, raise_errors: bool = False) -> list:
+        """
+        Студенты группы в том же формате, что RedisTool.get_students_info_by_group_id
+
+        :param group_id: ID группы
+        :param raise_errors: Выбрасывать ошибки базы вместо пустого списка (для db_utils.router)
+        :return: Список студентов, отсортированный по ID, или пустой список при ошибке
+        """
+        try:
+            with self._connection() as conn, conn.cursor() as cur:
+                query = """
+                SELECT id, group_id, name, enrollment_year, date_of_birth, email, book_number
+                FROM Students
+                WHERE group_id = %s
+                ORDER BY id
+                """
+                params = (group_id,)
+                with track_query('postgres', query, params,
+                                 lambda: explain_postgres(conn, query, params)) as tracked:
+                    cur.execute(query, params)
+                    rows = cur.fetchall()
+                    tracked.rows = len(rows)
+
+                return [{
+                    'id': student_id,
+                    'group_id': student_group_id,
+                    'name': name,
+                    'enrollment_year': str(enrollment_year),
+                    'date_of_birth': str(date_of_birth),
+                    'email': email,
+                    'book_number': book_number,
+                } for student_id, student_group_id, name, enrollment_year, date_of_birth, email, book_number
+                    in rows]
+
+        except Exception as e:
+            logger.error(f"Ошибка при получении студентов группы {group_id}: {str(e)}")
+            if raise_errors:
+                raise
+            return []
+
+    def get_department_name_by_id(self, department_id: int, raise_errors: bool = False):
+        """
+        Возвращает название кафедры по её ID (то же, что MongoTool.get_department_name_by_id)
+
+        :param department_id: ID кафедры
+        :param raise_errors: Выбрасывать ошибки базы вместо None (для db_utils.router)
+        :return: название кафедры или None если не найдена
+        """
+        try:
+            with self._connection() as conn, conn.cursor() as cur:
+                query = "SELECT name FROM Departments WHERE id = %s"
+                params = (department_id,)
+                with track_query('postgres', query, params) as tracked:
+                    cur.execute(query, params)
+                    result = cur.fetchone()
+                    tracked.rows = cur.rowcount
+
+                if result:
+                    return result[0]
+                logger.warning(f"Кафедра с ID {department_id} не найдена")
+                return None
+
+        except Exception as e:
+            logger.error(f"Ошибка при поиске кафедры по ID: {str(e)}")
+            if raise_errors:
+                raise
+            return None
+
     def get_students_with_lowest_attendance(self, schedule_ids: list, students_ids: list, limit: int = 10):
         """
         Возвращает список студентов с информацией о посещаемости
@@ -84,7 +232,7 @@ class PostgresTool:
         }, ...]
         """
         try:
-            with self.conn.cursor() as cur:
+            with self._connection() as conn, conn.cursor() as cur:
                 attendance_query = """
                 SELECT s.student_id, COALESCE((
                     SELECT COUNT(*)
@@ -95,12 +243,16 @@ class PostgresTool:
                 ORDER BY attendance_count ASC, s.student_id ASC
                 LIMIT %s
                 """
-                cur.execute(attendance_query,
-                            (schedule_ids, students_ids, limit))
+                params = (schedule_ids, students_ids, limit)
+                with track_query('postgres', attendance_query, params,
+                                 lambda: explain_postgres(conn, attendance_query, params)) as tracked:
+                    cur.execute(attendance_query, params)
+                    rows = cur.fetchall()
+                    tracked.rows = len(rows)
 
                 results = []
                 total_lectures = len(schedule_ids)
-                for row in cur.fetchall():
+                for row in rows:
                     student_id, attendance_count = row
                     missed_count = total_lectures - attendance_count
                     attendance_percent = round(
@@ -115,11 +267,85 @@ class PostgresTool:
                     }
                     results.append(student_data)
 
-                    logger.info(
-                        f"Студент (ID: {student_id}): "
-                        f"пропущено {missed_count} из {total_lectures} лекций "
-                        f"({attendance_percent}% посещаемости)"
-                    )
+                logger.debug(
+                    f"Найдено {len(results)} студентов с низкой посещаемостью"
+                )
+                log_payload(logger, 'Студенты с низкой посещаемостью', results)
+                return results
+
+        except Exception as e:
+            logger.error(
+                f"Ошибка при анализе посещаемости: {str(e)}"
+            )
+            return []
+
+    def get_lecture_attendance_report(self, class_ids: list, start_date: str, end_date: str,
+                                      limit: int = 10):
+        """
+        Отчет lab1 одним запросом: расписания лекций за период, студенты их групп
+        и студенты с наименьшей посещаемостью. Результат совпадает с цепочкой
+        Neo4j (расписания) -> Redis (студенты) -> get_students_with_lowest_attendance
+
+        :param class_ids: Массив ID занятий из поиска по материалам
+        :param start_date: Начальная дата в формате 'YYYY-MM-DD'
+        :param end_date: Конечная дата в формате 'YYYY-MM-DD'
+        :param limit: Количество возвращаемых студентов
+        :return: Список словарей в формате [{
+            'student_id': int,
+            'name': str,
+            'group_id': int,
+            'book_number': str,
+            'missed_lectures': int,
+            'total_lectures': int,
+            'attendance_percent': float
+        }, ...]
+        """
+        try:
+            with self._connection() as conn, conn.cursor() as cur:
+                report_query = """
+                WITH lectures AS (
+                    SELECT sch.id, sch.group_id, COUNT(*) OVER () AS total_lectures
+                    FROM Schedule sch
+                    JOIN Class c ON c.id = sch.class_id
+                    WHERE sch.class_id = ANY(%(class_ids)s)
+                      AND c.type = 'лекция'
+                      AND sch.scheduled_date BETWEEN %(start_date)s AND %(end_date)s
+                ),
+                ranked AS (
+                    SELECT s.id, s.name, s.group_id, s.book_number,
+                           COUNT(a.schedule_id) AS attendance_count,
+                           ROW_NUMBER() OVER (ORDER BY COUNT(a.schedule_id), s.id) AS position
+                    FROM Students s
+                    LEFT JOIN Attendance a
+                           ON a.student_id = s.id AND a.schedule_id IN (SELECT id FROM lectures)
+                    WHERE s.group_id IN (SELECT group_id FROM lectures)
+                    GROUP BY s.id
+                )
+                SELECT r.id, r.name, r.group_id, r.book_number, r.attendance_count,
+                       (SELECT MAX(total_lectures) FROM lectures) AS total_lectures
+                FROM ranked r
+                WHERE r.position <= %(limit)s
+                ORDER BY r.position
+                """
+                params = {'class_ids': class_ids, 'start_date': start_date,
+                          'end_date': end_date, 'limit': limit}
+                with track_query('postgres', report_query, params,
+                                 lambda: explain_postgres(conn, report_query, params)) as tracked:
+                    cur.execute(report_query, params)
+                    rows = cur.fetchall()
+                    tracked.rows = len(rows)
+
+                results = []
+                for student_id, name, group_id, book_number, attendance_count, total_lectures in rows:
+                    results.append({
+                        'student_id': student_id,
+                        'name': name,
+                        'group_id': group_id,
+                        'book_number': book_number,
+                        'missed_lectures': total_lectures - attendance_count,
+                        'total_lectures': total_lectures,
+                        'attendance_percent': round((attendance_count / total_lectures) * 100, 2)
+                    })
 
                 logger.info(
                     f"Найдено {len(results)} студентов с низкой посещаемостью"
@@ -128,7 +354,7 @@ class PostgresTool:
 
         except Exception as e:
             logger.error(
-                f"Ошибка при анализе посещаемости: {str(e)}"
+                f"Ошибка при построении отчета о посещаемости: {str(e)}"
             )
             return []
 
@@ -141,16 +367,19 @@ class PostgresTool:
         :return: attendance_info: информация об оставшихся лекция и прослушанных
         """
         try:
-            with self.conn.cursor() as cur:
+            with self._connection() as conn, conn.cursor() as cur:
                 query = """
                     SELECT COUNT(*) AS attendance_count
                     FROM Attendance
                     WHERE student_id = %s
                     AND schedule_id = ANY(%s);
                 """
-                cur.execute(query, (student_id, schedule_list,))
-
-                result = cur.fetchone()
+                params = (student_id, schedule_list)
+                with track_query('postgres', query, params,
+                                 lambda: explain_postgres(conn, query, params)) as tracked:
+                    cur.execute(query, params)
+                    result = cur.fetchone()
+                    tracked.rows = cur.rowcount
 
                 if result:
                     return result[0]
@@ -164,9 +393,12 @@ class PostgresTool:
             return None
 
     def close(self):
-        if self.conn:
-            self.conn.close()
-            logger.info("PostgreSQL connection closed")
+        # Соединения пула возвращаются после каждого запроса
+        if self.conn is None:
+            return
+        self.conn.close()
+        logger.info("PostgreSQL connection closed")
+        self.conn = None
 
     def __del__(self):
         self.close()
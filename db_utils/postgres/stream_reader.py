@@ -0,0 +1,103 @@
+import logging
+import queue
+import threading
+from itertools import count
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+# Сколько строк серверный курсор отдает за одно обращение к PostgreSQL
+STREAM_BATCH_SIZE = 2000
+# Сколько пачек может ждать записи, пока читается следующая
+PREFETCH_BATCHES = 2
+
+_cursor_ids = count(1)
+_DONE = object()
+
+
+def stream_rows(conn, query: str, params=None, batch_size: int = STREAM_BATCH_SIZE,
+                as_dict: bool = False):
+    """
+    Читает результат запроса пачками через именованный (серверный) курсор.
+    В памяти клиента одновременно находится не больше batch_size строк,
+    независимо от размера таблицы.
+
+    :param conn: Соединение psycopg2 (курсор живет внутри его транзакции)
+    :param as_dict: Отдавать строки словарями {колонка: значение}
+    :return: Генератор списков строк
+    """
+    with conn.cursor(name=f"stream_{next(_cursor_ids)}") as cursor:
+        cursor.itersize = batch_size
+        cursor.execute(query, params)
+        columns = None
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            if as_dict:
+                columns = columns or [desc[0] for desc in cursor.description]
+                rows = [dict(zip(columns, row)) for row in rows]
+            yield rows
+
+
+def prefetch(batches, depth: int = PREFETCH_BATCHES):
+    """
+    Читает пачки в фоновом потоке, пока потребитель записывает предыдущие,
+    поэтому чтение из PostgreSQL и запись в целевую БД идут одновременно.
+    Очередь ограничена depth пачками, так что память остается постоянной.
+    Исключение из источника пробрасывается потребителю.
+
+    :param batches: Итератор пачек (например, stream_rows)
+    :return: Генератор тех же пачек
+    """
+    buffer = queue.Queue(maxsize=depth)
+    stop = threading.Event()
+
+    def produce():
+        try:
+            for batch in batches:
+                while not stop.is_set():
+                    try:
+                        buffer.put(batch, timeout=0.1)
+                        break
+                    except queue.Full:
+                        continue
+                if stop.is_set():
+                    break
+        except Exception as e:
+            buffer.put(e)
+        else:
+            buffer.put(_DONE)
+        finally:
+            close = getattr(batches, 'close', None)
+            if close:
+                close()
+
+    producer = threading.Thread(target=produce, name='pg-stream-reader', daemon=True)
+    producer.start()
+    try:
+        while True:
+            item = buffer.get()
+            if item is _DONE:
+                break
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        # Потребитель остановился раньше: освобождаем поток и закрываем курсор
+        stop.set()
+        while producer.is_alive():
+            try:
+                buffer.get(timeout=0.1)
+            except queue.Empty:
+                pass
+        producer.join()
+
+
+def stream_batches(conn, query: str, params=None, batch_size: int = STREAM_BATCH_SIZE,
+                   as_dict: bool = False):
+    """stream_rows с упреждающим чтением следующей пачки"""
+    return prefetch(stream_rows(conn, query, params, batch_size, as_dict))
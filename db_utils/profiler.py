@@ -0,0 +1,186 @@
+"""
+Семплирующий профилировщик для сервисов.
+
+Фоновый поток раз в interval секунд снимает стеки потоков через
+sys._current_frames и считает одинаковые стеки. Результат отдается
+в формате collapsed stacks (строка "поток;функция;функция количество"),
+который принимают flamegraph.pl, speedscope и inferno.
+
+- GET /api/admin/profile?seconds=10 (заголовок X-Admin-Token) профилирует
+  весь процесс воркера заданное время и возвращает файл .folded;
+- PROFILE_SAMPLE_RATE=0.01 профилирует долю запросов отчетов: стеки только
+  потока запроса сохраняются в PROFILE_DIR.
+
+Сигнальные профилировщики видят только главный поток, а запросы в воркере
+gthread выполняются в пуле потоков, поэтому используется опрос стеков.
+"""
+import logging
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+PROFILE_SAMPLE_RATE = float(os.getenv('PROFILE_SAMPLE_RATE', '0'))
+PROFILE_INTERVAL = float(os.getenv('PROFILE_INTERVAL', '0.005'))
+PROFILE_DIR = os.getenv('PROFILE_DIR', '/tmp/profiles')
+
+# Профилирование через маршрут короче таймаута воркера gunicorn
+PROFILE_MAX_SECONDS = 60
+# Верхние кадры из этих файлов означают, что поток простаивает
+IDLE_FILES = ('threading.py', 'queue.py', 'selectors.py')
+
+
+def _collapse(frame, thread_name: str) -> str:
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+        frame = frame.f_back
+    names.append(thread_name)
+    return ';'.join(reversed(names))
+
+
+def _is_idle(frame) -> bool:
+    return os.path.basename(frame.f_code.co_filename) in IDLE_FILES
+
+
+class Sampler:
+    def __init__(self, interval: float = PROFILE_INTERVAL, thread_ids: set = None,
+                 include_idle: bool = False, exclude: set = None):
+        """
+        :param interval: Период снятия стеков в секундах
+        :param thread_ids: Профилировать только эти потоки (по умолчанию все)
+        :param include_idle: Учитывать потоки, которые ждут в threading/queue/selectors
+        :param exclude: Не профилировать эти потоки; потоки, созданные во время
+                        профилирования, учитываются
+        """
+        self.interval = interval
+        self.thread_ids = thread_ids
+        self.exclude = exclude or set()
+        self.include_idle = include_idle
+        self.stacks = Counter()
+        self.samples = 0
+        self.started = None
+        self.seconds = 0.0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self) -> 'Sampler':
+        self.started = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name='profiler', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> 'Sampler':
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.seconds = time.perf_counter() - self.started
+        return self
+
+    def _run(self) -> None:
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id or thread_id in self.exclude:
+                    continue
+                if self.thread_ids is not None and thread_id not in self.thread_ids:
+                    continue
+                if not self.include_idle and _is_idle(frame):
+                    continue
+                self.stacks[_collapse(frame, names.get(thread_id, str(thread_id)))] += 1
+            self.samples += 1
+
+    def collapsed(self) -> str:
+        """Стеки в формате collapsed stacks, самые частые первыми"""
+        return ''.join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+_profile_lock = threading.Lock()
+
+
+def profile_process(seconds: float, interval: float = PROFILE_INTERVAL,
+                    include_idle: bool = False, exclude: set = None) -> Sampler:
+    """
+    Профилирует все потоки процесса seconds секунд
+
+    :param exclude: Потоки, которые не учитываются (например, поток самого запроса)
+    :return: Остановленный Sampler или None, если профилирование уже идет
+    """
+    if not _profile_lock.acquire(blocking=False):
+        return None
+    try:
+        sampler = Sampler(interval, include_idle=include_idle, exclude=exclude).start()
+        time.sleep(seconds)
+        return sampler.stop()
+    finally:
+        _profile_lock.release()
+
+
+def save_profile(sampler: Sampler, name: str) -> str:
+    """Сохраняет стеки в PROFILE_DIR и возвращает путь к файлу"""
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    stamp = time.strftime('%Y%m%d-%H%M%S')
+    path = os.path.join(PROFILE_DIR, f"{name}-{stamp}-{os.getpid()}-{random.getrandbits(16):04x}.folded")
+    with open(path, 'w', encoding='utf-8') as file:
+        file.write(sampler.collapsed())
+    return path
+
+
+def init_app(app, service: str) -> None:
+    """
+    Добавляет GET /api/admin/profile и профилирование доли запросов отчетов
+
+    :param service: Префикс имен файлов профилей
+    """
+    from flask import Response, g, jsonify, request
+    from db_utils.auth import admin_required
+
+    @app.route('/api/admin/profile', methods=['GET'])
+    @admin_required
+    def profile():
+        seconds = request.args.get('seconds', 10, type=float)
+        interval = request.args.get('interval', PROFILE_INTERVAL, type=float)
+        if not 0 < seconds <= PROFILE_MAX_SECONDS or not 0.001 <= interval <= 1:
+            return jsonify({'error': f'seconds: от 0 до {PROFILE_MAX_SECONDS}, interval: от 0.001 до 1'}), 400
+
+        sampler = profile_process(seconds, interval,
+                                  include_idle=request.args.get('idle') == '1',
+                                  exclude={threading.get_ident()})
+        if sampler is None:
+            return jsonify({'error': 'Профилирование в этом воркере уже выполняется'}), 409
+        filename = f"{service}-{os.getpid()}.folded"
+        return Response(sampler.collapsed(), mimetype='text/plain', headers={
+            'Content-Disposition': f'attachment; filename="{filename}"',
+            'X-Profile-Samples': str(sampler.samples),
+        })
+
+    if PROFILE_SAMPLE_RATE <= 0:
+        return
+
+    @app.before_request
+    def start_request_profile():
+        if request.path.endswith('/report') and random.random() < PROFILE_SAMPLE_RATE:
+            g.profiler = Sampler(thread_ids={threading.get_ident()}, include_idle=True).start()
+
+    @app.teardown_request
+    def save_request_profile(exc):
+        sampler = g.pop('profiler', None)
+        if sampler is None:
+            return
+        sampler.stop()
+        try:
+            path = save_profile(sampler, service)
+            logger.info(f"Профиль запроса {request.path} ({sampler.seconds * 1000:.0f} мс, "
+                        f"{sampler.samples} выборок) сохранен в {path}")
+        except OSError as e:
+            logger.warning(f"Не удалось сохранить профиль запроса: {e}")
@@ -0,0 +1,250 @@
+"""
+Статистика запросов к базам по отпечаткам и журнал медленных запросов.
+
+Инструменты db_utils выполняют запросы внутри track_query. Запрос сводится
+к отпечатку (литералы и числа заменяются на ?, у JSON-запросов остается
+только структура), и для каждого отпечатка считаются количество, суммарное
+и максимальное время, число строк и ошибок.
+
+Запрос дольше SLOW_QUERY_MS пишется в лог с параметрами и планом: EXPLAIN
+для PostgreSQL, PROFILE для Cypher, explain для агрегаций MongoDB. План
+одного отпечатка запрашивается не чаще раза в SLOW_QUERY_PLAN_INTERVAL секунд,
+потому что PROFILE повторно выполняет запрос.
+
+Статистика ведется в каждом процессе отдельно и доступна через
+GET /api/admin/queries с заголовком X-Admin-Token (переменная ADMIN_TOKEN).
+"""
+import json
+import logging
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+SLOW_QUERY_MS = float(os.getenv('SLOW_QUERY_MS', '200'))
+SLOW_QUERY_PLAN_INTERVAL = float(os.getenv('SLOW_QUERY_PLAN_INTERVAL', '300'))
+
+# Новые отпечатки сверх лимита учитываются в общей записи OTHER_FINGERPRINT
+MAX_FINGERPRINTS = 1000
+OTHER_FINGERPRINT = '<прочие>'
+# Сколько символов запроса и параметров попадает в журнал медленных запросов
+LOG_MAX_CHARS = 2000
+
+_STRINGS = re.compile(r"'(?:[^']|'')*'")
+_CYPHER_STRINGS = re.compile(r'"(?:[^"\\]|\\.)*"')
+_COMMENTS = re.compile(r"--[^\n]*|//[^\n]*")
+_NUMBERS = re.compile(r"\b\d+(?:\.\d+)?\b")
+_LISTS = re.compile(r"([(\[])\s*\?(?:\s*,\s*\?)+\s*([)\]])")
+_SPACES = re.compile(r"\s+")
+
+
+def _shape(value):
+    """Структура JSON-запроса без значений"""
+    if isinstance(value, dict):
+        return {key: _shape(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        shapes = []
+        for item in value:
+            shape = _shape(item)
+            if shape not in shapes:
+                shapes.append(shape)
+        return shapes
+    return '?'
+
+
+def fingerprint(backend: str, query) -> str:
+    """
+    Отпечаток запроса: одинаковый для запросов, отличающихся только значениями
+
+    :param query: Текст SQL/Cypher/команды Redis или тело запроса (dict, list)
+    """
+    if not isinstance(query, str):
+        return json.dumps(_shape(query), ensure_ascii=False, sort_keys=True)
+    text = _STRINGS.sub('?', query)
+    if backend == 'neo4j':
+        text = _CYPHER_STRINGS.sub('?', text)
+    text = _COMMENTS.sub(' ', text)
+    text = _NUMBERS.sub('?', text)
+    text = _LISTS.sub(r'\1?\2', text)
+    return _SPACES.sub(' ', text).strip()
+
+
+class QueryStat:
+    def __init__(self, backend: str, fingerprint: str):
+        self.backend = backend
+        self.fingerprint = fingerprint
+        self.count = 0
+        self.errors = 0
+        self.slow = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.rows = 0
+        self.last_plan_at = None
+
+    def to_dict(self) -> dict:
+        return {
+            'backend': self.backend,
+            'fingerprint': self.fingerprint,
+            'count': self.count,
+            'errors': self.errors,
+            'slow': self.slow,
+            'total_ms': round(self.total_ms, 3),
+            'mean_ms': round(self.total_ms / self.count, 3) if self.count else 0.0,
+            'max_ms': round(self.max_ms, 3),
+            'rows': self.rows,
+        }
+
+
+class TrackedQuery:
+    """Результат запроса, который заполняет инструмент (число строк)"""
+    def __init__(self):
+        self.rows = None
+
+
+_stats = {}
+_lock = threading.Lock()
+
+
+def _record(backend: str, query, elapsed_ms: float, rows, failed: bool) -> QueryStat:
+    key = (backend, fingerprint(backend, query))
+    with _lock:
+        stat = _stats.get(key)
+        if stat is None:
+            if len(_stats) >= MAX_FINGERPRINTS:
+                key = (backend, OTHER_FINGERPRINT)
+            stat = _stats.setdefault(key, QueryStat(*key))
+        stat.count += 1
+        stat.errors += int(failed)
+        stat.total_ms += elapsed_ms
+        stat.max_ms = max(stat.max_ms, elapsed_ms)
+        stat.rows += rows or 0
+        if elapsed_ms >= SLOW_QUERY_MS:
+            stat.slow += 1
+    return stat
+
+
+def _truncate(value) -> str:
+    text = value if isinstance(value, str) else repr(value)
+    if len(text) > LOG_MAX_CHARS:
+        return f"{text[:LOG_MAX_CHARS]}... ({len(text)} символов)"
+    return text
+
+
+def _log_slow(stat: QueryStat, query, params, elapsed_ms: float, explain) -> None:
+    plan = None
+    now = time.monotonic()
+    with _lock:
+        due = stat.last_plan_at is None or now - stat.last_plan_at >= SLOW_QUERY_PLAN_INTERVAL
+        if explain is not None and due:
+            stat.last_plan_at = now
+        else:
+            explain = None
+    if explain is not None:
+        try:
+            plan = explain()
+        except Exception as e:
+            plan = f"план недоступен: {e}"
+
+    message = (f"Медленный запрос {stat.backend} ({elapsed_ms:.1f} мс): {_truncate(query)}"
+               f"\nПараметры: {_truncate(params)}")
+    if plan:
+        message += f"\nПлан:\n{_truncate(plan)}"
+    logger.warning(message)
+
+
+@contextmanager
+def track_query(backend: str, query, params=None, explain=None):
+    """
+    Учитывает запрос, выполненный внутри блока
+
+    :param query: Текст запроса или тело JSON-запроса
+    :param params: Параметры запроса (только для журнала медленных запросов)
+    :param explain: Функция без аргументов, возвращающая план запроса
+    :return: TrackedQuery, в котором блок задает rows
+    """
+    tracked = TrackedQuery()
+    failed = False
+    started = time.perf_counter()
+    try:
+        yield tracked
+    except BaseException:
+        failed = True
+        raise
+    finally:
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        stat = _record(backend, query, elapsed_ms, tracked.rows, failed)
+        if elapsed_ms >= SLOW_QUERY_MS:
+            _log_slow(stat, query, params, elapsed_ms, explain)
+
+
+def explain_postgres(conn, query: str, params=None) -> str:
+    """План запроса PostgreSQL (EXPLAIN без выполнения)"""
+    with conn.cursor() as cur:
+        cur.execute(f"EXPLAIN {query}", params)
+        return '\n'.join(row[0] for row in cur.fetchall())
+
+
+def _format_profile(plan: dict, depth: int = 0) -> list:
+    args = plan.get('args', {})
+    details = args.get('Details') or args.get('details') or ''
+    lines = [f"{'  ' * depth}{plan.get('operatorType')} rows={plan.get('rows')} "
+             f"dbHits={plan.get('dbHits')} {details}".rstrip()]
+    for child in plan.get('children', []):
+        lines.extend(_format_profile(child, depth + 1))
+    return lines
+
+
+def profile_cypher(driver, query: str, params: dict = None) -> str:
+    """Профиль запроса Cypher (PROFILE выполняет запрос повторно)"""
+    with driver.session() as session:
+        summary = session.run(f"PROFILE {query}", params or {}).consume()
+    if not summary.profile:
+        return ''
+    return '\n'.join(_format_profile(summary.profile))
+
+
+def snapshot(backend: str = None, order_by: str = 'total_ms', limit: int = 50) -> list:
+    """Статистика отпечатков, отсортированная по убыванию order_by"""
+    with _lock:
+        items = [stat.to_dict() for stat in _stats.values()
+                 if backend is None or stat.backend == backend]
+    items.sort(key=lambda item: item.get(order_by, 0), reverse=True)
+    return items[:limit]
+
+
+def reset() -> None:
+    with _lock:
+        _stats.clear()
+
+
+def init_app(app) -> None:
+    """
+    Добавляет GET и DELETE /api/admin/queries. Доступ только с заголовком
+    X-Admin-Token, равным ADMIN_TOKEN; без ADMIN_TOKEN маршрут отключен.
+    """
+    from flask import jsonify, request
+    from db_utils.auth import admin_required
+
+    @app.route('/api/admin/queries', methods=['GET', 'DELETE'])
+    @admin_required
+    def query_stats():
+        if request.method == 'DELETE':
+            reset()
+            return jsonify({'pid': os.getpid(), 'reset': True}), 200
+
+        order_by = request.args.get('order_by', 'total_ms')
+        if order_by not in ('total_ms', 'mean_ms', 'max_ms', 'count', 'rows', 'slow', 'errors'):
+            return jsonify({'error': f'Недопустимое поле сортировки: {order_by}'}), 400
+        return jsonify({
+            'pid': os.getpid(),
+            'slow_query_ms': SLOW_QUERY_MS,
+            'queries': snapshot(request.args.get('backend'), order_by,
+                                request.args.get('limit', 50, type=int)),
+        }), 200
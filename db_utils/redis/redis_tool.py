@@ -1,6 +1,8 @@
-import redis
 import logging
-from env import REDIS_HOST, REDIS_PORT
+from db_utils.connections import create_redis, get_redis
+from db_utils.instrumentation import instrument_backend
+from db_utils.log_config import log_payload
+from db_utils.query_stats import track_query
 
 logging.basicConfig(
     level=logging.INFO,
@@ -9,19 +11,19 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
+@instrument_backend('redis')
 class RedisTool:
-    def __init__(self, host=REDIS_HOST):
+    def __init__(self, host=None):
+        """
+        :param host: Хост Redis. Без него используется общий клиент db_utils.connections
+        """
         self.client = None
         self.host = host
         self.connect()
 
     def connect(self):
         try:
-            self.client = redis.Redis(
-                host=self.host,
-                port=REDIS_PORT,
-                decode_responses=True
-            )
+            self.client = get_redis() if self.host is None else create_redis(host=self.host)
             if self.client.ping():
                 logger.info("Connected to Redis")
             else:
@@ -30,11 +32,13 @@ class RedisTool:
             logger.error(f"Redis connection error: {str(e)}")
             raise
 
-    def get_students_info_by_group_id(self, group_id: int):
+    def get_students_info_by_group_id(self, group_id: int, raise_errors: bool = False):
         """
         Получает список студентов по ID группы
 
         :param group_id: ID группы
+        :param raise_errors: Выбрасывать ошибки и LookupError для группы без индекса
+            вместо пустого списка (для db_utils.router)
         :return: Список ID студентов или пустой список, если группа не найдена
         """
         try:
@@ -42,14 +46,20 @@ class RedisTool:
 
             if not self.client.exists(index_key):
                 logger.warning(f"Индекс группы {group_id} не найден в Redis")
+                if raise_errors:
+                    raise LookupError(f"Индекс группы {group_id} не найден в Redis")
                 return []
 
-            student_ids = self.client.smembers(index_key)
+            with track_query('redis', f"SMEMBERS {index_key}") as tracked:
+                student_ids = self.client.smembers(index_key)
+                tracked.rows = len(student_ids)
 
-            pipe = self.client.pipeline()
-            for sid in student_ids:
-                pipe.hgetall(f"student:{sid}")
-            students_data = pipe.execute()
+            with track_query('redis', "PIPELINE HGETALL student:{id}", student_ids) as tracked:
+                pipe = self.client.pipeline()
+                for sid in student_ids:
+                    pipe.hgetall(f"student:{sid}")
+                students_data = pipe.execute()
+                tracked.rows = len(students_data)
 
             result = []
             for data in students_data:
@@ -59,14 +69,16 @@ class RedisTool:
                     result.append(data)
 
             result.sort(key=lambda x: x["id"])
-            logger.info(f"Получены данные студента {group_id} из Redis")
-            logger.info(f"Студент: {result}")
+            logger.debug(f"Получены данные студентов группы {group_id} из Redis")
+            log_payload(logger, f"Студенты группы {group_id}", result)
 
             return result
 
         except Exception as e:
             logger.error(
                 f"Ошибка при получении студентов группы {group_id}: {str(e)}")
+            if raise_errors:
+                raise
             return []
 
     def get_student_count_by_group_id(self, group_id: int):
@@ -84,7 +96,8 @@ class RedisTool:
                 return 0
 
             # Получаем количество студентов в множестве
-            student_count = self.client.scard(index_key)
+            with track_query('redis', f"SCARD {index_key}"):
+                student_count = self.client.scard(index_key)
 
             logger.info(
                 f"В группе {group_id} найдено {student_count} студентов")
@@ -96,9 +109,11 @@ class RedisTool:
             return 0
 
     def close(self):
-        if self.client:
+        # Общий клиент живет до конца процесса
+        if self.client and self.host is not None:
             self.client.close()
             logger.info("Redis connection closed")
+        self.client = None
 
     def __del__(self):
         self.close()
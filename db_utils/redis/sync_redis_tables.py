@@ -1,10 +1,9 @@
 import psycopg2
 import redis
-from contextlib import closing
 from datetime import datetime
 import logging
-from env import (DB_HOST, DB_NAME, DB_PASSWORD, DB_PORT,
-                 DB_USER, REDIS_HOST, REDIS_PORT)
+from db_utils.connections import create_postgres, create_redis
+from db_utils.postgres.stream_reader import stream_batches
 
 logging.basicConfig(level=logging.INFO,
                     format='%(asctime)s - %(levelname)s - %(message)s')
@@ -26,13 +25,7 @@ class RedisStudentSynchronizer:
     def connect_postgres(self) -> bool:
         """Установка соединения с PostgreSQL"""
         try:
-            self.pg_conn = psycopg2.connect(
-                dbname=DB_NAME,
-                user=DB_USER,
-                password=DB_PASSWORD,
-                host=DB_HOST,
-                port=DB_PORT
-            )
+            self.pg_conn = create_postgres()
             logger.info("Успешное подключение к PostgreSQL")
             return True
         except psycopg2.Error as e:
@@ -42,11 +35,7 @@ class RedisStudentSynchronizer:
     def connect_redis(self) -> bool:
         """Установка соединения с Redis"""
         try:
-            self.redis_client = redis.Redis(
-                host=REDIS_HOST,
-                port=REDIS_PORT,
-                decode_responses=True
-            )
+            self.redis_client = create_redis()
             self.redis_client.ping()
             logger.info("Успешное подключение к Redis")
             return True
@@ -65,65 +54,64 @@ class RedisStudentSynchronizer:
     def clear_redis_data(self) -> None:
         logger.info("Очистка старых данных в Redis")
 
-        # Удаление ключей студентов
-        student_keys = [
-            key for key in self.redis_client.scan_iter("student:*")]
-        # Удаление индексных ключей
-        index_keys = [
-            key for key in self.redis_client.scan_iter("index:student:*")]
-
-        all_keys = student_keys + index_keys
-        if all_keys:
-            self.redis_client.delete(*all_keys)
-            logger.info(f"Удалено {len(all_keys)} ключей Redis")
-
-    def fetch_students_data(self) -> list:
-        """Получение данных студентов из PostgreSQL"""
+        # Ключи студентов и индексные ключи удаляются пачками по мере обхода
+        deleted = 0
+        for pattern in ("student:*", "index:student:*"):
+            keys = []
+            for key in self.redis_client.scan_iter(pattern, count=1000):
+                keys.append(key)
+                if len(keys) >= 1000:
+                    deleted += self.redis_client.unlink(*keys)
+                    keys = []
+            if keys:
+                deleted += self.redis_client.unlink(*keys)
+        if deleted:
+            logger.info(f"Удалено {deleted} ключей Redis")
+
+    def fetch_students_data(self):
+        """Потоковое чтение студентов из PostgreSQL пачками"""
         logger.info("Извлечение данных студентов из PostgreSQL")
+        try:
+            yield from stream_batches(self.pg_conn, """
+                SELECT id, group_id, name, enrollment_year,
+                       date_of_birth, email, book_number
+                FROM Students
+            """)
+        except psycopg2.Error as e:
+            logger.error(f"Ошибка получения данных: {e}")
+            raise
 
-        with closing(self.pg_conn.cursor()) as cursor:
-            try:
-                cursor.execute("""
-                    SELECT id, group_id, name, enrollment_year, 
-                           date_of_birth, email, book_number 
-                    FROM Students
-                """)
-                students = cursor.fetchall()
-                logger.info(f"Получено {len(students)} записей о студентах")
-                return students
-            except psycopg2.Error as e:
-                logger.error(f"Ошибка получения данных: {e}")
-                raise
-
-    def sync_to_redis(self, students: list) -> None:
-        """Сохранение данных студентов в Redis"""
+    def sync_to_redis(self, batches) -> None:
+        """Сохранение данных студентов в Redis: одна пачка — один pipeline"""
         logger.info("Сохранение данных в Redis")
 
-        for student in students:
-            (student_id, group_id, name, enrollment_year,
-             date_of_birth, email, book_number) = student
-
-            student_key = f"student:{student_id}"
-            mapping = {
-                'id': student_id,
-                'group_id': group_id,
-                'name': name,
-                'enrollment_year': enrollment_year,
-                'date_of_birth': str(date_of_birth),
-                'email': email,
-                'book_number': book_number
-            }
-            self.redis_client.hset(student_key, mapping=mapping)
-
-            # Создание индексов
-            self.redis_client.sadd(
-                f"index:student:name:{name.lower()}", student_id)
-            self.redis_client.sadd(
-                f"index:student:email:{email.lower()}", student_id)
-            self.redis_client.sadd(
-                f"index:student:book_number:{book_number.lower()}", student_id)
-            self.redis_client.sadd(
-                f"index:student:group_id:{group_id}", student_id)
+        for students in batches:
+            pipe = self.redis_client.pipeline(transaction=False)
+            for student in students:
+                (student_id, group_id, name, enrollment_year,
+                 date_of_birth, email, book_number) = student
+
+                student_key = f"student:{student_id}"
+                mapping = {
+                    'id': student_id,
+                    'group_id': group_id,
+                    'name': name,
+                    'enrollment_year': enrollment_year,
+                    'date_of_birth': str(date_of_birth),
+                    'email': email,
+                    'book_number': book_number
+                }
+                pipe.hset(student_key, mapping=mapping)
+
+                # Создание индексов
+                pipe.sadd(f"index:student:name:{name.lower()}", student_id)
+                pipe.sadd(f"index:student:email:{email.lower()}", student_id)
+                pipe.sadd(f"index:student:book_number:{book_number.lower()}", student_id)
+                pipe.sadd(f"index:student:group_id:{group_id}", student_id)
+            pipe.execute()
+            self.stats['students'] += len(students)
+
+        logger.info(f"Получено {self.stats['students']} записей о студентах")
 
     def run_sync(self) -> bool:
         """Основной метод выполнения синхронизации"""
@@ -138,16 +126,13 @@ class RedisStudentSynchronizer:
 
             self.clear_redis_data()
 
-            students = self.fetch_students_data()
-            self.stats['students'] = len(students)
+            self.sync_to_redis(self.fetch_students_data())
 
-            if not students:
+            if not self.stats['students']:
                 logger.warning("Нет данных студентов для синхронизации")
                 return False
 
-            self.sync_to_redis(students)
-
-            redis_count = len(self.redis_client.keys("student:*"))
+            redis_count = sum(1 for _ in self.redis_client.scan_iter("student:*", count=1000))
             if redis_count != self.stats['students']:
                 logger.error(
                     f"Несоответствие данных: PostgreSQL={self.stats['students']}, Redis={redis_count}")
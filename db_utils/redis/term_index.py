@@ -0,0 +1,205 @@
+"""
+Индекс термин -> class_id в Redis для поиска материалов в lab1.
+
+Индекс строится после синхронизации Elasticsearch из векторов терминов
+проиндексированных материалов, то есть теми же анализаторами: основы слов
+из поля content и начала слов из подполя content.prefix.
+Каждая сборка пишет ключи с новой версией и переключает term_index:version,
+поэтому запросы не видят наполовину собранный индекс, а кэш прошлой версии
+перестает использоваться сразу после сборки.
+
+Ключи версии v (тип — class_type занятия, например «лекция»):
+    term_index:{v}:term:{тип}:{основа}   — множество class_id (поле content)
+    term_index:{v}:prefix:{тип}:{начало} — множество class_id (подполе content.prefix)
+    term_index:{v}:analyzed:{запрос}     — термины запроса после анализаторов (JSON, с TTL)
+    term_index:{v}:fuzzy:{тип}:{запрос}  — результат поиска в Elasticsearch (JSON, с TTL)
+
+Ответ индекса — объединение занятий по всем основам и словам запроса, то есть
+ровно результат поиска по основе или началу слова (search_class_ids_by_content
+с fuzzy=False), который lab1 выполняет первым. Если по индексу ничего не найдено,
+запрос идет в Elasticsearch (там lab1 переходит к нечеткому поиску), а результат
+кэшируется на TERM_FUZZY_CACHE_TTL секунд. Поэтому отчет по одному запросу
+не зависит от того, ответил ли индекс.
+"""
+import json
+import logging
+import os
+import time
+from collections import defaultdict
+from db_utils.instrumentation import instrument_backend
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+TERM_FUZZY_CACHE_TTL = int(os.getenv('TERM_FUZZY_CACHE_TTL', '3600'))
+
+VERSION_KEY = 'term_index:version'
+NEXT_VERSION_KEY = 'term_index:next_version'
+# Как долго процесс не перечитывает номер версии из Redis
+VERSION_CACHE_SECONDS = 5
+# Сколько документов за раз читается из Elasticsearch при сборке
+BUILD_BATCH_SIZE = 500
+# Поле Elasticsearch -> вид ключей индекса
+INDEXED_FIELDS = {'content': 'term', 'content.prefix': 'prefix'}
+
+_version_cache = {'value': None, 'expires': 0.0}
+
+
+def _normalize(query: str) -> str:
+    return ' '.join(query.lower().split())
+
+
+def _key(version, kind: str, value: str) -> str:
+    return f"term_index:{version}:{kind}:{value}"
+
+
+def _delete_version(client, version) -> int:
+    deleted = 0
+    keys = []
+    for key in client.scan_iter(f"term_index:{version}:*", count=1000):
+        keys.append(key)
+        if len(keys) >= 1000:
+            deleted += client.unlink(*keys)
+            keys = []
+    if keys:
+        deleted += client.unlink(*keys)
+    return deleted
+
+
+def invalidate(client) -> None:
+    """Отключает индекс до следующей сборки (данные Elasticsearch меняются)"""
+    version = client.get(VERSION_KEY)
+    client.delete(VERSION_KEY)
+    if version is not None:
+        _delete_version(client, version)
+
+
+def build_term_index(es_client, client, index_name: str) -> int:
+    """
+    Собирает индекс по всем документам index_name и делает его текущим
+
+    :param es_client: Клиент Elasticsearch
+    :param client: Клиент Redis (decode_responses=True)
+    :return: Количество пар термин-занятие в индексе (основы и начала слов)
+    """
+    from elasticsearch.helpers import scan
+
+    version = client.incr(NEXT_VERSION_KEY)
+    terms = 0
+    batch = []
+
+    def flush(documents: list) -> int:
+        response = es_client.mtermvectors(
+            index=index_name, ids=[doc_id for doc_id, _, _ in documents], fields=list(INDEXED_FIELDS),
+            positions=False, offsets=False, payloads=False,
+            term_statistics=False, field_statistics=False)
+        classes = defaultdict(set)
+        class_by_id = {doc_id: (class_id, class_type) for doc_id, class_id, class_type in documents}
+        for doc in response['docs']:
+            class_id, class_type = class_by_id[doc['_id']]
+            for field, kind in INDEXED_FIELDS.items():
+                vectors = doc.get('term_vectors', {}).get(field)
+                if vectors:
+                    for term in vectors['terms']:
+                        classes[(kind, f"{class_type}:{term}")].add(class_id)
+        pipe = client.pipeline(transaction=False)
+        for (kind, term), class_ids in classes.items():
+            pipe.sadd(_key(version, kind, term), *class_ids)
+        return sum(pipe.execute())
+
+    try:
+        hits = scan(es_client, index=index_name, size=BUILD_BATCH_SIZE,
+                    query={'query': {'match_all': {}}, '_source': ['class_id', 'class_type']})
+        for hit in hits:
+            batch.append((hit['_id'], hit['_source']['class_id'], hit['_source'].get('class_type')))
+            if len(batch) >= BUILD_BATCH_SIZE:
+                terms += flush(batch)
+                batch = []
+        if batch:
+            terms += flush(batch)
+    except Exception:
+        _delete_version(client, version)
+        raise
+
+    previous = client.getset(VERSION_KEY, version)
+    if previous is not None and str(previous) != str(version):
+        _delete_version(client, previous)
+    logger.info(f"Индекс терминов версии {version} собран")
+    return terms
+
+
+@instrument_backend('redis')
+class TermIndex:
+    def __init__(self, client=None):
+        """
+        :param client: Клиент Redis, по умолчанию общий из db_utils.connections
+        """
+        if client is None:
+            from db_utils.connections import get_redis
+            client = get_redis()
+        self.client = client
+
+    def _version(self):
+        now = time.monotonic()
+        if now >= _version_cache['expires']:
+            _version_cache['value'] = self.client.get(VERSION_KEY)
+            _version_cache['expires'] = now + VERSION_CACHE_SECONDS
+        return _version_cache['value']
+
+    def lookup(self, query: str, analyze, class_type: str):
+        """
+        class_id для запроса без обращения к нечеткому поиску
+
+        :param analyze: Функция (запрос, prefix) -> список терминов: основы при prefix=False,
+            слова для content.prefix при prefix=True (вызывается только при первом запросе)
+        :param class_type: Тип занятий (class_type)
+        :return: Кортеж (список class_id или None, источник: 'fuzzy_cache', 'index' или None)
+        """
+        try:
+            return self._lookup(query, analyze, class_type)
+        except Exception as e:
+            logger.error(f"Ошибка поиска в индексе терминов: {e}")
+            return None, None
+
+    def _lookup(self, query: str, analyze, class_type: str):
+        version = self._version()
+        if version is None:
+            return None, None
+        normalized = _normalize(query)
+
+        cached, analyzed = self.client.mget(_key(version, 'fuzzy', f"{class_type}:{normalized}"),
+                                            _key(version, 'analyzed', normalized))
+        if cached is not None:
+            return json.loads(cached), 'fuzzy_cache'
+
+        if analyzed is not None:
+            tokens = json.loads(analyzed)
+        else:
+            tokens = {'term': sorted(set(analyze(query, False))),
+                      'prefix': sorted(set(analyze(query, True)))}
+            if tokens['term'] or tokens['prefix']:
+                self.client.set(_key(version, 'analyzed', normalized),
+                                json.dumps(tokens, ensure_ascii=False), ex=TERM_FUZZY_CACHE_TTL)
+
+        pipe = self.client.pipeline(transaction=False)
+        for kind, kind_tokens in tokens.items():
+            for token in kind_tokens:
+                pipe.smembers(_key(version, kind, f"{class_type}:{token}"))
+        class_ids = {int(class_id) for members in pipe.execute() for class_id in members}
+        if not class_ids:
+            # Без совпадений lab1 переходит к нечеткому поиску в Elasticsearch
+            return None, None
+        return sorted(class_ids), 'index'
+
+    def remember(self, query: str, class_type: str, class_ids: list) -> None:
+        """Кэширует результат поиска в Elasticsearch для запроса"""
+        try:
+            version = self._version()
+            if version is not None:
+                self.client.set(_key(version, 'fuzzy', f"{class_type}:{_normalize(query)}"),
+                                json.dumps(list(class_ids)), ex=TERM_FUZZY_CACHE_TTL)
+        except Exception as e:
+            logger.error(f"Ошибка записи в кэш поиска: {e}")
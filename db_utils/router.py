@@ -0,0 +1,336 @@
+"""
+Выбор базы данных для шагов отчетов.
+
+После синхронизации одни и те же данные лежат в нескольких базах. Для каждого
+логического шага (STEPS) есть реализации в разных базах, и route вызывает ту,
+которая сейчас быстрее и доступна:
+
+- время вызова каждой пары шаг-база сглаживается экспоненциально
+  (EWMA с коэффициентом ROUTER_EWMA_ALPHA), выбирается база с наименьшим;
+- доля ROUTER_EXPLORE_RATE вызовов уходит в другую доступную базу, чтобы
+  оценка медленной базы обновлялась, когда та снова станет быстрой;
+- фоновый поток раз в ROUTER_HEALTH_INTERVAL секунд проверяет базы (ping)
+  тех шагов, которые процесс уже выполнял, с таймаутом ROUTER_PING_TIMEOUT
+  секунд, а база, вызов в которой ROUTER_FAILURE_THRESHOLD раз подряд завершился
+  исключением, исключается на ROUTER_EJECTION_TIME секунд. Вызов с ошибкой
+  повторяется в следующей базе;
+- ROUTER_FORCE="students=postgres,schedules=neo4j" или аргумент backend
+  закрепляют базу шага (для тестов и сравнения).
+
+Реализации вызывают методы инструментов с raise_errors=True: ошибка запроса,
+а также группа без индекса в Redis или кафедра, которой нет в MongoDB (база
+еще не синхронизирована), становятся исключением. Такой вызов учитывается как
+ошибка и повторяется в следующей базе, а не возвращает пустой отчет.
+
+Состояние выбора доступно через GET /api/admin/router (заголовок X-Admin-Token).
+"""
+import logging
+import os
+import random
+import threading
+import time
+from db_utils.metrics import ROUTER_CALLS
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+ROUTER_EWMA_ALPHA = float(os.getenv('ROUTER_EWMA_ALPHA', '0.2'))
+ROUTER_EXPLORE_RATE = float(os.getenv('ROUTER_EXPLORE_RATE', '0.05'))
+ROUTER_FAILURE_THRESHOLD = int(os.getenv('ROUTER_FAILURE_THRESHOLD', '3'))
+ROUTER_EJECTION_TIME = float(os.getenv('ROUTER_EJECTION_TIME', '30'))
+ROUTER_HEALTH_INTERVAL = float(os.getenv('ROUTER_HEALTH_INTERVAL', '5'))
+ROUTER_FORCE = os.getenv('ROUTER_FORCE', '')
+ROUTER_PING_TIMEOUT = float(os.getenv('ROUTER_PING_TIMEOUT', '2'))
+
+
+def _schedules_neo4j(class_ids: list, start_date: str, end_date: str) -> list:
+    from db_utils.neo4j.neo4j_tool import Neo4jTool
+    return Neo4jTool().find_lecture_schedules(class_ids=class_ids, start_date=start_date,
+                                              end_date=end_date, raise_errors=True)
+
+
+def _schedules_postgres(class_ids: list, start_date: str, end_date: str) -> list:
+    from db_utils.postgres.postgres_tool import PostgresTool
+    return PostgresTool().get_lecture_schedules(class_ids=class_ids, start_date=start_date,
+                                                end_date=end_date, raise_errors=True)
+
+
+def _students_redis(group_id: int) -> list:
+    from db_utils.redis.redis_tool import RedisTool
+    return RedisTool().get_students_info_by_group_id(group_id=group_id, raise_errors=True)
+
+
+def _students_postgres(group_id: int) -> list:
+    from db_utils.postgres.postgres_tool import PostgresTool
+    return PostgresTool().get_students_info_by_group_id(group_id=group_id, raise_errors=True)
+
+
+def _department_mongo(department_id: int):
+    from db_utils.mongo.mongo_tool import MongoTool
+    return MongoTool().get_department_name_by_id(department_id=department_id, raise_errors=True)
+
+
+def _department_postgres(department_id: int):
+    from db_utils.postgres.postgres_tool import PostgresTool
+    return PostgresTool().get_department_name_by_id(department_id=department_id, raise_errors=True)
+
+
+# Шаг -> {база: реализация}; первая база предпочтительна, пока времена не измерены
+STEPS = {
+    'schedules': {'neo4j': _schedules_neo4j, 'postgres': _schedules_postgres},
+    'students': {'redis': _students_redis, 'postgres': _students_postgres},
+    'department': {'mongo': _department_mongo, 'postgres': _department_postgres},
+}
+
+
+# Отдельные клиенты проверок с короткими таймаутами: недоступная база не задерживает
+# проверку остальных на таймауты драйвера по умолчанию (30 с у pymongo)
+_ping_clients = {}
+
+
+def _ping_client(name: str, factory):
+    """Клиент проверки текущего процесса (после fork создается заново)"""
+    key = (os.getpid(), name)
+    client = _ping_clients.get(key)
+    if client is None:
+        client = _ping_clients[key] = factory()
+    return client
+
+
+def _ping_postgres() -> None:
+    from db_utils.connections import create_postgres
+    conn = create_postgres(connect_timeout=max(int(ROUTER_PING_TIMEOUT), 1))
+    try:
+        with conn.cursor() as cur:
+            cur.execute('SELECT 1')
+    finally:
+        conn.close()
+
+
+def _ping_redis() -> None:
+    from db_utils.connections import create_redis
+    _ping_client('redis', lambda: create_redis(
+        socket_connect_timeout=ROUTER_PING_TIMEOUT, socket_timeout=ROUTER_PING_TIMEOUT)).ping()
+
+
+def _ping_mongo() -> None:
+    from db_utils.connections import create_mongo
+    timeout_ms = int(ROUTER_PING_TIMEOUT * 1000)
+    _ping_client('mongo', lambda: create_mongo(
+        connectTimeoutMS=timeout_ms, serverSelectionTimeoutMS=timeout_ms,
+        socketTimeoutMS=timeout_ms)).admin.command('ping')
+
+
+def _ping_neo4j() -> None:
+    from db_utils.connections import create_neo4j
+    _ping_client('neo4j', lambda: create_neo4j(
+        connection_timeout=ROUTER_PING_TIMEOUT, connection_acquisition_timeout=ROUTER_PING_TIMEOUT,
+        max_connection_pool_size=1)).verify_connectivity()
+
+
+PINGS = {
+    'postgres': _ping_postgres,
+    'redis': _ping_redis,
+    'mongo': _ping_mongo,
+    'neo4j': _ping_neo4j,
+}
+
+
+def parse_force(value: str) -> dict:
+    """Разбор ROUTER_FORCE вида 'students=postgres, schedules=neo4j'"""
+    forced = {}
+    for item in filter(None, (part.strip() for part in value.split(','))):
+        step, _, backend = item.partition('=')
+        forced[step.strip()] = backend.strip()
+    return forced
+
+
+class BackendStat:
+    def __init__(self):
+        """Состояние одной базы для одного шага"""
+        self.latency = None
+        self.calls = 0
+        self.errors = 0
+        self.consecutive_errors = 0
+        self.ejected_until = 0.0
+
+    def to_dict(self, now: float) -> dict:
+        return {
+            'latency_ms': round(self.latency * 1000, 3) if self.latency is not None else None,
+            'calls': self.calls,
+            'errors': self.errors,
+            'ejected_for': round(max(self.ejected_until - now, 0.0), 1),
+        }
+
+
+class BackendRouter:
+    def __init__(self, steps: dict, pings: dict, forced: dict = None):
+        """
+        :param steps: Шаг -> {база: функция}; функции одного шага принимают одинаковые аргументы
+        :param pings: База -> функция проверки, которая выбрасывает исключение при недоступности
+        :param forced: Шаг -> база, в которую всегда направляется шаг
+        """
+        for step, backend in (forced or {}).items():
+            if backend not in steps.get(step, {}):
+                raise ValueError(f"Шаг {step} не выполняется в базе {backend}")
+        self.steps = steps
+        self.pings = pings
+        self.forced = forced or {}
+        self.stats = {(step, backend): BackendStat()
+                      for step, backends in steps.items() for backend in backends}
+        self.healthy = {backend: True for backends in steps.values() for backend in backends}
+        # Шаги, которые процесс уже выполнял: проверяются только их базы
+        self.routed_steps = set()
+        self.lock = threading.Lock()
+        self.monitor_pid = None
+
+    def _ensure_monitor(self) -> None:
+        """Запускает фоновые проверки в текущем процессе (потоки не переживают fork)"""
+        if self.monitor_pid == os.getpid():
+            return
+        with self.lock:
+            if self.monitor_pid == os.getpid():
+                return
+            self.monitor_pid = os.getpid()
+        threading.Thread(target=self._monitor, daemon=True, name='router-health').start()
+
+    def _monitor(self) -> None:
+        while True:
+            time.sleep(ROUTER_HEALTH_INTERVAL)
+            try:
+                self.check_health()
+            except Exception as e:
+                logger.error(f"Ошибка фоновой проверки баз: {e}")
+
+    def check_health(self) -> None:
+        """Проверяет базы шагов, которые процесс уже выполнял"""
+        with self.lock:
+            backends = sorted({backend for step in self.routed_steps for backend in self.steps[step]})
+        for backend in backends:
+            ping = self.pings.get(backend)
+            if ping is None:
+                continue
+            try:
+                ping()
+                healthy = True
+            except Exception as e:
+                healthy = False
+                logger.debug(f"Проверка {backend}: {e}")
+            if healthy != self.healthy[backend]:
+                logger.warning(f"База {backend} {'снова доступна' if healthy else 'не прошла проверку'}")
+            self.healthy[backend] = healthy
+
+    def candidates(self, step: str) -> list:
+        """Базы шага в порядке попыток"""
+        now = time.monotonic()
+        backends = list(self.steps[step])
+        with self.lock:
+            available = [backend for backend in backends
+                         if self.healthy[backend] and self.stats[(step, backend)].ejected_until <= now]
+            # Если недоступны все, лучше попробовать, чем сразу отказать
+            ranked = available or backends
+            # Неизмеренная база идет первой, чтобы получить оценку; при равенстве сохраняется порядок STEPS
+            ranked.sort(key=lambda backend: self.stats[(step, backend)].latency or 0.0)
+            if len(ranked) > 1 and random.random() < ROUTER_EXPLORE_RATE:
+                ranked.insert(0, ranked.pop(random.randrange(1, len(ranked))))
+        return ranked
+
+    def _record(self, step: str, backend: str, seconds: float, ok: bool) -> None:
+        ROUTER_CALLS.labels(step, backend, 'ok' if ok else 'error').inc()
+        with self.lock:
+            stat = self.stats[(step, backend)]
+            stat.calls += 1
+            if ok:
+                stat.consecutive_errors = 0
+                if stat.latency is None:
+                    stat.latency = seconds
+                else:
+                    stat.latency += ROUTER_EWMA_ALPHA * (seconds - stat.latency)
+                return
+            stat.errors += 1
+            stat.consecutive_errors += 1
+            if stat.consecutive_errors >= ROUTER_FAILURE_THRESHOLD:
+                stat.ejected_until = time.monotonic() + ROUTER_EJECTION_TIME
+                stat.consecutive_errors = 0
+                logger.warning(f"База {backend} исключена из шага {step} на {ROUTER_EJECTION_TIME:.0f} с")
+
+    def route(self, step: str, *args, backend: str = None, **kwargs):
+        """
+        Выполняет шаг в выбранной базе, при исключении — в следующей
+
+        :param step: Имя шага из STEPS
+        :param backend: Выполнить шаг только в этой базе
+        :return: Результат реализации шага
+        """
+        if step not in self.steps:
+            raise KeyError(f"Неизвестный шаг: {step}")
+        backend = backend or self.forced.get(step)
+        if backend is not None and backend not in self.steps[step]:
+            raise ValueError(f"Шаг {step} не выполняется в базе {backend}")
+        if step not in self.routed_steps:
+            with self.lock:
+                self.routed_steps.add(step)
+        self._ensure_monitor()
+
+        error = None
+        for name in [backend] if backend is not None else self.candidates(step):
+            started = time.perf_counter()
+            try:
+                result = self.steps[step][name](*args, **kwargs)
+            except Exception as e:
+                self._record(step, name, time.perf_counter() - started, ok=False)
+                logger.warning(f"Шаг {step} в базе {name} завершился ошибкой: {e}")
+                error = e
+                continue
+            self._record(step, name, time.perf_counter() - started, ok=True)
+            return result
+        raise error
+
+    def snapshot(self) -> dict:
+        """Шаг -> {база: оценка времени, вызовы, ошибки, доступность}"""
+        now = time.monotonic()
+        with self.lock:
+            return {
+                step: {
+                    'forced': self.forced.get(step),
+                    'backends': {
+                        backend: {**self.stats[(step, backend)].to_dict(now),
+                                  'healthy': self.healthy[backend]}
+                        for backend in backends
+                    },
+                }
+                for step, backends in self.steps.items()
+            }
+
+
+_router = None
+_router_lock = threading.Lock()
+
+
+def get_router() -> BackendRouter:
+    """Общий для процесса маршрутизатор шагов STEPS"""
+    global _router
+    if _router is None:
+        with _router_lock:
+            if _router is None:
+                _router = BackendRouter(STEPS, PINGS, parse_force(ROUTER_FORCE))
+    return _router
+
+
+def route(step: str, *args, backend: str = None, **kwargs):
+    """Выполняет шаг отчета в выбранной базе (см. BackendRouter.route)"""
+    return get_router().route(step, *args, backend=backend, **kwargs)
+
+
+def init_app(app) -> None:
+    """Добавляет GET /api/admin/router с состоянием выбора баз"""
+    from flask import jsonify
+    from db_utils.auth import admin_required
+
+    @app.route('/api/admin/router', methods=['GET'])
+    @admin_required
+    def router_status():
+        return jsonify({'pid': os.getpid(), 'steps': get_router().snapshot()}), 200
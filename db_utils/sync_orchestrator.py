@@ -0,0 +1,238 @@
+"""
+Параллельный запуск синхронизаторов Postgres -> MongoDB, Redis, Elasticsearch, Neo4j.
+
+Синхронизаторы только читают Postgres и пишут в разные хранилища, поэтому
+выполняются одновременно в пуле процессов. Перед запуском вместо
+фиксированных пауз проверяется готовность всех баз. Сбой одного
+синхронизатора не прерывает остальные; итог выводится сводкой, а при
+ошибках скрипт завершается с ненулевым кодом.
+
+Запуск:
+    export PYTHONPATH=.
+    python -m db_utils.sync_orchestrator
+    python -m db_utils.sync_orchestrator --only redis,elastic --workers 2
+"""
+import argparse
+import importlib
+import logging
+import resource
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Optional
+from db_utils.connections import (create_elastic, create_mongo, create_neo4j, create_postgres,
+                                  create_redis)
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+# Класс синхронизатора, хранилище назначения и счетчики stats с числом перенесенных строк
+SYNCHRONIZERS = {
+    'mongo': ('db_utils.mongo.sync_mongo_tables:MongoSynchronizer',
+              ('universities', 'institutes', 'departments')),
+    'redis': ('db_utils.redis.sync_redis_tables:RedisStudentSynchronizer',
+              ('students',)),
+    'elastic': ('db_utils.elastic.sync_elastic_tables:ElasticLectureSessionSynchronizer',
+                ('successful',)),
+    'neo4j': ('db_utils.neo4j.sync_neo4j_tables:Neo4jSynchronizer',
+              ('courses', 'classes', 'groups', 'students', 'schedules')),
+}
+
+READY_TIMEOUT = 120
+READY_INTERVAL = 2
+
+
+def check_postgres() -> None:
+    conn = create_postgres(connect_timeout=3)
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SELECT 1")
+    finally:
+        conn.close()
+
+
+def check_mongo() -> None:
+    client = create_mongo(serverSelectionTimeoutMS=3000)
+    try:
+        client.admin.command('ping')
+    finally:
+        client.close()
+
+
+def check_redis() -> None:
+    client = create_redis(socket_connect_timeout=3)
+    try:
+        client.ping()
+    finally:
+        client.close()
+
+
+def check_elastic() -> None:
+    client = create_elastic(request_timeout=3)
+    try:
+        client.cluster.health(wait_for_status='yellow', timeout='3s')
+    finally:
+        client.close()
+
+
+def check_neo4j() -> None:
+    with create_neo4j() as driver:
+        driver.verify_connectivity()
+
+
+READINESS_CHECKS = {
+    'postgres': check_postgres,
+    'mongo': check_mongo,
+    'redis': check_redis,
+    'elastic': check_elastic,
+    'neo4j': check_neo4j,
+}
+
+
+def wait_until_ready(backends, timeout: float = READY_TIMEOUT,
+                     interval: float = READY_INTERVAL) -> dict:
+    """
+    Опрашивает базы, пока все не ответят или не выйдет время
+
+    :param backends: Имена баз из READINESS_CHECKS
+    :return: Словарь {база: текст последней ошибки} для неготовых баз (пустой, если готовы все)
+    """
+    pending = {backend: None for backend in backends}
+    deadline = time.monotonic() + timeout
+    while True:
+        for backend in list(pending):
+            try:
+                READINESS_CHECKS[backend]()
+                del pending[backend]
+                logger.info(f"{backend} готов")
+            except Exception as e:
+                pending[backend] = str(e)
+        if not pending or time.monotonic() >= deadline:
+            break
+        time.sleep(interval)
+
+    for backend, error in pending.items():
+        logger.error(f"{backend} не готов за {timeout} с: {error}")
+    return pending
+
+
+def run_synchronizer(name: str) -> dict:
+    """
+    Выполняет один синхронизатор (в отдельном процессе пула)
+
+    :return: Результат: success, seconds, rows, rows_per_second, round_trips, peak_rss_mb, error
+    """
+    from db_utils.instrumentation import count_round_trips
+
+    path, row_keys = SYNCHRONIZERS[name]
+    module_name, class_name = path.split(':')
+    result = {'name': name, 'success': False, 'rows': 0, 'error': None}
+    with count_round_trips() as round_trips:
+        started = time.perf_counter()
+        try:
+            synchronizer_class = getattr(importlib.import_module(module_name), class_name)
+            synchronizer = synchronizer_class()
+            result['success'] = bool(synchronizer.run_sync())
+            result['rows'] = sum(synchronizer.stats.get(key, 0) for key in row_keys)
+            if not result['success']:
+                result['error'] = 'run_sync вернул ошибку, подробности в логе'
+        except Exception as e:
+            logger.exception(f"Синхронизация {name} прервана: {e}")
+            result['error'] = f"{type(e).__name__}: {e}"
+        seconds = time.perf_counter() - started
+
+    result.update(
+        seconds=round(seconds, 3),
+        rows_per_second=round(result['rows'] / seconds, 1) if seconds else None,
+        round_trips=dict(round_trips),
+        peak_rss_mb=round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    )
+    return result
+
+
+def run_all(names=None, workers: Optional[int] = None) -> list:
+    """
+    Запускает синхронизаторы параллельно. Ошибка одного не останавливает остальные.
+
+    :param names: Имена из SYNCHRONIZERS (по умолчанию все)
+    :param workers: Число процессов (по умолчанию по одному на синхронизатор)
+    :return: Результаты run_synchronizer в порядке names
+    """
+    names = list(names or SYNCHRONIZERS)
+    results = {}
+    with ProcessPoolExecutor(max_workers=workers or len(names)) as executor:
+        futures = {executor.submit(run_synchronizer, name): name for name in names}
+        for future in as_completed(futures):
+            name = futures[future]
+            try:
+                results[name] = future.result()
+            except Exception as e:
+                # Процесс пула упал целиком (например, из-за нехватки памяти)
+                results[name] = {'name': name, 'success': False, 'rows': 0,
+                                 'error': f"{type(e).__name__}: {e}"}
+            status = 'успешно' if results[name]['success'] else 'с ошибками'
+            logger.info(f"Синхронизация {name} завершена {status}")
+    save_last_runs(results.values())
+    return [results[name] for name in names]
+
+
+def save_last_runs(results) -> None:
+    """Сохраняет итоги в Redis для метрик sync_last_run_* сервисов (/metrics)"""
+    from db_utils.metrics import record_sync_run
+    try:
+        client = create_redis(socket_connect_timeout=3)
+        try:
+            for result in results:
+                record_sync_run(client, result)
+        finally:
+            client.close()
+    except Exception as e:
+        logger.warning(f"Не удалось сохранить итоги синхронизации в Redis: {e}")
+
+
+def print_summary(results: list) -> None:
+    print("\n" + "=" * 50)
+    print("ИТОГИ СИНХРОНИЗАЦИИ")
+    print("=" * 50)
+    for result in results:
+        status = 'OK' if result['success'] else 'ОШИБКА'
+        line = f"{result['name']:<8} {status:<7}"
+        if 'seconds' in result:
+            line += f" {result['seconds']:>8.2f} с, строк {result['rows']}"
+        if result['error']:
+            line += f" — {result['error']}"
+        print(line)
+    print("=" * 50 + "\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Параллельная синхронизация Postgres с остальными БД')
+    parser.add_argument('--only', help='Синхронизаторы через запятую: ' + ', '.join(SYNCHRONIZERS))
+    parser.add_argument('--workers', type=int)
+    parser.add_argument('--ready-timeout', type=float, default=READY_TIMEOUT)
+    args = parser.parse_args()
+
+    names = args.only.split(',') if args.only else list(SYNCHRONIZERS)
+    unknown = set(names) - set(SYNCHRONIZERS)
+    if unknown:
+        parser.error(f"Неизвестные синхронизаторы: {', '.join(sorted(unknown))}")
+
+    not_ready = wait_until_ready(['postgres', *names], args.ready_timeout)
+    if 'postgres' in not_ready:
+        sys.exit(1)
+    # Синхронизаторы неготовых баз не запускаются, остальные выполняются
+    runnable = [name for name in names if name not in not_ready]
+    results = run_all(runnable, args.workers) if runnable else []
+    results += [{'name': name, 'success': False, 'rows': 0, 'error': f"база не готова: {not_ready[name]}"}
+                for name in names if name in not_ready]
+
+    print_summary(results)
+    if not all(result['success'] for result in results):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+import pytest
+import db_utils.router as router
+from db_utils.router import BackendRouter, parse_force
+
+
+@pytest.fixture(autouse=True)
+def no_exploration(monkeypatch):
+    """Без случайных вызовов в другую базу порядок попыток детерминирован"""
+    monkeypatch.setattr(router, 'ROUTER_EXPLORE_RATE', 0.0)
+
+
+def make_steps(calls: list, failing: set):
+    def step(name):
+        def call(group_id):
+            calls.append(name)
+            if name in failing:
+                raise LookupError(f"{name}: группа {group_id} не найдена")
+            return [name]
+        return call
+    return {'students': {'redis': step('redis'), 'postgres': step('postgres')}}
+
+
+def test_failed_call_falls_through_to_next_backend():
+    """Ошибка в первой базе не дает пустой результат: вызов повторяется в следующей"""
+    calls = []
+    backend_router = BackendRouter(make_steps(calls, failing={'redis'}), pings={})
+
+    assert backend_router.route('students', group_id=1) == ['postgres']
+    assert calls == ['redis', 'postgres']
+
+    stats = backend_router.snapshot()['students']['backends']
+    assert stats['redis']['errors'] == 1
+    assert stats['redis']['latency_ms'] is None
+    assert stats['postgres']['calls'] == 1
+
+
+def test_backend_is_ejected_after_consecutive_failures(monkeypatch):
+    monkeypatch.setattr(router, 'ROUTER_FAILURE_THRESHOLD', 2)
+    calls = []
+    backend_router = BackendRouter(make_steps(calls, failing={'redis'}), pings={})
+
+    for _ in range(2):
+        backend_router.route('students', group_id=1)
+    calls.clear()
+
+    assert backend_router.route('students', group_id=1) == ['postgres']
+    assert calls == ['postgres']
+    assert backend_router.snapshot()['students']['backends']['redis']['ejected_for'] > 0
+
+
+def test_unhealthy_backend_is_skipped():
+    calls = []
+    redis_up = [True]
+
+    def ping_redis():
+        if not redis_up[0]:
+            raise ConnectionError('redis недоступен')
+
+    backend_router = BackendRouter(make_steps(calls, failing=set()), pings={'redis': ping_redis})
+    backend_router.route('students', group_id=1)
+    redis_up[0] = False
+    backend_router.check_health()
+    calls.clear()
+
+    assert backend_router.route('students', group_id=1) == ['postgres']
+    assert calls == ['postgres']
+
+
+def test_only_backends_of_routed_steps_are_pinged():
+    """База шага, который процесс не выполнял, не проверяется (lab1 не обращается к MongoDB)"""
+    pinged = []
+    steps = {**make_steps([], failing=set()),
+             'department': {'mongo': lambda department_id: 'mongo'}}
+    pings = {name: (lambda name=name: pinged.append(name)) for name in ('redis', 'postgres', 'mongo')}
+    backend_router = BackendRouter(steps, pings=pings)
+
+    backend_router.check_health()
+    assert pinged == []
+
+    backend_router.route('students', group_id=1)
+    backend_router.check_health()
+    assert sorted(pinged) == ['postgres', 'redis']
+
+
+def test_all_backends_failing_raises():
+    backend_router = BackendRouter(make_steps([], failing={'redis', 'postgres'}), pings={})
+
+    with pytest.raises(LookupError):
+        backend_router.route('students', group_id=1)
+
+
+def test_forced_backend():
+    """ROUTER_FORCE и аргумент backend закрепляют базу, даже если она медленнее"""
+    calls = []
+    forced = parse_force(' students = postgres , ')
+    assert forced == {'students': 'postgres'}
+
+    backend_router = BackendRouter(make_steps(calls, failing=set()), pings={}, forced=forced)
+    assert backend_router.route('students', group_id=1) == ['postgres']
+    assert backend_router.route('students', group_id=1, backend='redis') == ['redis']
+    assert calls == ['postgres', 'redis']
+
+    # Закрепленная база с ошибкой не подменяется другой
+    failing_router = BackendRouter(make_steps([], failing={'postgres'}), pings={}, forced=forced)
+    with pytest.raises(LookupError):
+        failing_router.route('students', group_id=1)
+
+    with pytest.raises(ValueError):
+        BackendRouter(make_steps([], failing=set()), pings={}, forced={'students': 'mongo'})
@@ -0,0 +1,318 @@
+"""
+Трассировка запросов в стиле OpenTelemetry без внешних зависимостей.
+
+Шлюз, сервисы лабораторных и методы инструментов db_utils создают спаны
+с атрибутами (база, метод, число строк, HTTP-статус) и длительностью.
+Контекст передается между сервисами заголовком W3C traceparent, поэтому
+спаны одного запроса к шлюзу собираются в одну трассу.
+
+Экспорт включается переменными окружения:
+    TRACE_FILE=traces.jsonl                       — по спану на строку JSON
+    TRACE_OTLP_ENDPOINT=http://localhost:4318     — OTLP/HTTP JSON коллектору
+    TRACE_SAMPLE_RATE=0.1                         — доля трасс, которые пишутся
+Без них спаны не записываются, а входящий traceparent передается дальше.
+"""
+import json
+import logging
+import os
+import queue
+import random
+import threading
+import time
+import urllib.request
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+TRACE_FILE = os.getenv('TRACE_FILE')
+TRACE_OTLP_ENDPOINT = os.getenv('TRACE_OTLP_ENDPOINT')
+TRACE_SAMPLE_RATE = float(os.getenv('TRACE_SAMPLE_RATE', '1'))
+TRACE_SERVICE_NAME = os.getenv('TRACE_SERVICE_NAME')
+TRACING_ENABLED = bool(TRACE_FILE or TRACE_OTLP_ENDPOINT)
+
+# Сколько спанов экспортер отправляет за раз и как часто
+EXPORT_BATCH_SIZE = 256
+EXPORT_INTERVAL = 2.0
+EXPORT_QUEUE_SIZE = 10000
+
+# Коды SpanKind из OTLP
+SPAN_KINDS = {'internal': 1, 'server': 2, 'client': 3}
+
+_current_span = ContextVar('trace_span', default=None)
+_service_name = TRACE_SERVICE_NAME or 'db_utils'
+
+
+class Span:
+    def __init__(self, name: str, trace_id: str, parent_id: str = None,
+                 kind: str = 'internal', sampled: bool = True, attributes: dict = None):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = f"{random.getrandbits(64):016x}"
+        self.parent_id = parent_id
+        self.kind = kind
+        self.sampled = sampled
+        self.attributes = dict(attributes or {})
+        self.status = 'ok'
+        self.error = None
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+
+    def set_attribute(self, key: str, value) -> None:
+        self.attributes[key] = value
+
+    def record_error(self, error: BaseException) -> None:
+        self.status = 'error'
+        self.error = f"{type(error).__name__}: {error}"
+
+    @property
+    def traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-{'01' if self.sampled else '00'}"
+
+    @property
+    def duration_ms(self) -> float:
+        return ((self.end_ns or time.time_ns()) - self.start_ns) / 1e6
+
+    def to_dict(self) -> dict:
+        return {
+            'service': _service_name,
+            'name': self.name,
+            'kind': self.kind,
+            'trace_id': self.trace_id,
+            'span_id': self.span_id,
+            'parent_id': self.parent_id,
+            'start': self.start_ns / 1e9,
+            'duration_ms': round(self.duration_ms, 3),
+            'status': self.status,
+            'error': self.error,
+            'attributes': self.attributes,
+        }
+
+
+class RemoteContext:
+    """Родительский спан из другого сервиса (из заголовка traceparent)"""
+    def __init__(self, trace_id: str, span_id: str, sampled: bool):
+        self.trace_id = trace_id
+        self.span_id = span_id
+        self.sampled = sampled
+
+
+def parse_traceparent(header: str):
+    """
+    Разбор заголовка W3C traceparent: 00-<trace_id>-<span_id>-<flags>
+
+    :return: RemoteContext или None, если заголовок отсутствует или некорректен
+    """
+    parts = (header or '').strip().split('-')
+    if len(parts) != 4 or parts[0] != '00':
+        return None
+    _, trace_id, span_id, flags = parts
+    try:
+        int(trace_id, 16), int(span_id, 16)
+        sampled = bool(int(flags, 16) & 1)
+    except ValueError:
+        return None
+    if len(trace_id) != 32 or len(span_id) != 16 or not int(trace_id, 16) or not int(span_id, 16):
+        return None
+    return RemoteContext(trace_id, span_id, sampled)
+
+
+def current_span():
+    return _current_span.get()
+
+
+@contextmanager
+def start_span(name: str, kind: str = 'internal', parent=None, **attributes):
+    """
+    Спан на время блока; вложенные спаны становятся его потомками.
+    Если трассировка выключена и родителя нет, возвращает None.
+
+    :param parent: Родитель (Span или RemoteContext), по умолчанию текущий спан
+    :param attributes: Атрибуты спана (точки в именах передаются через **{...})
+    """
+    parent = parent or _current_span.get()
+    if parent is None and not TRACING_ENABLED:
+        yield None
+        return
+
+    if parent is None:
+        span = Span(name, f"{random.getrandbits(128):032x}", kind=kind,
+                    sampled=random.random() < TRACE_SAMPLE_RATE, attributes=attributes)
+    else:
+        span = Span(name, parent.trace_id, parent.span_id, kind=kind,
+                    sampled=parent.sampled, attributes=attributes)
+
+    token = _current_span.set(span)
+    try:
+        yield span
+    except BaseException as e:
+        span.record_error(e)
+        raise
+    finally:
+        _current_span.reset(token)
+        end_span(span)
+
+
+def end_span(span: Span) -> None:
+    span.end_ns = time.time_ns()
+    if span.sampled and TRACING_ENABLED:
+        _exporter.submit(span)
+
+
+def inject(headers: dict = None) -> dict:
+    """Добавляет traceparent текущего спана в заголовки исходящего запроса"""
+    headers = {} if headers is None else headers
+    span = _current_span.get()
+    if span is not None:
+        headers['traceparent'] = span.traceparent
+    return headers
+
+
+def _otlp_value(value) -> dict:
+    if isinstance(value, bool):
+        return {'boolValue': value}
+    if isinstance(value, int):
+        return {'intValue': str(value)}
+    if isinstance(value, float):
+        return {'doubleValue': value}
+    return {'stringValue': str(value)}
+
+
+def to_otlp(spans: list) -> dict:
+    """Тело запроса OTLP/HTTP JSON (/v1/traces)"""
+    return {'resourceSpans': [{
+        'resource': {'attributes': [{'key': 'service.name', 'value': _otlp_value(_service_name)}]},
+        'scopeSpans': [{
+            'scope': {'name': __name__},
+            'spans': [{
+                'traceId': span.trace_id,
+                'spanId': span.span_id,
+                'parentSpanId': span.parent_id or '',
+                'name': span.name,
+                'kind': SPAN_KINDS.get(span.kind, 1),
+                'startTimeUnixNano': str(span.start_ns),
+                'endTimeUnixNano': str(span.end_ns),
+                'attributes': [{'key': key, 'value': _otlp_value(value)}
+                               for key, value in span.attributes.items() if value is not None],
+                'status': {'code': 2, 'message': span.error} if span.status == 'error' else {'code': 1},
+            } for span in spans],
+        }],
+    }]}
+
+
+class SpanExporter:
+    def __init__(self):
+        """Фоновая отправка спанов пачками, чтобы экспорт не задерживал запросы"""
+        self.queue = None
+        self.pid = None
+        self.lock = threading.Lock()
+
+    def _ensure_thread(self) -> None:
+        # Поток не переживает fork, поэтому в каждом процессе запускается свой
+        if self.pid == os.getpid():
+            return
+        with self.lock:
+            if self.pid == os.getpid():
+                return
+            self.queue = queue.Queue(maxsize=EXPORT_QUEUE_SIZE)
+            threading.Thread(target=self._run, name='span-exporter', daemon=True).start()
+            self.pid = os.getpid()
+
+    def submit(self, span: Span) -> None:
+        self._ensure_thread()
+        try:
+            self.queue.put_nowait(span)
+        except queue.Full:
+            logger.warning(f"Очередь экспорта трасс переполнена, спан {span.name} отброшен")
+
+    def _run(self) -> None:
+        spans_queue = self.queue
+        while True:
+            batch = [spans_queue.get()]
+            deadline = time.monotonic() + EXPORT_INTERVAL
+            while len(batch) < EXPORT_BATCH_SIZE:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(spans_queue.get(timeout=timeout))
+                except queue.Empty:
+                    break
+            self.export(batch)
+
+    def export(self, spans: list) -> None:
+        if TRACE_FILE:
+            try:
+                with open(TRACE_FILE, 'a', encoding='utf-8') as file:
+                    for span in spans:
+                        file.write(json.dumps(span.to_dict(), ensure_ascii=False, default=str) + '\n')
+            except OSError as e:
+                logger.warning(f"Не удалось записать трассы в {TRACE_FILE}: {e}")
+        if TRACE_OTLP_ENDPOINT:
+            request = urllib.request.Request(
+                f"{TRACE_OTLP_ENDPOINT.rstrip('/')}/v1/traces",
+                data=json.dumps(to_otlp(spans), default=str).encode(),
+                headers={'Content-Type': 'application/json'},
+                method='POST')
+            try:
+                urllib.request.urlopen(request, timeout=5).close()
+            except OSError as e:
+                logger.warning(f"Не удалось отправить трассы в {TRACE_OTLP_ENDPOINT}: {e}")
+
+
+_exporter = SpanExporter()
+
+
+def init_app(app, service: str) -> None:
+    """
+    Серверный спан на каждый запрос приложения. Родитель берется из входящего
+    traceparent, а traceparent спана возвращается в заголовке ответа.
+
+    :param service: Имя сервиса в трассах (переопределяется TRACE_SERVICE_NAME)
+    """
+    from flask import g, request
+
+    global _service_name
+    _service_name = TRACE_SERVICE_NAME or service
+
+    @app.before_request
+    def start_request_span():
+        parent = parse_traceparent(request.headers.get('traceparent'))
+        if parent is None and not TRACING_ENABLED:
+            return
+        rule = request.url_rule.rule if request.url_rule else request.path
+        span = Span(f"{request.method} {rule}", parent.trace_id if parent else f"{random.getrandbits(128):032x}",
+                    parent.span_id if parent else None, kind='server',
+                    sampled=parent.sampled if parent else random.random() < TRACE_SAMPLE_RATE,
+                    attributes={'http.method': request.method, 'http.route': rule,
+                                'http.target': request.path})
+        g.trace_span = span
+        g.trace_token = _current_span.set(span)
+
+    @app.after_request
+    def add_traceparent(response):
+        span = g.get('trace_span')
+        if span is not None:
+            span.set_attribute('http.status_code', response.status_code)
+            if response.status_code >= 500:
+                span.status = 'error'
+            response.headers['traceparent'] = span.traceparent
+        return response
+
+    @app.teardown_request
+    def end_request_span(exc):
+        span = g.pop('trace_span', None)
+        if span is None:
+            return
+        if exc is not None:
+            span.record_error(exc)
+        try:
+            _current_span.reset(g.pop('trace_token'))
+        except ValueError:
+            # Потоковый ответ завершился в другом контексте
+            _current_span.set(None)
+        end_span(span)
@@ -0,0 +1,28 @@
+import logging
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+_post_fork_hooks = []
+
+
+def on_post_fork(func):
+    """
+    Регистрирует функцию, которая будет вызвана в каждом воркере после fork.
+    Используется для создания пулов соединений уже внутри воркера.
+    """
+    _post_fork_hooks.append(func)
+    return func
+
+
+def run_post_fork_hooks() -> None:
+    """Выполняет все зарегистрированные хуки в текущем процессе"""
+    for hook in _post_fork_hooks:
+        try:
+            hook()
+        except Exception as e:
+            logger.error(f"Ошибка в post-fork хуке {hook.__name__}: {e}")
+            raise
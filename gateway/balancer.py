@@ -0,0 +1,257 @@
+import logging
+import os
+import random
+import socket
+import threading
+import time
+from urllib.parse import urlsplit
+from const import (DISCOVERY_INTERVAL, HEALTH_CHECK_INTERVAL, HEALTH_CHECK_PATH,
+                   HEALTH_CHECK_TIMEOUT, LAB_UPSTREAMS, OUTLIER_BASE_EJECTION_TIME,
+                   OUTLIER_CONSECUTIVE_ERRORS, OUTLIER_MAX_EJECTION_TIME,
+                   PROXY_RETRIES)
+from proxy import UpstreamClient, UpstreamError
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+# Ответы upstream, которые считаются отказом экземпляра, а не ошибкой запроса
+FAILURE_STATUSES = {502, 503, 504}
+
+
+class Replica:
+    def __init__(self, lab: str, base_url: str):
+        """Один экземпляр лабораторной и его состояние для балансировки"""
+        self.base_url = base_url
+        self.client = UpstreamClient(f"{lab}@{urlsplit(base_url).netloc}", base_url)
+        self.outstanding = 0
+        self.healthy = True
+        self.consecutive_errors = 0
+        self.ejections = 0
+        self.ejected_until = 0.0
+        # В полуоткрытом состоянии пропускается только один пробный запрос
+        self.probing = False
+
+    def state(self, now: float) -> str:
+        """Состояние circuit breaker: closed, open или half_open"""
+        if self.ejected_until > now:
+            return 'open'
+        if self.ejections > 0:
+            return 'half_open'
+        return 'closed'
+
+    def is_available(self, now: float) -> bool:
+        state = self.state(now)
+        if not self.healthy or state == 'open':
+            return False
+        return not (state == 'half_open' and self.probing)
+
+
+class UpstreamPool:
+    def __init__(self, name: str, urls: list):
+        """
+        Набор экземпляров одной лабораторной с балансировкой по наименьшему
+        числу незавершенных запросов, активными проверками здоровья,
+        пассивным исключением сбойных экземпляров и circuit breaker.
+
+        :param name: Имя лабораторной
+        :param urls: Адреса экземпляров; имена хостов разрешаются во все IP из DNS
+        """
+        self.name = name
+        self.urls = urls
+        self.replicas = {}
+        self.lock = threading.Lock()
+        self.monitor_pid = None
+        self.refresh_replicas()
+
+    @staticmethod
+    def _resolve(url: str) -> list:
+        """Разрешает имя хоста в список адресов экземпляров"""
+        parts = urlsplit(url)
+        port = parts.port or (443 if parts.scheme == 'https' else 80)
+        try:
+            infos = socket.getaddrinfo(parts.hostname, port, type=socket.SOCK_STREAM)
+        except socket.gaierror as e:
+            logger.warning(f"Не удалось разрешить {parts.hostname}: {e}")
+            return [url]
+        addresses = sorted({info[4][0] for info in infos})
+        return [
+            f"{parts.scheme}://[{ip}]:{port}" if ':' in ip else f"{parts.scheme}://{ip}:{port}"
+            for ip in addresses
+        ]
+
+    def refresh_replicas(self) -> None:
+        """Обновляет список экземпляров по DNS (новые добавляются, исчезнувшие убираются)"""
+        discovered = []
+        for url in self.urls:
+            discovered.extend(self._resolve(url))
+
+        with self.lock:
+            current = set(self.replicas)
+            for base_url in discovered:
+                if base_url not in self.replicas:
+                    self.replicas[base_url] = Replica(self.name, base_url)
+                    logger.info(f"{self.name}: добавлен экземпляр {base_url}")
+            removed = [self.replicas.pop(base_url) for base_url in current - set(discovered)]
+        for replica in removed:
+            replica.client.close()
+            logger.info(f"{self.name}: экземпляр {replica.base_url} больше не найден")
+
+    def _ensure_monitor(self) -> None:
+        """Запускает фоновые проверки в текущем процессе (потоки не переживают fork)"""
+        if self.monitor_pid == os.getpid():
+            return
+        with self.lock:
+            if self.monitor_pid == os.getpid():
+                return
+            self.monitor_pid = os.getpid()
+        threading.Thread(target=self._monitor, daemon=True,
+                         name=f"{self.name}-health").start()
+
+    def _monitor(self) -> None:
+        last_discovery = time.monotonic()
+        while True:
+            time.sleep(HEALTH_CHECK_INTERVAL)
+            try:
+                if time.monotonic() - last_discovery >= DISCOVERY_INTERVAL:
+                    self.refresh_replicas()
+                    last_discovery = time.monotonic()
+                self.check_health()
+            except Exception as e:
+                logger.error(f"{self.name}: ошибка фоновой проверки: {e}")
+
+    def check_health(self) -> None:
+        """Активная проверка всех экземпляров"""
+        with self.lock:
+            replicas = list(self.replicas.values())
+        for replica in replicas:
+            healthy = replica.client.check_health(HEALTH_CHECK_PATH, HEALTH_CHECK_TIMEOUT)
+            if healthy != replica.healthy:
+                logger.warning(
+                    f"{self.name}: экземпляр {replica.base_url} "
+                    f"{'снова доступен' if healthy else 'не прошел проверку здоровья'}")
+            replica.healthy = healthy
+
+    def _acquire(self, exclude: set):
+        """Выбирает доступный экземпляр с наименьшим числом незавершенных запросов"""
+        now = time.time()
+        with self.lock:
+            candidates = [
+                replica for replica in self.replicas.values()
+                if replica.base_url not in exclude and replica.is_available(now)
+            ]
+            if not candidates:
+                return None
+            least = min(replica.outstanding for replica in candidates)
+            replica = random.choice(
+                [r for r in candidates if r.outstanding == least])
+            replica.outstanding += 1
+            if replica.state(now) == 'half_open':
+                replica.probing = True
+            return replica
+
+    def _release_unused(self, replica: Replica) -> None:
+        """Освобождает экземпляр, до которого запрос не дошел: его состояние не меняется"""
+        with self.lock:
+            replica.outstanding -= 1
+            replica.probing = False
+
+    def _release(self, replica: Replica, ok: bool) -> None:
+        now = time.time()
+        with self.lock:
+            replica.outstanding -= 1
+            was_probing = replica.probing
+            replica.probing = False
+            if ok:
+                replica.consecutive_errors = 0
+                if replica.ejections:
+                    logger.info(f"{self.name}: экземпляр {replica.base_url} возвращен в работу")
+                replica.ejections = 0
+                return
+
+            replica.consecutive_errors += 1
+            if was_probing or replica.consecutive_errors >= OUTLIER_CONSECUTIVE_ERRORS:
+                replica.ejections += 1
+                ejection_time = min(OUTLIER_BASE_EJECTION_TIME * replica.ejections,
+                                    OUTLIER_MAX_EJECTION_TIME)
+                replica.ejected_until = now + ejection_time
+                replica.consecutive_errors = 0
+                logger.warning(
+                    f"{self.name}: экземпляр {replica.base_url} исключен на {ejection_time:.0f} с")
+
+    def _call(self, method: str, path: str, body: bytes, headers: dict = None):
+        """Выполняет запрос на выбранном экземпляре с повтором на другом при ошибке соединения"""
+        self._ensure_monitor()
+        tried = set()
+        for _ in range(1 + PROXY_RETRIES):
+            replica = self._acquire(tried)
+            if replica is None:
+                break
+            tried.add(replica.base_url)
+            try:
+                result = getattr(replica.client, method)(path, body, headers)
+            except UpstreamError as e:
+                # 503 от собственного лимита параллелизма: экземпляр не отвечал,
+                # поэтому это ни отказ, ни успешный ответ
+                if e.status == 503:
+                    self._release_unused(replica)
+                else:
+                    self._release(replica, ok=False)
+                if not e.retryable:
+                    raise
+                continue
+            return replica, result
+
+        raise UpstreamError(503, f'Нет доступных экземпляров {self.name}')
+
+    def forward(self, path: str, body: bytes, headers: dict = None):
+        """Потоковое проксирование (см. UpstreamClient.forward)"""
+        replica, response = self._call('forward', path, body, headers)
+        ok = response.status_code not in FAILURE_STATUSES
+        response.call_on_close(lambda: self._release(replica, ok))
+        return response
+
+    def fetch(self, path: str, body: bytes, headers: dict = None) -> tuple:
+        """Запрос с чтением всего тела (см. UpstreamClient.fetch)"""
+        replica, result = self._call('fetch', path, body, headers)
+        self._release(replica, result[0] not in FAILURE_STATUSES)
+        return result
+
+    def snapshot(self) -> list:
+        """Состояние экземпляров для диагностики"""
+        now = time.time()
+        with self.lock:
+            return [{
+                'url': replica.base_url,
+                'healthy': replica.healthy,
+                'state': replica.state(now),
+                'outstanding': replica.outstanding,
+                'ejections': replica.ejections,
+            } for replica in self.replicas.values()]
+
+    def close(self) -> None:
+        """Закрывает HTTP-сессии всех экземпляров"""
+        with self.lock:
+            replicas = list(self.replicas.values())
+        for replica in replicas:
+            replica.client.close()
+
+
+POOLS = {}
+
+
+def reset_pools() -> None:
+    """Пересоздает пулы экземпляров (нужно в каждом воркере после fork)"""
+    # Сокеты сессий, унаследованных от мастера, иначе остаются открытыми до сборки мусора
+    for pool in POOLS.values():
+        pool.close()
+    POOLS.clear()
+    POOLS.update({
+        name: UpstreamPool(name, [url.strip() for url in urls.split(',') if url.strip()])
+        for name, urls in LAB_UPSTREAMS.items()
+    })
+
+
+reset_pools()
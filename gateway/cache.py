@@ -0,0 +1,300 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from const import (CACHE_COALESCE_TIMEOUT, CACHE_MAX_ENTRIES, CACHE_PURGE_CHECK_INTERVAL,
+                   CACHE_PURGE_DIR, CACHE_REDIS_URL, CACHE_STALE_TTL, CACHE_TTL)
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = 'gateway:cache'
+# Время последней очистки кэша лабораторной
+PURGED_KEY = 'gateway:cache_purged:{}'
+
+
+class CachedResponse:
+    def __init__(self, status: int, headers: list, body: bytes, stored_at: float = None):
+        self.status = status
+        self.headers = headers
+        self.body = body
+        self.stored_at = stored_at if stored_at is not None else time.time()
+
+    def age(self) -> float:
+        return time.time() - self.stored_at
+
+
+class _Flight:
+    """Запрос к upstream, результат которого ждут все совпадающие запросы"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class ResponseCache:
+    def __init__(self, max_entries: int = CACHE_MAX_ENTRIES, ttl: float = CACHE_TTL,
+                 stale_ttl: float = CACHE_STALE_TTL, redis_url: str = CACHE_REDIS_URL,
+                 purge_dir: str = CACHE_PURGE_DIR):
+        """
+        LRU-кэш ответов в памяти процесса с необязательным общим уровнем в Redis.
+
+        Очистка лабораторной видна всем воркерам: время очистки хранится в Redis,
+        а без него — в файле purge_dir, и записи из памяти, сохраненные раньше,
+        не отдаются.
+
+        :param max_entries: Максимум записей в памяти
+        :param ttl: Сколько секунд ответ считается свежим
+        :param stale_ttl: Сколько секунд после ttl отдается устаревший ответ,
+                          пока в фоне запрашивается новый (stale-while-revalidate)
+        :param redis_url: URL Redis для общего кэша между воркерами, None — только память
+        :param purge_dir: Каталог меток очистки, общий для воркеров одного контейнера
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.flights = {}
+        self.purge_dir = purge_dir
+        # Лабораторная -> (время очистки, когда оно прочитано из Redis)
+        self.purged_at = {}
+        self.redis = None
+
+        if redis_url:
+            try:
+                import redis
+                self.redis = redis.Redis.from_url(redis_url)
+                self.redis.ping()
+                logger.info("Кэш ответов использует Redis")
+            except Exception as e:
+                logger.error(f"Redis для кэша недоступен, используется только память: {e}")
+                self.redis = None
+
+    @staticmethod
+    def make_key(lab: str, route: str, body: bytes):
+        """
+        Ключ кэша по маршруту и нормализованному JSON-телу.
+
+        :return: Ключ или None, если тело не является JSON-объектом
+        """
+        try:
+            data = json.loads(body or b'null')
+        except ValueError:
+            return None
+        if not isinstance(data, dict):
+            return None
+        normalized = json.dumps(data, sort_keys=True, separators=(',', ':'),
+                                ensure_ascii=False)
+        digest = hashlib.sha256(f"{route}\n{normalized}".encode()).hexdigest()
+        return f"{KEY_PREFIX}:{lab}:{digest}"
+
+    @staticmethod
+    def _lab(key: str) -> str:
+        return key[len(KEY_PREFIX) + 1:].split(':', 1)[0]
+
+    def _purge_time(self, lab: str) -> float:
+        """Время последней очистки кэша лабораторной любым воркером (0 — не очищался)"""
+        if self.redis is None:
+            try:
+                return os.stat(os.path.join(self.purge_dir, lab)).st_mtime
+            except OSError:
+                return 0.0
+
+        now = time.monotonic()
+        purged_at, checked_at = self.purged_at.get(lab, (0.0, None))
+        if checked_at is not None and now - checked_at < CACHE_PURGE_CHECK_INTERVAL:
+            return purged_at
+        try:
+            purged_at = float(self.redis.get(PURGED_KEY.format(lab)) or 0.0)
+        except Exception as e:
+            logger.warning(f"Ошибка чтения времени очистки кэша из Redis: {e}")
+        self.purged_at[lab] = (purged_at, now)
+        return purged_at
+
+    def _mark_purged(self, lab: str) -> None:
+        """Сохраняет время очистки, чтобы остальные воркеры перестали отдавать свои записи"""
+        now = time.time()
+        if self.redis is not None:
+            self.redis.set(PURGED_KEY.format(lab), now)
+            self.purged_at[lab] = (now, time.monotonic())
+            return
+        os.makedirs(self.purge_dir, exist_ok=True)
+        path = os.path.join(self.purge_dir, lab)
+        with open(path, 'w') as file:
+            file.write(str(now))
+        os.utime(path, (now, now))
+
+    def _get_local(self, key: str):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.entries.move_to_end(key)
+            return entry
+
+    def _set_local(self, key: str, entry: CachedResponse) -> None:
+        with self.lock:
+            self.entries[key] = entry
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def _get_redis(self, key: str):
+        if self.redis is None:
+            return None
+        try:
+            data = self.redis.hgetall(key)
+            if not data:
+                return None
+            return CachedResponse(
+                status=int(data[b'status']),
+                headers=[tuple(h) for h in json.loads(data[b'headers'])],
+                body=data[b'body'],
+                stored_at=float(data[b'stored_at'])
+            )
+        except Exception as e:
+            logger.warning(f"Ошибка чтения кэша из Redis: {e}")
+            return None
+
+    def _set_redis(self, key: str, entry: CachedResponse) -> None:
+        if self.redis is None:
+            return
+        try:
+            pipe = self.redis.pipeline()
+            pipe.hset(key, mapping={
+                'status': entry.status,
+                'headers': json.dumps(entry.headers),
+                'body': entry.body,
+                'stored_at': entry.stored_at
+            })
+            pipe.expire(key, int(self.ttl + self.stale_ttl) + 1)
+            pipe.execute()
+        except Exception as e:
+            logger.warning(f"Ошибка записи кэша в Redis: {e}")
+
+    def get(self, key: str):
+        """
+        :return: Кортеж (entry, state), state — 'fresh', 'stale' или None
+        """
+        entry = self._get_local(key)
+        if entry is None:
+            entry = self._get_redis(key)
+            if entry is not None:
+                self._set_local(key, entry)
+        if entry is None:
+            return None, None
+        if entry.stored_at <= self._purge_time(self._lab(key)):
+            with self.lock:
+                self.entries.pop(key, None)
+            return None, None
+
+        age = entry.age()
+        if age <= self.ttl:
+            return entry, 'fresh'
+        if age <= self.ttl + self.stale_ttl:
+            return entry, 'stale'
+        return None, None
+
+    def set(self, key: str, entry: CachedResponse) -> None:
+        self._set_local(key, entry)
+        self._set_redis(key, entry)
+
+    def purge(self, lab: str) -> int:
+        """
+        Удаляет все закэшированные ответы лабораторной. Записи в памяти
+        других воркеров перестают отдаваться по метке времени очистки.
+
+        :return: Количество удаленных записей этого воркера и Redis
+        """
+        self._mark_purged(lab)
+        prefix = f"{KEY_PREFIX}:{lab}:"
+        with self.lock:
+            keys = [key for key in self.entries if key.startswith(prefix)]
+            for key in keys:
+                del self.entries[key]
+        removed = set(keys)
+
+        if self.redis is not None:
+            try:
+                redis_keys = list(self.redis.scan_iter(f"{prefix}*", count=1000))
+                if redis_keys:
+                    self.redis.delete(*redis_keys)
+                removed.update(k.decode() for k in redis_keys)
+            except Exception as e:
+                logger.warning(f"Ошибка очистки кэша в Redis: {e}")
+
+        logger.info(f"Кэш {lab} очищен: {len(removed)} записей")
+        return len(removed)
+
+    def _fetch_coalesced(self, key: str, fetch):
+        """
+        Выполняет fetch() один раз на ключ: параллельные запросы с тем же ключом
+        ждут результата первого вместо собственного обращения к upstream.
+        """
+        with self.lock:
+            flight = self.flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = _Flight()
+                self.flights[key] = flight
+
+        if not leader:
+            if not flight.done.wait(CACHE_COALESCE_TIMEOUT):
+                return fetch()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+        return self._lead(key, flight, fetch)
+
+    def _lead(self, key: str, flight, fetch):
+        """Выполняет fetch() для зарегистрированного в flights запроса и будит ожидающих"""
+        try:
+            flight.result = fetch()
+            if flight.result.status == 200:
+                self.set(key, flight.result)
+            return flight.result
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self.lock:
+                self.flights.pop(key, None)
+            flight.done.set()
+
+    def get_or_fetch(self, key: str, fetch):
+        """
+        Возвращает ответ из кэша или получает его через fetch().
+        Устаревший ответ отдается сразу, а обновление выполняется в фоне.
+
+        :param key: Ключ кэша
+        :param fetch: Функция без аргументов, возвращающая CachedResponse
+        :return: Кортеж (entry, cache_status): 'HIT', 'STALE' или 'MISS'
+        """
+        entry, state = self.get(key)
+        if state == 'fresh':
+            return entry, 'HIT'
+        if state == 'stale':
+            # Поток запускается, только если ключ еще никто не обновляет
+            with self.lock:
+                flight = None
+                if key not in self.flights:
+                    flight = self.flights[key] = _Flight()
+            if flight is not None:
+                threading.Thread(
+                    target=self._revalidate, args=(key, flight, fetch), daemon=True
+                ).start()
+            return entry, 'STALE'
+        return self._fetch_coalesced(key, fetch), 'MISS'
+
+    def _revalidate(self, key: str, flight, fetch) -> None:
+        try:
+            self._lead(key, flight, fetch)
+        except Exception as e:
+            logger.warning(f"Не удалось обновить устаревшую запись кэша: {e}")
@@ -1 +1,53 @@
+import os
+
 USER_DATA = {'username': 'vlad', 'password': 'supersecret'}
+
+# Адреса сервисов лабораторных работ
+LAB_UPSTREAMS = {
+    'lab1': os.getenv('LAB1_URL', 'http://lab1:5001'),
+    'lab2': os.getenv('LAB2_URL', 'http://lab2:5002'),
+    'lab3': os.getenv('LAB3_URL', 'http://lab3:5003'),
+}
+
+# Таймауты проксирования (секунды)
+PROXY_CONNECT_TIMEOUT = float(os.getenv('PROXY_CONNECT_TIMEOUT', '3'))
+PROXY_READ_TIMEOUT = float(os.getenv('PROXY_READ_TIMEOUT', '60'))
+# Сколько ждать свободного слота, если upstream уже перегружен
+PROXY_QUEUE_TIMEOUT = float(os.getenv('PROXY_QUEUE_TIMEOUT', '5'))
+
+# Размер keep-alive пула соединений и лимит одновременных запросов на upstream
+PROXY_POOL_SIZE = int(os.getenv('PROXY_POOL_SIZE', '32'))
+PROXY_MAX_CONCURRENCY = int(os.getenv('PROXY_MAX_CONCURRENCY', '32'))
+
+PROXY_CHUNK_SIZE = 64 * 1024
+
+# Кэш ответов отчетов
+CACHE_ENABLED = os.getenv('CACHE_ENABLED', '1') == '1'
+CACHE_MAX_ENTRIES = int(os.getenv('CACHE_MAX_ENTRIES', '1024'))
+# Время жизни свежего ответа и окно stale-while-revalidate (секунды)
+CACHE_TTL = float(os.getenv('CACHE_TTL', '30'))
+CACHE_STALE_TTL = float(os.getenv('CACHE_STALE_TTL', '300'))
+# Общий кэш для всех воркеров, например redis://redis:6379/1
+CACHE_REDIS_URL = os.getenv('CACHE_REDIS_URL')
+# Метки очистки кэша (DELETE /api/admin/cache/<lab>) для воркеров без общего Redis:
+# файл лабораторной в этом каталоге хранит время последней очистки
+CACHE_PURGE_DIR = os.getenv('CACHE_PURGE_DIR', '/tmp/gateway-cache-purge')
+# Как часто воркер перечитывает время очистки из Redis (секунды)
+CACHE_PURGE_CHECK_INTERVAL = float(os.getenv('CACHE_PURGE_CHECK_INTERVAL', '1'))
+# Сколько ждать результата совпадающего запроса, прежде чем идти в upstream самому
+CACHE_COALESCE_TIMEOUT = float(os.getenv('CACHE_COALESCE_TIMEOUT', '65'))
+
+# Балансировка между экземплярами лабораторных.
+# LAB{N}_URL может содержать несколько адресов через запятую; каждое имя хоста
+# периодически разрешается в DNS, поэтому экземпляры из `docker compose --scale`
+# подхватываются автоматически.
+DISCOVERY_INTERVAL = float(os.getenv('DISCOVERY_INTERVAL', '10'))
+HEALTH_CHECK_PATH = os.getenv('HEALTH_CHECK_PATH', '/health')
+HEALTH_CHECK_INTERVAL = float(os.getenv('HEALTH_CHECK_INTERVAL', '5'))
+HEALTH_CHECK_TIMEOUT = float(os.getenv('HEALTH_CHECK_TIMEOUT', '1'))
+# Пассивное исключение экземпляра после подряд идущих ошибок
+OUTLIER_CONSECUTIVE_ERRORS = int(os.getenv('OUTLIER_CONSECUTIVE_ERRORS', '3'))
+OUTLIER_BASE_EJECTION_TIME = float(os.getenv('OUTLIER_BASE_EJECTION_TIME', '10'))
+OUTLIER_MAX_EJECTION_TIME = float(os.getenv('OUTLIER_MAX_EJECTION_TIME', '300'))
+# Сколько раз повторять запрос на другом экземпляре, если соединение не установлено
+PROXY_RETRIES = int(os.getenv('PROXY_RETRIES', '1'))
@@ -1,12 +1,82 @@
-from flask import Flask, request, jsonify
-import os
-from flask_jwt_extended import JWTManager, create_access_token, jwt_required
-import requests
-from const import USER_DATA
+from flask import Flask, Response, request, jsonify
+from flask_jwt_extended import JWTManager, create_access_token
+from prometheus_client import Gauge
+from const import CACHE_ENABLED, LAB_UPSTREAMS, USER_DATA
+from db_utils.auth import JWT_ALGORITHM, JWT_SECRET_KEY, TokenVerifier, load_keys
+from db_utils.log_config import setup_logging
+from db_utils.metrics import CACHE_REQUESTS, init_app as init_metrics, on_refresh
+from db_utils.profiler import init_app as init_profiler
+from db_utils.tracing import current_span, init_app as init_tracing, start_span
+from cache import CachedResponse, ResponseCache
+from balancer import POOLS, reset_pools
+from proxy import UpstreamError
+
+setup_logging()
 
 app = Flask(__name__)
-app.config['JWT_SECRET_KEY'] = os.getenv('JWT_SECRET_KEY', 'super-secret-key')
+init_tracing(app, 'gateway')
+init_metrics(app, 'gateway')
+init_profiler(app, 'gateway')
+
+# Ключи загружаются один раз; flask-jwt-extended используется только для выдачи токенов
+signing_key, verifying_key = load_keys(JWT_ALGORITHM)
+app.config['JWT_ALGORITHM'] = JWT_ALGORITHM
+app.config['JWT_SECRET_KEY'] = JWT_SECRET_KEY
+if not JWT_ALGORITHM.startswith('HS'):
+    app.config['JWT_PRIVATE_KEY'] = signing_key
+    app.config['JWT_PUBLIC_KEY'] = verifying_key
 jwt = JWTManager(app)
+verifier = TokenVerifier(JWT_ALGORITHM, verifying_key)
+
+cache = ResponseCache() if CACHE_ENABLED else None
+
+UPSTREAM_OUTSTANDING = Gauge(
+    'gateway_upstream_outstanding', 'Незавершенные запросы к экземпляру лабораторной',
+    ['lab', 'replica'], multiprocess_mode='livesum')
+UPSTREAM_AVAILABLE = Gauge(
+    'gateway_upstream_available', 'Экземпляр здоров и не исключен circuit breaker',
+    ['lab', 'replica'], multiprocess_mode='livemin')
+
+
+@on_refresh
+def refresh_upstreams() -> None:
+    for name, pool in POOLS.items():
+        for replica in pool.snapshot():
+            UPSTREAM_OUTSTANDING.labels(name, replica['url']).set(replica['outstanding'])
+            UPSTREAM_AVAILABLE.labels(name, replica['url']).set(
+                int(replica['healthy'] and replica['state'] != 'open'))
+
+
+def proxy_report(lab: str):
+    """Проксирует запрос отчета в лабораторную, по возможности отвечая из кэша"""
+    path = f'/api/{lab}/report'
+    body = request.get_data()
+    # Токен передается дальше, чтобы лабораторные могли проверить его сами
+    headers = {'Authorization': request.headers['Authorization']}
+    key = cache.make_key(lab, path, body) if cache is not None else None
+    if key is None:
+        try:
+            with start_span(f"proxy {lab}", **{'upstream.lab': lab, 'cache': 'off'}):
+                return POOLS[lab].forward(path, body, headers)
+        except UpstreamError as e:
+            return e.to_response()
+
+    def fetch():
+        with start_span(f"proxy {lab}", **{'upstream.lab': lab, 'cache': 'miss'}):
+            return CachedResponse(*POOLS[lab].fetch(path, body, headers))
+
+    try:
+        entry, cache_status = cache.get_or_fetch(key, fetch)
+    except UpstreamError as e:
+        return e.to_response()
+
+    CACHE_REQUESTS.labels(lab, cache_status).inc()
+    span = current_span()
+    if span is not None:
+        span.set_attribute('gateway.cache', cache_status)
+    response = Response(entry.body, status=entry.status, headers=entry.headers)
+    response.headers['X-Cache'] = cache_status
+    return response
 
 
 @app.route('/api/token', methods=['POST'])
@@ -19,52 +89,43 @@ def get_token():
 
 
 @app.route('/api/lab1/report', methods=['POST'])
-@jwt_required()
+@verifier.required
 def proxy_lab1():
-    try:
-        base_url = 'http://lab1:5001'
-        resp = requests.post(
-            f"{base_url}/api/lab1/report",
-            json=request.get_json(force=True),
-            headers={'Content-Type': 'application/json'}
-        )
-        resp.raise_for_status()
-        return jsonify(resp.json()), resp.status_code
-    except requests.exceptions.RequestException as e:
-        return jsonify({'error': f'Ошибка проксирования в lab1: {str(e)}'}), 500
+    return proxy_report('lab1')
 
 
 @app.route('/api/lab2/report', methods=['POST'])
-@jwt_required()
+@verifier.required
 def proxy_lab2():
-    try:
-        base_url = 'http://lab2:5002'
-        resp = requests.post(
-            f"{base_url}/api/lab2/report",
-            json=request.get_json(force=True),
-            headers={'Content-Type': 'application/json'}
-        )
-        resp.raise_for_status()
-        return jsonify(resp.json()), resp.status_code
-    except requests.exceptions.RequestException as e:
-        return jsonify({'error': f'Ошибка проксирования в lab2: {str(e)}'}), 500
+    return proxy_report('lab2')
 
 
 @app.route('/api/lab3/report', methods=['POST'])
-@jwt_required()
+@verifier.required
 def proxy_lab3():
-    try:
-        base_url = 'http://lab3:5003'
-        resp = requests.post(
-            f"{base_url}/api/lab3/report",
-            json=request.get_json(force=True),
-            headers={'Content-Type': 'application/json'}
-        )
-        resp.raise_for_status()
-        return jsonify(resp.json()), resp.status_code
-    except requests.exceptions.RequestException as e:
-        return jsonify({'error': f'Ошибка проксирования в lab3: {str(e)}'}), 500
+    return proxy_report('lab3')
+
+
+@app.route('/api/admin/cache/<lab>', methods=['DELETE'])
+@verifier.required
+def purge_cache(lab):
+    if lab not in LAB_UPSTREAMS:
+        return jsonify({'error': f'Неизвестная лабораторная: {lab}'}), 404
+    if cache is None:
+        return jsonify({'lab': lab, 'purged': 0}), 200
+    return jsonify({'lab': lab, 'purged': cache.purge(lab)}), 200
+
+
+@app.route('/api/admin/upstreams', methods=['GET'])
+@verifier.required
+def upstreams_status():
+    return jsonify({name: pool.snapshot() for name, pool in POOLS.items()}), 200
+
+
+def init_worker():
+    """Вызывается gunicorn в каждом воркере после fork"""
+    reset_pools()
 
 
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=3001)
+    app.run(host='0.0.0.0', port=3001, threaded=True)
@@ -0,0 +1,191 @@
+import logging
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from flask import Response, jsonify, stream_with_context
+from db_utils.tracing import inject, start_span
+from const import (PROXY_CHUNK_SIZE, PROXY_CONNECT_TIMEOUT,
+                   PROXY_MAX_CONCURRENCY, PROXY_POOL_SIZE, PROXY_QUEUE_TIMEOUT,
+                   PROXY_READ_TIMEOUT)
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+# Заголовки, которые относятся к конкретному соединению и не проксируются
+HOP_BY_HOP_HEADERS = {
+    'connection', 'keep-alive', 'proxy-authenticate', 'proxy-authorization',
+    'te', 'trailers', 'transfer-encoding', 'upgrade'
+}
+
+
+class UpstreamError(Exception):
+    def __init__(self, status: int, message: str, retryable: bool = False):
+        """
+        :param status: HTTP-статус, который получит клиент шлюза
+        :param message: Текст ошибки
+        :param retryable: Запрос не дошел до upstream и его можно повторить на другом экземпляре
+        """
+        super().__init__(message)
+        self.status = status
+        self.message = message
+        self.retryable = retryable
+
+    def to_response(self):
+        return jsonify({'error': self.message}), self.status
+
+
+class StreamedResponse(Response):
+    """
+    Потоковый ответ upstream. Колбэки call_on_close выполняются ровно один раз:
+    после отдачи всего тела или при закрытии ответа WSGI-сервером (обрыв
+    соединения с клиентом), смотря что случится раньше.
+    """
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._release_lock = threading.Lock()
+        self._released = False
+
+    def release(self) -> None:
+        with self._release_lock:
+            if self._released:
+                return
+            self._released = True
+        for func in self._on_close:
+            func()
+
+    def close(self) -> None:
+        if hasattr(self.response, 'close'):
+            self.response.close()
+        self.release()
+
+
+class UpstreamClient:
+    def __init__(self, name: str, base_url: str,
+                 pool_size: int = PROXY_POOL_SIZE,
+                 max_concurrency: int = PROXY_MAX_CONCURRENCY):
+        """Клиент одного upstream с keep-alive пулом и лимитом параллельных запросов"""
+        self.name = name
+        self.base_url = base_url.rstrip('/')
+        self.timeout = (PROXY_CONNECT_TIMEOUT, PROXY_READ_TIMEOUT)
+        self.slots = threading.BoundedSemaphore(max_concurrency)
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=1,
+            pool_maxsize=pool_size,
+            pool_block=True,
+            max_retries=0
+        )
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def _send(self, path: str, body: bytes, headers: dict = None) -> requests.Response:
+        """
+        Занимает слот параллелизма и отправляет запрос, не читая тело ответа.
+        При успехе слот остается занятым: вызывающий обязан вызвать _release().
+        """
+        if not self.slots.acquire(timeout=PROXY_QUEUE_TIMEOUT):
+            logger.warning(f"{self.name}: превышен лимит одновременных запросов")
+            raise UpstreamError(
+                503, f'Сервис {self.name} перегружен, повторите запрос позже')
+
+        request_headers = {'Content-Type': 'application/json'}
+        if headers:
+            request_headers.update(headers)
+
+        # Спан попытки заканчивается с получением заголовков ответа
+        with start_span(f"POST {path}", kind='client', **{
+                'upstream.name': self.name, 'http.url': f"{self.base_url}{path}"}) as span:
+            inject(request_headers)
+            try:
+                upstream = self.session.post(
+                    f"{self.base_url}{path}",
+                    data=body,
+                    headers=request_headers,
+                    timeout=self.timeout,
+                    stream=True
+                )
+            except requests.exceptions.RequestException as e:
+                self.slots.release()
+                logger.error(f"Ошибка проксирования в {self.name}: {e}")
+                raise UpstreamError(
+                    500, f'Ошибка проксирования в {self.name}: {str(e)}',
+                    retryable=isinstance(e, requests.exceptions.ConnectionError))
+            if span is not None:
+                span.set_attribute('http.status_code', upstream.status_code)
+            return upstream
+
+    def _release(self, upstream: requests.Response) -> None:
+        upstream.close()
+        self.slots.release()
+
+    @staticmethod
+    def _passthrough_headers(upstream: requests.Response) -> list:
+        return [
+            (key, value) for key, value in upstream.headers.items()
+            if key.lower() not in HOP_BY_HOP_HEADERS
+        ]
+
+    def forward(self, path: str, body: bytes, headers: dict = None):
+        """
+        Проксирует POST-запрос в upstream и отдает ответ потоком, байт в байт.
+        Слот параллелизма и соединение освобождаются после отправки тела клиенту.
+
+        :param path: Путь на стороне upstream
+        :param body: Сырое тело входящего запроса
+        :param headers: Дополнительные заголовки запроса
+        :return: Flask Response
+        :raises UpstreamError: если upstream недоступен или перегружен
+        """
+        upstream = self._send(path, body, headers)
+
+        def generate():
+            try:
+                yield from upstream.raw.stream(PROXY_CHUNK_SIZE, decode_content=False)
+            finally:
+                # Не полагаемся только на close() от WSGI-сервера
+                response.release()
+
+        response = StreamedResponse(
+            stream_with_context(generate()),
+            status=upstream.status_code,
+            headers=self._passthrough_headers(upstream)
+        )
+        response.call_on_close(lambda: self._release(upstream))
+        return response
+
+    def check_health(self, path: str, timeout: float) -> bool:
+        """
+        Активная проверка экземпляра: GET path должен вернуть 2xx.
+        Идет мимо пула, чтобы не ждать соединения за занятыми отчетами.
+        """
+        try:
+            response = requests.get(f"{self.base_url}{path}", timeout=timeout)
+            response.close()
+            return response.ok
+        except requests.exceptions.RequestException:
+            return False
+
+    def fetch(self, path: str, body: bytes, headers: dict = None) -> tuple:
+        """
+        Выполняет POST-запрос в upstream и полностью читает тело ответа (без декодирования).
+
+        :return: Кортеж (status, headers, body)
+        :raises UpstreamError: если upstream недоступен или перегружен
+        """
+        upstream = self._send(path, body, headers)
+        try:
+            content = upstream.raw.read(decode_content=False)
+            return upstream.status_code, self._passthrough_headers(upstream), content
+        except Exception as e:
+            logger.error(f"Ошибка чтения ответа {self.name}: {e}")
+            raise UpstreamError(
+                500, f'Ошибка проксирования в {self.name}: {str(e)}')
+        finally:
+            self._release(upstream)
+
+    def close(self):
+        self.session.close()
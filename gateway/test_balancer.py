@@ -0,0 +1,46 @@
+import os
+import time
+import pytest
+from balancer import UpstreamPool
+from proxy import UpstreamError
+
+
+@pytest.fixture
+def pool():
+    pool = UpstreamPool('lab1', ['http://127.0.0.1:1'])
+    # Без фоновых проверок: состояние меняют только вызовы теста
+    pool.monitor_pid = os.getpid()
+    yield pool
+    pool.close()
+
+
+def test_own_concurrency_limit_does_not_change_breaker(pool):
+    """503 от лимита шлюза не закрывает полуоткрытый breaker и не сбрасывает счетчики"""
+    replica, = pool.replicas.values()
+    replica.ejections = 2
+    replica.consecutive_errors = 1
+
+    def overloaded(path, body, headers):
+        raise UpstreamError(503, 'перегружен')
+
+    replica.client.fetch = overloaded
+    with pytest.raises(UpstreamError):
+        pool.fetch('/api/lab1/report', b'{}')
+
+    assert replica.outstanding == 0
+    assert replica.probing is False
+    assert replica.ejections == 2
+    assert replica.consecutive_errors == 1
+    assert replica.state(time.time()) == 'half_open'
+
+
+def test_replicas_missing_from_dns_are_closed(pool, monkeypatch):
+    replica, = pool.replicas.values()
+    closed = []
+    monkeypatch.setattr(replica.client, 'close', lambda: closed.append(replica.base_url))
+    monkeypatch.setattr(UpstreamPool, '_resolve', staticmethod(lambda url: ['http://127.0.0.1:2']))
+
+    pool.refresh_replicas()
+
+    assert closed == ['http://127.0.0.1:1']
+    assert list(pool.replicas) == ['http://127.0.0.1:2']
@@ -0,0 +1,113 @@
+import threading
+import time
+import cache as cache_module
+from cache import CachedResponse, ResponseCache
+
+
+def test_key_ignores_json_formatting():
+    """Одинаковые по смыслу тела дают один ключ кэша"""
+    key1 = ResponseCache.make_key('lab2', '/api/lab2/report', b'{"year": 2023, "semester": 1}')
+    key2 = ResponseCache.make_key('lab2', '/api/lab2/report', b'{"semester":1,"year":2023}')
+    key3 = ResponseCache.make_key('lab2', '/api/lab2/report', b'{"semester":2,"year":2023}')
+
+    assert key1 == key2
+    assert key1 != key3
+    assert ResponseCache.make_key('lab2', '/api/lab2/report', b'not json') is None
+
+
+def test_concurrent_requests_are_coalesced():
+    """Параллельные одинаковые запросы приводят к одному обращению к upstream"""
+    cache = ResponseCache(max_entries=10, ttl=60, stale_ttl=0)
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        time.sleep(0.2)
+        return CachedResponse(200, [('Content-Type', 'application/json')], b'{}')
+
+    results = []
+    key = cache.make_key('lab1', '/api/lab1/report', b'{"material": "x"}')
+    threads = [
+        threading.Thread(target=lambda: results.append(cache.get_or_fetch(key, fetch)))
+        for _ in range(10)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1
+    assert all(entry.body == b'{}' for entry, _ in results)
+    assert cache.get_or_fetch(key, fetch)[1] == 'HIT'
+
+
+def test_stale_entry_is_revalidated_once(monkeypatch):
+    """Пока устаревшая запись обновляется, новые запросы не запускают еще один поток"""
+    threads = []
+
+    class CountingThread(threading.Thread):
+        def start(self):
+            threads.append(self)
+            super().start()
+
+    monkeypatch.setattr(cache_module.threading, 'Thread', CountingThread)
+    cache = ResponseCache(max_entries=10, ttl=0.05, stale_ttl=60)
+    key = cache.make_key('lab1', '/api/lab1/report', b'{"material": "x"}')
+    cache.get_or_fetch(key, lambda: CachedResponse(200, [], b'old'))
+    time.sleep(0.1)
+
+    calls = []
+    release = threading.Event()
+
+    def fetch():
+        calls.append(1)
+        release.wait(5)
+        return CachedResponse(200, [], b'new')
+
+    for _ in range(20):
+        entry, status = cache.get_or_fetch(key, fetch)
+        assert (entry.body, status) == (b'old', 'STALE')
+    release.set()
+
+    deadline = time.monotonic() + 5
+    while cache.get(key)[1] != 'fresh' and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert len(calls) == 1
+    assert len(threads) == 1
+    assert cache.get_or_fetch(key, fetch)[0].body == b'new'
+
+
+def test_errors_are_not_cached_and_purge_by_lab(tmp_path):
+    cache = ResponseCache(max_entries=10, ttl=60, stale_ttl=0, purge_dir=str(tmp_path))
+    key1 = cache.make_key('lab1', '/api/lab1/report', b'{"a": 1}')
+    key3 = cache.make_key('lab3', '/api/lab3/report', b'{"a": 1}')
+
+    cache.get_or_fetch(key1, lambda: CachedResponse(500, [], b'error'))
+    assert cache.get(key1) == (None, None)
+
+    cache.get_or_fetch(key1, lambda: CachedResponse(200, [], b'ok'))
+    cache.get_or_fetch(key3, lambda: CachedResponse(200, [], b'ok'))
+
+    assert cache.purge('lab1') == 1
+    assert cache.get(key1) == (None, None)
+    assert cache.get(key3)[1] == 'fresh'
+
+
+def test_purge_is_visible_to_other_workers(tmp_path):
+    """Очистка в одном воркере скрывает записи, сохраненные в памяти другого"""
+    worker1 = ResponseCache(max_entries=10, ttl=60, stale_ttl=0, purge_dir=str(tmp_path))
+    worker2 = ResponseCache(max_entries=10, ttl=60, stale_ttl=0, purge_dir=str(tmp_path))
+    key1 = worker1.make_key('lab1', '/api/lab1/report', b'{"a": 1}')
+    key3 = worker1.make_key('lab3', '/api/lab3/report', b'{"a": 1}')
+    for worker in (worker1, worker2):
+        worker.set(key1, CachedResponse(200, [], b'old'))
+        worker.set(key3, CachedResponse(200, [], b'ok'))
+
+    time.sleep(0.01)
+    assert worker1.purge('lab1') == 1
+    assert worker2.get(key1) == (None, None)
+    assert worker2.get(key3)[1] == 'fresh'
+
+    time.sleep(0.01)
+    worker2.set(key1, CachedResponse(200, [], b'new'))
+    assert worker2.get(key1)[0].body == b'new'
@@ -0,0 +1,50 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+from flask import Flask
+from const import PROXY_MAX_CONCURRENCY
+from proxy import UpstreamClient
+
+
+class ReportHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        body = b'{"report": {}}'
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def upstream_url():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), ReportHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+def test_forward_releases_slots(upstream_url):
+    """Слот и соединение освобождаются после отдачи тела, даже без close() от сервера"""
+    upstream = UpstreamClient('lab1', upstream_url)
+    app = Flask(__name__)
+
+    @app.route('/report', methods=['POST'])
+    def report():
+        return upstream.forward('/api/lab1/report', b'{}')
+
+    with app.test_client() as client:
+        for _ in range(PROXY_MAX_CONCURRENCY + 5):
+            response = client.post('/report', data=b'{}')
+            assert response.status_code == 200
+            assert response.get_data() == b'{"report": {}}'
+
+    # Все слоты свободны: можно занять их снова без ожидания
+    for _ in range(PROXY_MAX_CONCURRENCY):
+        assert upstream.slots.acquire(blocking=False)
+    upstream.close()
@@ -0,0 +1,63 @@
+"""
+Общая конфигурация gunicorn для gateway и сервисов лабораторных работ.
+
+Все параметры переопределяются переменными окружения, поэтому один файл
+используется во всех Dockerfile. Плавная перезагрузка воркеров без потери
+запросов: ``kill -HUP <pid мастера>`` (или ``docker compose kill -s HUP <сервис>``).
+"""
+import importlib
+import multiprocessing
+import os
+import shutil
+
+wsgi_app = os.getenv('GUNICORN_APP', 'app:app')
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+
+# gthread: несколько процессов, в каждом пул потоков, что подходит
+# для отчетов, которые в основном ждут ответа баз данных
+worker_class = 'gthread'
+workers = int(os.getenv('GUNICORN_WORKERS', multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.getenv('GUNICORN_THREADS', '4'))
+
+# Приложение импортируется один раз в мастере, воркеры получают его через fork
+preload_app = os.getenv('GUNICORN_PRELOAD', '1') == '1'
+# Автоперезапуск при изменении кода, только для разработки
+reload = os.getenv('GUNICORN_RELOAD', '0') == '1'
+
+timeout = int(os.getenv('GUNICORN_TIMEOUT', '120'))
+graceful_timeout = int(os.getenv('GUNICORN_GRACEFUL_TIMEOUT', '30'))
+keepalive = int(os.getenv('GUNICORN_KEEPALIVE', '5'))
+
+# Периодический перезапуск воркеров против утечек памяти
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', '10000'))
+max_requests_jitter = int(os.getenv('GUNICORN_MAX_REQUESTS_JITTER', '1000'))
+
+accesslog = '-'
+errorlog = '-'
+loglevel = os.getenv('GUNICORN_LOG_LEVEL', 'info')
+
+# Метрики Prometheus всех воркеров собираются через файлы в этом каталоге.
+# Его очищают до загрузки приложения, чтобы не сложить значения прошлого запуска.
+prometheus_dir = os.getenv('PROMETHEUS_MULTIPROC_DIR')
+if prometheus_dir:
+    shutil.rmtree(prometheus_dir, ignore_errors=True)
+    os.makedirs(prometheus_dir, exist_ok=True)
+
+
+def post_fork(server, worker):
+    """
+    Вызывает init_worker() модуля приложения в каждом воркере после fork,
+    чтобы пулы соединений создавались в воркере, а не наследовались от мастера.
+    """
+    module = importlib.import_module(wsgi_app.split(':')[0])
+    init_worker = getattr(module, 'init_worker', None)
+    if init_worker is not None:
+        init_worker()
+        server.log.info(f"Воркер {worker.pid} инициализирован")
+
+
+def child_exit(server, worker):
+    """Убирает датчики завершившегося воркера из метрик Prometheus"""
+    if prometheus_dir:
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(worker.pid)
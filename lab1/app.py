@@ -1,13 +1,43 @@
+import logging
+import os
 from flask import Flask, request, jsonify
+from db_utils.auth import protect_app
+from db_utils.instrumentation import init_app as init_instrumentation
+from db_utils.log_config import log_payload, setup_logging
+from db_utils.metrics import init_app as init_metrics
+from db_utils.profiler import init_app as init_profiler
+from db_utils.query_stats import init_app as init_query_stats
+from db_utils.router import init_app as init_router, route
+from db_utils.tracing import init_app as init_tracing
+from db_utils.worker_hooks import run_post_fork_hooks
 from db_utils.elastic.elastic_tool import ElasticTool
-from db_utils.neo4j.neo4j_tool import Neo4jTool
 from db_utils.postgres.postgres_tool import PostgresTool
-from db_utils.redis.redis_tool import RedisTool
+from db_utils.redis.term_index import TermIndex
 from utils import has_all_required_fields
 
+setup_logging()
+logger = logging.getLogger(__name__)
+
 app = Flask(__name__)
+init_instrumentation(app)
+init_tracing(app, 'lab1')
+init_metrics(app, 'lab1', sync_stats=True)
+init_query_stats(app)
+init_profiler(app, 'lab1')
+init_router(app)
+protect_app(app)
 
 BASE_URL = '/api/lab1/report'
+LECTURE_TYPE = 'лекция'
+# polyglot — расписания из Neo4j, студенты из Redis, посещаемость из Postgres;
+# pg — все шаги после поиска материалов одним запросом в Postgres
+REPORT_MODES = ('polyglot', 'pg')
+REPORT_MODE = os.getenv('LAB1_REPORT_MODE', 'polyglot')
+
+
+@app.route('/health', methods=['GET'])
+def health():
+    return jsonify({'status': 'ok'}), 200
 
 
 @app.route(BASE_URL, methods=['POST'])
@@ -23,32 +53,53 @@ def get_report_by_date_and_term():
             'received': list(data.keys())
         }), 400
 
+    # Режим выбирается полем mode запроса, по умолчанию LAB1_REPORT_MODE
+    mode = data.get('mode', REPORT_MODE)
+    if mode not in REPORT_MODES:
+        return jsonify({'error': f"Недопустимый режим: {mode}, допустимые: {list(REPORT_MODES)}"}), 400
+
     response_body = {
         'search_term': data['material'],
         'period': f"{data['start_date']} - {data['end_date']}",
         'worst_attendees': []
     }
 
-    # Elastic ищем все материалы с заданным термином
-    elastic_tool = ElasticTool(host='localhost')
-    materials = elastic_tool.search_materials_by_content(data['material'])
+    # Лекции по термину: сначала индекс терминов и кэш в Redis, затем поиск в Elastic
+    # по основе и началу слова и только без результата — нечеткий поиск.
+    # Тип занятия фильтруется в Elastic, поэтому в Neo4j уходят только лекции
+    elastic_tool = ElasticTool()
+    term_index = TermIndex()
+    class_ids, source = term_index.lookup(data['material'], elastic_tool.analyze_query, LECTURE_TYPE)
+    if class_ids is None:
+        class_ids = elastic_tool.search_class_ids_by_content(
+            data['material'], fuzzy=False, class_type=LECTURE_TYPE)
+        source = 'elastic_prefix'
+        if not class_ids:
+            class_ids = elastic_tool.search_class_ids_by_content(data['material'], class_type=LECTURE_TYPE)
+            source = 'elastic_fuzzy'
+        term_index.remember(data['material'], LECTURE_TYPE, class_ids)
+    logger.debug(f"Занятия по запросу '{data['material']}' получены из {source}")
 
     # Если материалов нет
-    if not materials:
-        print('Нет материалов')
+    if not class_ids:
+        logger.debug('Нет материалов')
+        return jsonify(report=response_body), 200
+    log_payload(logger, 'Занятия с материалами по запросу', class_ids)
+
+    if mode == 'pg':
+        # Расписания, студенты групп и худшая посещаемость одним запросом
+        postgres_tool = PostgresTool()
+        response_body['worst_attendees'] = postgres_tool.get_lecture_attendance_report(
+            class_ids=class_ids,
+            start_date=data['start_date'],
+            end_date=data['end_date']
+        )
+        log_payload(logger, 'Студенты с низкой посещаемостью', response_body['worst_attendees'])
         return jsonify(report=response_body), 200
 
-    class_ids = []
-    for material in materials:
-        class_ids.append(material['class_id'])
-        print(f"Material ID: {material['material_id']}")
-        print(f"Class ID: {material['class_id']}")
-        print(f"Content snippet: {material['content'][:100]}...")
-        print("-" * 50)
-
-    # Neo4j ищем все расписания по промежутку и массиву class_ids из материалов
-    neo4j_tool = Neo4jTool(host='bolt://localhost:7687')
-    schedules = neo4j_tool.find_lecture_schedules(
+    # Все расписания по промежутку и массиву class_ids из материалов (Neo4j или Postgres)
+    schedules = route(
+        'schedules',
         class_ids=class_ids,
         start_date=data['start_date'],
         end_date=data['end_date']
@@ -56,34 +107,25 @@ def get_report_by_date_and_term():
 
     # Если расписаний нет
     if not schedules:
-        print('Нет расписаний')
+        logger.debug('Нет расписаний')
         return jsonify(report=response_body), 200
 
     schedule_ids = []
     group_ids = set()
 
     for schedule in schedules:
-        print(schedules)
         schedule_ids.append(schedule['id'])
         if schedule['group_id'] not in group_ids:
             group_ids.add(schedule['group_id'])
+    log_payload(logger, 'Найдены расписания', schedules)
 
-        print(f"Лекция {schedule['class_id']} в аудитории {schedule['room']}")
-        print(f"Группа {schedule['group_id']} в аудитории {schedule['room']}")
-        print(f"Дата: {schedule['scheduled_date']}")
-        print(f"Время: {schedule['start_time']} - {schedule['end_time']}")
-        print("-" * 50)
-
-    # Redis ищем всех студентов по группе
-    redis_tool = RedisTool(host='localhost')
-
+    # Всех студентов по группе (Redis или Postgres)
     students_ids = set()
     full_student_info = {}
 
     for group_id in group_ids:
         # Нет лишних запросов потому что group_id уникальны
-        group_students = redis_tool.get_students_info_by_group_id(
-            group_id=group_id)
+        group_students = route('students', group_id=group_id)
 
         for student_info in group_students:
             student_id = student_info['id']
@@ -96,18 +138,18 @@ def get_report_by_date_and_term():
             students_ids.add(student_id)
 
     if not students_ids:
-        print('Нет студентов')
+        logger.debug('Нет студентов')
         return jsonify(report=response_body), 200
 
     # Postgres ищем топ 10 студентов
-    postgres_tool = PostgresTool(host='localhost', port='5430')
+    postgres_tool = PostgresTool()
 
     students = postgres_tool.get_students_with_lowest_attendance(
         schedule_ids=schedule_ids, students_ids=list(students_ids))
 
     # Если нет худших студентов
     if not students:
-        print('Нет худших студентов')
+        logger.debug('Нет худших студентов')
         return jsonify(report=response_body), 200
 
     # Формируем информацию для вывода
@@ -125,10 +167,15 @@ def get_report_by_date_and_term():
                 'attendance_percent': student['attendance_percent']
             }
             response_body['worst_attendees'].append(student_info)
-        print(student)
+    log_payload(logger, 'Студенты с низкой посещаемостью', students)
 
     return jsonify(report=response_body), 200
 
 
+def init_worker():
+    """Вызывается gunicorn в каждом воркере после fork"""
+    run_post_fork_hooks()
+
+
 if __name__ == '__main__':
     app.run(host='0.0.0.0', port=5001)
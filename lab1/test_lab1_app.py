@@ -168,3 +168,71 @@ def test_generate_attendance_report_empty_material(client):
 
     # В зависимости от логики приложения, может возвращать ошибку или пустой отчет
     assert response.status_code in [200]
+
+
+def test_generate_attendance_report_invalid_mode(client):
+    """Test the endpoint with unknown execution mode."""
+    request_data = {
+        "material": "кинемати",
+        "start_date": "2023-09-01",
+        "end_date": "2023-12-16",
+        "mode": "mysql"
+    }
+
+    response = client.post(
+        BASE_URL,
+        data=json.dumps(request_data),
+        content_type='application/json'
+    )
+
+    assert response.status_code == 400
+    assert "Недопустимый режим" in response.get_json()["error"]
+
+
+@pytest.mark.parametrize('material', ['кинемати', 'конспект'])
+def test_pg_mode_matches_polyglot(client, material):
+    """Отчет одним запросом Postgres совпадает с отчетом через Neo4j, Redis и Postgres"""
+    reports = {}
+    for mode in ('polyglot', 'pg'):
+        request_data = {
+            "material": material,
+            "start_date": "2023-09-01",
+            "end_date": "2023-12-16",
+            "mode": mode
+        }
+        response = client.post(
+            BASE_URL,
+            data=json.dumps(request_data),
+            content_type='application/json'
+        )
+        assert response.status_code == 200
+        reports[mode] = response.get_json()["report"]["worst_attendees"]
+
+    assert reports['polyglot']
+    assert reports['pg'] == reports['polyglot']
+
+
+def test_pg_mode_counts_lectures_of_all_groups(client):
+    """total_lectures — все лекции по запросу во всех группах, равные пропуски упорядочены по id"""
+    request_data = {
+        "material": "конспект",
+        "start_date": "2023-09-01",
+        "end_date": "2023-12-16",
+        "mode": "pg"
+    }
+    response = client.post(
+        BASE_URL,
+        data=json.dumps(request_data),
+        content_type='application/json'
+    )
+
+    assert response.status_code == 200
+    worst_attendees = response.get_json()["report"]["worst_attendees"]
+    # Лекции по конспектам: 3 у группы 1 и 3 у группы 2
+    assert [(student["student_id"], student["missed_lectures"], student["total_lectures"])
+            for student in worst_attendees] == [
+        (1, 6, 6), (2, 6, 6), (3, 6, 6), (7, 6, 6),
+        (8, 5, 6), (9, 5, 6),
+        (4, 4, 6), (10, 4, 6), (11, 4, 6), (12, 4, 6),
+    ]
+    assert worst_attendees[4]["attendance_percent"] == 16.67
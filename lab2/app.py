@@ -1,22 +1,38 @@
 from flask import Flask, request, jsonify
+from db_utils.auth import protect_app
+from db_utils.instrumentation import init_app as init_instrumentation
+from db_utils.log_config import setup_logging
+from db_utils.metrics import init_app as init_metrics
+from db_utils.profiler import init_app as init_profiler
+from db_utils.query_stats import init_app as init_query_stats
+from db_utils.tracing import init_app as init_tracing
+from db_utils.worker_hooks import run_post_fork_hooks
 from db_utils.neo4j.neo4j_tool import Neo4jTool
 from db_utils.redis.redis_tool import RedisTool
 from utils import has_all_required_fields, get_date_range
 import logging
 
 
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s'
-)
+setup_logging()
 logger = logging.getLogger(__name__)
 
 app = Flask(__name__)
+init_instrumentation(app)
+init_tracing(app, 'lab2')
+init_metrics(app, 'lab2', sync_stats=True)
+init_query_stats(app)
+init_profiler(app, 'lab2')
+protect_app(app)
 
 
 BASE_URL = '/api/lab2/report'
 
 
+@app.route('/health', methods=['GET'])
+def health():
+    return jsonify({'status': 'ok'}), 200
+
+
 @app.route(BASE_URL, methods=['POST'])
 def get_classroom_requirements():
     """
@@ -46,7 +62,7 @@ def get_classroom_requirements():
         logger.info(
             f"Processing report for semester {data['semester']}, year {data['year']}, {start_date}, {end_date}")
 
-        neo4j_tool = Neo4jTool(host='bolt://localhost:7687')
+        neo4j_tool = Neo4jTool()
         lectures = neo4j_tool.find_students_and_lectures(
             start_date=start_date,
             end_date=end_date
@@ -61,7 +77,7 @@ def get_classroom_requirements():
             student_count = 0
 
             for group_id in item['group_ids']:
-                redis_tool = RedisTool(host='localhost')
+                redis_tool = RedisTool()
                 students = redis_tool.get_student_count_by_group_id(
                     group_id=group_id
                 )
@@ -96,5 +112,10 @@ def get_classroom_requirements():
         return jsonify({'error': f'Ошибка обработки запроса: {str(e)}'}), 500
 
 
+def init_worker():
+    """Вызывается gunicorn в каждом воркере после fork"""
+    run_post_fork_hooks()
+
+
 if __name__ == '__main__':
     app.run(host='0.0.0.0', port=5002)
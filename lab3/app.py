@@ -1,26 +1,42 @@
 from flask import Flask, request, jsonify
-from db_utils.mongo.mongo_tool import MongoTool
+from db_utils.auth import protect_app
+from db_utils.instrumentation import init_app as init_instrumentation
+from db_utils.log_config import log_payload, setup_logging
+from db_utils.metrics import init_app as init_metrics
+from db_utils.profiler import init_app as init_profiler
+from db_utils.query_stats import init_app as init_query_stats
+from db_utils.router import init_app as init_router, route
+from db_utils.tracing import init_app as init_tracing
+from db_utils.worker_hooks import run_post_fork_hooks
 from db_utils.neo4j.neo4j_tool import Neo4jTool
 from db_utils.postgres.postgres_tool import PostgresTool
-from db_utils.redis.redis_tool import RedisTool
 from utils import has_all_required_fields, get_date_range
 
 import logging
 
 # Настройка логирования
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s'
-)
+setup_logging()
 logger = logging.getLogger(__name__)
 
 app = Flask(__name__)
+init_instrumentation(app)
+init_tracing(app, 'lab3')
+init_metrics(app, 'lab3', sync_stats=True)
+init_query_stats(app)
+init_profiler(app, 'lab3')
+init_router(app)
+protect_app(app)
 
 BASE_URL = '/api/lab3/report'
 
 # МЕХ-101
 
 
+@app.route('/health', methods=['GET'])
+def health():
+    return jsonify({'status': 'ok'}), 200
+
+
 @app.route(BASE_URL, methods=['POST'])
 def get_classroom_requirements():
     """
@@ -46,7 +62,7 @@ def get_classroom_requirements():
     try:
         # Получаем id группы по названию
         group_name = data['group_name']
-        postgres_tool = PostgresTool(host='localhost')
+        postgres_tool = PostgresTool()
         group_info = postgres_tool.get_student_group_by_name(
             group_name=group_name)
 
@@ -54,29 +70,28 @@ def get_classroom_requirements():
             raise Exception(f'Группа с названием {group_name} не найдена')
         response_body['group_info'] = group_info
 
-        # Получаем название кафедры по group_department_id
-        print(group_info, group_info['department_id'])
-        mongo_tool = MongoTool(host='localhost')
-        department_name = mongo_tool.get_department_name_by_id(
+        # Получаем название кафедры по group_department_id (MongoDB или Postgres)
+        department_name = route(
+            'department',
             department_id=int(group_info['department_id'])
         )
         if department_name is None:
             raise Exception(f'Не найдена кафедра для группы')
 
-        # Получаем всех студентов, а также информацию про них
-        redis_tool = RedisTool(host='localhost')
-        students = redis_tool.get_students_info_by_group_id(
+        # Получаем всех студентов, а также информацию про них (Redis или Postgres)
+        students = route(
+            'students',
             group_id=group_info['id']
         )
         if not students:
             return jsonify(report=response_body), 200
 
         # Ищем все расписания по лекциям со специальным тегом на текущую дату для нашей группы и возвращаем курс лекций, все расписания
-        neo4j_tool = Neo4jTool(host='bolt://localhost:7687')
+        neo4j_tool = Neo4jTool()
         schedules = neo4j_tool.find_special_lectures_and_course_of_lectures(
             group_id=group_info['id'], special_tag=department_name)
 
-        print('schedules', schedules)
+        log_payload(logger, 'Расписания спецлекций', schedules)
 
         # Находим все посещения студентом лекций на текущий момент
         for student in students:
@@ -96,7 +111,7 @@ def get_classroom_requirements():
                     student['id'], schedule['schedule_ids']),
 
                 if not attendance_info:
-                    print(f'нет attendance_info для студента {student['id']}')
+                    logger.warning(f"Нет attendance_info для студента {student['id']}")
                     return
 
                 planned_hours = len(schedule['schedule_ids']) * 2
@@ -111,7 +126,6 @@ def get_classroom_requirements():
                     'planned_hours': planned_hours,
                     'listened_hours': listened_hours
                 })
-                print(attendance_info)
 
             response_body['students'].append(student_info)
         return jsonify(report=response_body), 200
@@ -121,5 +135,10 @@ def get_classroom_requirements():
         return jsonify({'error': f'Ошибка обработки запроса: {str(e)}'}), 500
 
 
+def init_worker():
+    """Вызывается gunicorn в каждом воркере после fork"""
+    run_post_fork_hooks()
+
+
 if __name__ == '__main__':
     app.run(host='0.0.0.0', port=5003)
@@ -1,34 +1,150 @@
-from time import sleep
+import argparse
+import json
+import resource
+import sys
+import time
+from collections import Counter
+from contextlib import nullcontext
+from datetime import datetime, timezone
+from typing import Optional
+from db_utils.connections import create_postgres
+from db_utils.instrumentation import count_round_trips
 from db_utils.postgres.drop_postgres_tables import drop_tables
 from db_utils.postgres.create_postgres_tables import create_tables
 from db_utils.postgres.generate_postgres_data import insert_data
+from db_utils.postgres.generate_synthetic_data import PRESETS, SyntheticDataGenerator
 from db_utils.postgres.check_postgres_tables import check_tables
-from db_utils.elastic.sync_elastic_tables import ElasticLectureSessionSynchronizer
-from db_utils.mongo.sync_mongo_tables import MongoSynchronizer
-from db_utils.redis.sync_redis_tables import RedisStudentSynchronizer
-from db_utils.neo4j.sync_neo4j_tables import Neo4jSynchronizer
+from db_utils.sync_orchestrator import (READINESS_CHECKS, READY_TIMEOUT, print_summary,
+                                       run_all, wait_until_ready)
 
-if __name__ == "__main__":
+
+def peak_rss_mb() -> float:
+    """Пиковый RSS процесса с момента запуска (ru_maxrss в Linux — в КБ)"""
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+
+def load_postgres(dataset: str) -> dict:
+    """Заполняет Postgres тестовыми данными или синтетическим набором"""
+    if dataset == 'fixtures':
+        insert_data()
+        return {}
+
+    conn = create_postgres()
+    try:
+        return SyntheticDataGenerator(**PRESETS[dataset]).load(conn)
+    finally:
+        conn.close()
+
+
+def wait_for_databases(timeout: float) -> None:
+    """Ждет готовности всех баз вместо фиксированных пауз; без Postgres продолжать нельзя"""
+    not_ready = wait_until_ready(READINESS_CHECKS, timeout)
+    if 'postgres' in not_ready:
+        sys.exit(1)
+
+
+def run_benchmark(dataset: str, output: Optional[str], sync_workers: Optional[int]) -> dict:
+    """
+    Полная перезагрузка данных с замером каждой фазы: время, строк в секунду
+    для синхронизаторов, пиковый RSS и число обращений к каждой БД.
+    Синхронизаторы выполняются параллельно, их показатели собираются
+    в процессах пула и записываются отдельными фазами sync_<имя>.
+    """
+    phases = []
+
+    def phase(name: str, func, *args, count_trips: bool = True):
+        # Процессы пула синхронизаторов наследуют при fork уже подмененные методы драйверов
+        # и считают обращения сами, поэтому фаза sync не оборачивается в count_round_trips
+        with count_round_trips() if count_trips else nullcontext(Counter()) as round_trips:
+            started = time.perf_counter()
+            result = func(*args)
+            elapsed = time.perf_counter() - started
+        record = {
+            'phase': name,
+            'seconds': round(elapsed, 3),
+            'peak_rss_mb': peak_rss_mb(),
+            'round_trips': dict(round_trips),
+        }
+        phases.append(record)
+        return record, result
+
+    total_started = time.perf_counter()
+    phase('drop', drop_tables)
+    phase('create', create_tables)
+    record, counts = phase('insert', load_postgres, dataset)
+    if counts:
+        record['rows'] = sum(counts.values())
+        record['rows_per_second'] = round(record['rows'] / record['seconds'], 1) if record['seconds'] else None
+    phase('check', check_tables)
+
+    record, results = phase('sync', run_all, None, sync_workers, count_trips=False)
+    record['round_trips'] = dict(sum((Counter(result.get('round_trips', {})) for result in results),
+                                     Counter()))
+    record['success'] = success = all(result['success'] for result in results)
+    for result in results:
+        phases.append({
+            'phase': f"sync_{result['name']}",
+            'seconds': result.get('seconds', 0.0),
+            'peak_rss_mb': result.get('peak_rss_mb'),
+            'round_trips': result.get('round_trips', {}),
+            'success': result['success'],
+            'rows': result['rows'],
+            'rows_per_second': result.get('rows_per_second'),
+            'error': result['error'],
+        })
+
+    summary = {
+        'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'dataset': dataset,
+        'dataset_params': PRESETS.get(dataset),
+        'total_seconds': round(time.perf_counter() - total_started, 3),
+        'peak_rss_mb': peak_rss_mb(),
+        'success': success,
+        'phases': phases,
+    }
+
+    print("\n" + "=" * 50)
+    for record in phases:
+        rate = f", {record['rows_per_second']} строк/с" if record.get('rows_per_second') else ''
+        print(f"{record['phase']:<14} {record['seconds']:>9.3f} с{rate}, "
+              f"RSS {record['peak_rss_mb']} МБ, обращений {sum(record['round_trips'].values())}")
+    print(f"Итого: {summary['total_seconds']} с")
+    print("=" * 50 + "\n")
+
+    if output:
+        with open(output, 'a', encoding='utf-8') as file:
+            file.write(json.dumps(summary, ensure_ascii=False) + '\n')
+    return summary
+
+
+def setup_project(dataset: str, sync_workers: Optional[int]) -> bool:
     drop_tables()
-    sleep(1)
     create_tables()
-    sleep(2)
-    insert_data()
-    sleep(2)
+    load_postgres(dataset)
     check_tables()
 
-    mongo_sync = MongoSynchronizer()
-    if not mongo_sync.run_sync():
-        print("Синхронизация MongoDB завершена с ошибками")
+    results = run_all(workers=sync_workers)
+    print_summary(results)
+    return all(result['success'] for result in results)
 
-    redis_sync = RedisStudentSynchronizer()
-    if not redis_sync.run_sync():
-        print("Синхронизация Redis завершена с ошибками")
 
-    elastic_sync = ElasticLectureSessionSynchronizer()
-    if not elastic_sync.run_sync():
-        print("Синхронизация Elastic завершена с ошибками")
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Создание и заполнение всех баз данных')
+    parser.add_argument('--dataset', choices=['fixtures', *PRESETS], default='fixtures',
+                        help='Тестовые данные из tables_data или синтетический набор')
+    parser.add_argument('--benchmark', action='store_true',
+                        help='Замерить каждую фазу и вывести сводку')
+    parser.add_argument('--output', help='Файл JSON Lines для сводки замера')
+    parser.add_argument('--sync-workers', type=int,
+                        help='Число процессов для синхронизации (1 — последовательно)')
+    parser.add_argument('--ready-timeout', type=float, default=READY_TIMEOUT,
+                        help='Сколько секунд ждать готовности баз')
+    args = parser.parse_args()
 
-    neo4j_sync = Neo4jSynchronizer()
-    if not neo4j_sync.run_sync():
-        print("Синхронизация Neo4j завершена с ошибками")
+    wait_for_databases(args.ready_timeout)
+    if args.benchmark:
+        success = run_benchmark(args.dataset, args.output, args.sync_workers)['success']
+    else:
+        success = setup_project(args.dataset, args.sync_workers)
+    if not success:
+        sys.exit(1)
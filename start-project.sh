@@ -36,7 +36,7 @@ fi
 echo "Запускаем контейнеры..."
 docker compose up -d
 
-sleep 45s
+# setup_project.py сам ждет готовности баз
 
 # Старт проекта
 echo "Запускаем проект..."